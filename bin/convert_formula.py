@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+""" This file contains a command line program for converting code """
+
+import sys, os
+
+# add parent directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.cli import main
+
+sys.exit(main())
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """ This file contains a graphical application for converting code """
 
-import sys, os
+import sys, os, time
 from PyQt4 import QtGui, QtCore
 
 # add parent directory to path
@@ -13,9 +13,67 @@ from src.formatter import Formatter
 from src.language import LanguageMathematica, LanguagePython
 
 
+class ConversionThread(QtCore.QThread):
+    """Thread doing the actual conversion in the background. The thread uses
+    the parsers of the GUI, which is fine since at most one conversion runs at
+    a time."""
+
+    def __init__(self, gui, job_id, code, multiline):
+        QtCore.QThread.__init__(self, gui)
+        self.gui = gui
+        self.job_id = job_id
+        self.code = code
+        self.multiline = multiline
+        self.cancelled = False
+
+    def cancel(self):
+        """ marks the job as stale, such that it stops as soon as possible """
+        self.cancelled = True
+
+    def run(self):
+        """ converts the code and posts the result if the job is still current """
+        start = time.time()
+        try:
+            if self.multiline:
+                # parse statement by statement to be able to stop stale jobs
+                text_parser = self.gui.text_parser
+                result = []
+                lines = self.code.split("\n")
+                for _, statement in text_parser.iter_statements(lines):
+                    if self.cancelled:
+                        return
+                    result.append(text_parser.parser.parse_string(statement))
+                self.gui.text_parser.result = result
+                output = self.gui.text_parser
+
+            else:
+                code = " ".join(self.code.splitlines())
+                output = self.gui.line_parser.parse_string(code)
+
+            if self.cancelled:
+                return
+            pyCode = self.gui.formatter(output)
+            valid = True
+
+        except Exception:
+            pyCode = ""
+            valid = False
+
+        if not self.cancelled:
+            self.emit(
+                QtCore.SIGNAL("resultReady"),
+                self.job_id,
+                pyCode,
+                valid,
+                time.time() - start,
+            )
+
+
 class GUI(QtGui.QWidget):
     """ Class containing the graphical user interface """
 
+    debounce_interval = 300  # < milliseconds to wait after the last change
+
     def __init__(self, parent=None):
         """ setup the application """
         QtGui.QWidget.__init__(self, parent)
@@ -25,19 +83,28 @@ class GUI(QtGui.QWidget):
         self.text_parser = ParserText(LanguageMathematica())
         self.formatter = Formatter(LanguagePython(int2float=True))
 
+        # background conversion setup
+        self.job_id = 0  # identifier of the most recent input
+        self.thread = None  # thread of the currently running conversion
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.debounce_interval)
+        self.connect(self.timer, QtCore.SIGNAL("timeout()"), self.startConversion)
+
         # Quit Button
         quitButton = QtGui.QPushButton("Close", self)
         self.connect(
             quitButton, QtCore.SIGNAL("clicked()"), QtGui.qApp, QtCore.SLOT("quit()")
         )
         convertButton = QtGui.QPushButton("Convert", self)
-        self.connect(convertButton, QtCore.SIGNAL("clicked()"), self.onChanged)
+        self.connect(convertButton, QtCore.SIGNAL("clicked()"), self.onConvert)
 
         # Widgets
         self.matLabel = QtGui.QLabel("Mathematica Code:")
         self.matEdit = QtGui.QTextEdit()
         self.pyLabel = QtGui.QLabel("Python Code:")
         self.pyEdit = QtGui.QTextEdit()
+        self.statusLabel = QtGui.QLabel("")
         self.connect(self.matEdit, QtCore.SIGNAL("textChanged()"), self.onChanged)
         self.multilineCb = QtGui.QCheckBox("Support Multiple Lines", self)
         self.connect(
@@ -50,6 +117,7 @@ class GUI(QtGui.QWidget):
         bottomRow = QtGui.QHBoxLayout()
         bottomRow.addWidget(self.multilineCb)
         bottomRow.addStretch(1)
+        bottomRow.addWidget(self.statusLabel)
         bottomRow.addWidget(convertButton)
         bottomRow.addWidget(quitButton)
 
@@ -67,27 +135,55 @@ class GUI(QtGui.QWidget):
         self.resize(500, 350)
 
     def onChanged(self):
-        """ function doing the actual conversion """
-        try:
-            matCode = str(self.matEdit.toPlainText())
-
-            if self.multilineCb.isChecked():
-                self.text_parser.parse_text(matCode)
-                pyCode = self.formatter(self.text_parser)
-
-            else:
-                matCode = " ".join(matCode.splitlines())
-                output = self.line_parser.parse_string(matCode)
-                pyCode = self.formatter(output)
-
+        """ schedules a conversion once the input stopped changing """
+        self.job_id += 1
+        if self.thread is not None:
+            self.thread.cancel()
+        self.timer.start()
+
+    def onConvert(self):
+        """ converts the current input right away """
+        self.job_id += 1
+        if self.thread is not None:
+            self.thread.cancel()
+        self.timer.stop()
+        self.startConversion()
+
+    def startConversion(self):
+        """ starts converting the current input in a background thread """
+        if self.thread is not None:
+            # the stale job will restart the conversion when it has finished
+            return
+
+        self.statusLabel.setText("converting...")
+        self.thread = ConversionThread(
+            self,
+            self.job_id,
+            str(self.matEdit.toPlainText()),
+            self.multilineCb.isChecked(),
+        )
+        self.connect(self.thread, QtCore.SIGNAL("resultReady"), self.onResult)
+        self.connect(self.thread, QtCore.SIGNAL("finished()"), self.onFinished)
+        self.thread.start()
+
+    def onFinished(self):
+        """ starts the newest job if the finished one was stale """
+        thread, self.thread = self.thread, None
+        thread.deleteLater()
+        if thread.job_id != self.job_id and not self.timer.isActive():
+            self.startConversion()
+
+    def onResult(self, job_id, pyCode, valid, duration):
+        """ shows the result of a conversion if it belongs to the latest input """
+        if job_id != self.job_id:
+            return
+
+        if valid:
             self.pyEdit.setText(pyCode)
             self.pyLabel.setText("Python Code:")
-
-        except Exception:
-            if hasattr(self, "pyLabel"):
-                self.pyLabel.setText(
-                    'Python Code <font color="#FF0000">(invalid)</font>:'
-                )
+        else:
+            self.pyLabel.setText('Python Code <font color="#FF0000">(invalid)</font>:')
+        self.statusLabel.setText("%.1f ms" % (1000 * duration))
 
 
 # setup QT application
@@ -0,0 +1,201 @@
+""" Defines a benchmark suite measuring the throughput of the individual parts
+of a conversion on synthetic expressions.
+
+For every combination of a benchmark case and a language, the suite measures
+the stages
+
+    parse     ParserText.parse_text, including the nested structure
+    nested    ParserLine.get_nested_structure from the stored expression stacks
+    cse       ParserText.optimize_runtime
+    format    Formatter applied to the parsed lines
+
+The results can be stored as a baseline and later runs can be compared against
+it. Since absolute timings depend on the machine, baselines should only be
+compared on the machine they have been recorded on. Run the suite with
+
+    python -m src.benchmark [--save PATH] [--compare PATH]
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+
+from .generator import ExpressionGenerator
+from .language import LanguagePython, get_language
+from .parser_line import ParserLine
+from .parser_text import ParserText
+from .formatter import Formatter
+from .instrumentation import count_nodes
+
+
+class _LanguagePythonInput(LanguagePython):
+    """Python language writing functions without the prefix `np.`, since the
+    parser does not read it"""
+
+    operators = {"^": "**", "UNARY-": "-"}
+
+
+# benchmark cases given by the number of lines and the generator settings
+CASES = {
+    "many_small": {"count": 200, "size": 5},
+    "few_large": {"count": 10, "size": 100},
+    "deep": {"count": 20, "size": 30, "depth": 6},
+    "arithmetic": {
+        "count": 50,
+        "size": 20,
+        "operators": {"+": 1.0, "-": 1.0, "*": 1.0, "/": 1.0},
+    },
+    "repetitive": {"count": 50, "size": 20, "repetition": 0.5},
+}
+DEFAULT_LANGUAGES = ("mathematica", "python")
+STAGES = ("parse", "nested", "cse", "format")
+
+
+def _best_time(func, repeat):
+    """ Returns the shortest wall time of `repeat` calls of `func` """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def get_text(case, language, seed=0):
+    """ Returns the input text of a benchmark case in the given language """
+    settings = dict(CASES[case])
+    generator = ExpressionGenerator(
+        operators=settings.pop("operators", None),
+        repetition=settings.pop("repetition", 0.0),
+        seed=seed,
+    )
+    if isinstance(language, LanguagePython):
+        language = _LanguagePythonInput()
+    return generator.text(language, **settings)
+
+
+def run_case(case, language_name, repeat=3):
+    """Runs the benchmark case `case` for the given language. Returns a
+    dictionary with the time and the throughput (in nodes per second) of each
+    stage."""
+    language = get_language(language_name)
+    text = get_text(case, language)
+
+    # parse the text
+    parser = ParserText(language)
+    parser.parse_text(text)  # also builds the grammar
+    lines = parser.result
+    nodes = count_nodes(lines)
+    times = {"parse": _best_time(lambda: parser.parse_text(text), repeat)}
+
+    # build the nested structure from the stored stacks
+    line_parser = ParserLine(language)
+    stacks = []
+    for line in text.split("\n"):
+        line_parser.parse_string(line)
+        stacks.append(line_parser.result_stack)
+
+    def build_nested():
+        for stack in stacks:
+            line_parser.result_stack = stack
+            line_parser.get_nested_structure()
+
+    times["nested"] = _best_time(build_nested, repeat)
+
+    # eliminate common subexpressions
+    def optimize():
+        parser.result = copy.deepcopy(lines)
+        parser.optimize_runtime()
+
+    times["cse"] = _best_time(optimize, repeat)
+
+    # format the result
+    formatter = Formatter(language)
+    times["format"] = _best_time(lambda: formatter(lines), repeat)
+
+    return {
+        stage: {
+            "time": times[stage],
+            "nodes": nodes,
+            "throughput": nodes / times[stage],
+        }
+        for stage in STAGES
+    }
+
+
+def run_benchmarks(cases=None, languages=DEFAULT_LANGUAGES, repeat=3, stream=None):
+    """Runs the benchmark cases for all languages. The results are returned as
+    a dictionary with keys of the form `case/language/stage`. If `stream` is
+    given, a line is written to it for every result."""
+    if cases is None:
+        cases = sorted(CASES)
+    results = {}
+    for case in cases:
+        for language in languages:
+            for stage, result in run_case(case, language, repeat).items():
+                key = "%s/%s/%s" % (case, language, stage)
+                results[key] = result
+                if stream is not None:
+                    stream.write(
+                        "%-36s %10.3f ms %12.0f nodes/s\n"
+                        % (key, 1e3 * result["time"], result["throughput"])
+                    )
+    return results
+
+
+def compare(results, baseline, threshold=0.25):
+    """Compares `results` with `baseline` and returns a list of regressions,
+    i.e., of entries whose time exceeds the baseline by more than the relative
+    `threshold`. Each regression is given as a tuple of the key, the time of
+    the baseline and the current time."""
+    regressions = []
+    for key, result in sorted(results.items()):
+        if key in baseline:
+            time_base = baseline[key]["time"]
+            if result["time"] > (1 + threshold) * time_base:
+                regressions.append((key, time_base, result["time"]))
+    return regressions
+
+
+def main(args=None):
+    """Runs the benchmark suite from the command line. Returns a nonzero exit
+    code if a regression with respect to the baseline was detected."""
+    parser = argparse.ArgumentParser(description="Benchmark the conversion.")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES))
+    parser.add_argument("--languages", nargs="+", default=list(DEFAULT_LANGUAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", metavar="PATH", help="store results as baseline")
+    parser.add_argument("--compare", metavar="PATH", help="baseline to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="relative slow down considered a regression (default: 0.25)",
+    )
+    args = parser.parse_args(args)
+
+    results = run_benchmarks(args.cases, args.languages, args.repeat, sys.stdout)
+
+    if args.save:
+        with open(args.save, "w") as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compare(results, baseline, args.threshold)
+        for key, time_base, time_new in regressions:
+            sys.stdout.write(
+                "REGRESSION %s: %.3f ms -> %.3f ms\n"
+                % (key, 1e3 * time_base, 1e3 * time_new)
+            )
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+""" Defines the command line interface for converting formulas without a
+graphical user interface. Formulas are read from files or the standard input
+and written to the standard output or to files.
+"""
+
+import argparse
+import os
+import sys
+
+
+def get_parser():
+    """ Returns the parser for the command line arguments """
+    parser = argparse.ArgumentParser(
+        description="Convert mathematical formulas between languages."
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        metavar="FILE",
+        help="files to convert; the standard input is read if none is given",
+    )
+    parser.add_argument(
+        "-f", "--from", dest="source", default="mathematica", help="source language"
+    )
+    parser.add_argument(
+        "-t", "--to", dest="target", default="python", help="target language"
+    )
+    parser.add_argument(
+        "--int2float",
+        action="store_true",
+        help="write integers as floating point numbers",
+    )
+    parser.add_argument(
+        "--cse",
+        action="store_true",
+        help="eliminate common subexpressions using temporary variables",
+    )
+    parser.add_argument(
+        "--statements",
+        action="store_true",
+        help="read statements separated by `;`, which may span several lines",
+    )
+    parser.add_argument(
+        "--shared",
+        metavar="MODULE",
+        help="move subexpressions shared by the files into the module MODULE, "
+        "which is evaluated by the outputs and written to the output directory "
+        "with the extension of the target language, e.g. MODULE.py",
+    )
+    parser.add_argument(
+        "-k",
+        "--keep-going",
+        action="store_true",
+        help="skip lines which cannot be converted and report all of them",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="PATH",
+        help="file the output is written to; the standard output is used if "
+        "omitted. If many files are given, this is a directory receiving one "
+        "output file per input file",
+    )
+    parser.add_argument(
+        "--suffix",
+        default=".out",
+        help="suffix of the output files written to a directory (default: .out)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes converting files in parallel",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="print the time spent in the stages of the conversion to stderr",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="write cProfile statistics of the conversion to PATH",
+    )
+    return parser
+
+
+def _get_converter(settings):
+    """ Returns the converter of the current process for the given settings """
+    from .converter import get_converter
+
+    return get_converter(*settings)
+
+
+def _convert_stream(converter, stream_in, stream_out, optimize, errors=None):
+    """Converts the formulas read from `stream_in` and writes them to
+    `stream_out`. Without optimization, the lines are converted one by one.
+    If `errors` is a list, failures are collected in it."""
+    if optimize:
+        stream_out.write(converter.convert(stream_in.read(), errors) + "\n")
+    else:
+        _write_lines(converter.convert_lines(stream_in, errors), stream_out)
+
+
+def _write_lines(lines, stream_out):
+    """ Writes the converted lines as soon as they are available """
+    for line in lines:
+        stream_out.write(line + "\n")
+        stream_out.flush()
+
+
+def _convert_path(converter, path_in, stream_out, optimize, errors=None):
+    """Converts the formulas in the file `path_in` and writes them to
+    `stream_out`. The file is memory-mapped and, without optimization, the
+    lines are converted one by one. If `errors` is a list, failures are
+    collected in it."""
+    from .reader import MappedTextReader
+
+    if optimize:
+        stream_out.write(converter.convert_file(path_in, errors) + "\n")
+    else:
+        with MappedTextReader(path_in) as reader:
+            lines = reader.lines(errors)
+            _write_lines(converter.convert_lines(lines, errors), stream_out)
+
+
+def _report_errors(name, errors):
+    """ Writes the collected errors to stderr and returns the exit code """
+    for error in errors:
+        sys.stderr.write("%s: %s\n" % (name, error))
+    return 1 if errors else 0
+
+
+def _convert_file(job):
+    """Converts a single file. If `path_out` is None, the output is returned as
+    a string instead of being written to a file. Returns the output and a
+    possible error message. If `keep_going` is set, the message lists all
+    lines which could not be converted."""
+    settings, path_in, path_out, keep_going = job
+    from .parser_text import ParseError
+
+    converter = _get_converter(settings)
+    errors = [] if keep_going else None
+    output = None
+    try:
+        if path_out is None:
+            output = converter.convert_file(path_in, errors)
+        else:
+            with open(path_out, "w") as stream_out:
+                _convert_path(converter, path_in, stream_out, settings[3], errors)
+    except (ParseError, EnvironmentError) as e:  # including ConversionError
+        return None, "%s: %s" % (path_in, e)
+    if errors:
+        return output, "\n".join("%s: %s" % (path_in, e) for e in errors)
+    return output, None
+
+
+def main(args=None):
+    """Runs the command line interface with the arguments `args`. Returns the
+    exit code, which is nonzero if any formula could not be converted."""
+    args = get_parser().parse_args(args)
+
+    if args.timings or args.profile:
+        from .instrumentation import instrument, profile, StageStatistics
+
+        if args.jobs > 1:
+            sys.stderr.write("warning: --timings and --profile imply --jobs 1\n")
+            args.jobs = 1
+        with instrument(StageStatistics()) as stats:
+            if args.profile:
+                with profile(args.profile):
+                    exit_code = _run(args)
+            else:
+                exit_code = _run(args)
+        if args.timings:
+            sys.stderr.write("%s\n" % stats)
+        return exit_code
+
+    return _run(args)
+
+
+def _run(args):
+    """ Converts the formulas as specified by the command line arguments """
+    from .converter import ConversionError
+    from .parser_text import ParseError
+
+    settings = (args.source, args.target, args.int2float, args.cse, args.statements)
+    errors = [] if args.keep_going else None
+    try:
+        converter = _get_converter(settings)
+    except ValueError as e:
+        sys.stderr.write("error: %s\n" % e)
+        return 2
+
+    if args.shared:
+        return _run_project(args, converter)
+
+    # read from the standard input
+    if not args.files or args.files == ["-"]:
+        try:
+            if args.output:
+                with open(args.output, "w") as stream_out:
+                    _convert_stream(converter, sys.stdin, stream_out, args.cse, errors)
+            else:
+                _convert_stream(converter, sys.stdin, sys.stdout, args.cse, errors)
+        except (ConversionError, EnvironmentError) as e:
+            sys.stderr.write("<stdin>: %s\n" % e)
+            return 1
+        return _report_errors("<stdin>", errors or [])
+
+    # determine the output files
+    if len(args.files) == 1 and args.output:
+        paths_out = [args.output]
+    elif args.output:
+        if not os.path.isdir(args.output):
+            os.makedirs(args.output)
+        paths_out = [
+            os.path.join(args.output, os.path.basename(path) + args.suffix)
+            for path in args.files
+        ]
+    else:
+        paths_out = [None] * len(args.files)
+    jobs = [
+        (settings, path_in, path_out, args.keep_going)
+        for path_in, path_out in zip(args.files, paths_out)
+    ]
+
+    # convert the files
+    if len(jobs) == 1 and paths_out[0] is None:
+        # stream the output of a single file
+        try:
+            _convert_path(converter, args.files[0], sys.stdout, args.cse, errors)
+        except (ParseError, EnvironmentError) as e:  # including ConversionError
+            sys.stderr.write("%s: %s\n" % (args.files[0], e))
+            return 1
+        exit_code = _report_errors(args.files[0], errors or [])
+
+    elif args.jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = executor.map(_convert_file, jobs)
+            exit_code = _write_results(results)
+    else:
+        exit_code = _write_results(_convert_file(job) for job in jobs)
+
+    return exit_code
+
+
+def _run_project(args, converter):
+    """Converts the files like a Project, which computes the subexpressions
+    shared by the files in a separate module"""
+    from .project import Project
+
+    project = Project(converter.parser.parser.language, args.shared)
+    for path in args.files:
+        try:
+            project.add_file(path, statements=args.statements)
+        except (ValueError, EnvironmentError) as e:  # including ParseError
+            sys.stderr.write("%s: %s\n" % (path, e))
+            return 1
+    try:
+        if args.cse:
+            project.optimize_runtime()
+        else:
+            project.extract_shared()
+        outputs = project.format(converter.formatter)
+    except (ValueError, EnvironmentError) as e:  # including ParseError
+        sys.stderr.write("error: %s\n" % e)
+        return 1
+
+    if args.output:
+        if not os.path.isdir(args.output):
+            os.makedirs(args.output)
+        lang = converter.formatter.lang
+        for name, code in outputs.items():
+            if name == project.module:
+                path = project.get_path(lang)
+            else:
+                path = name + args.suffix
+            with open(os.path.join(args.output, path), "w") as fp:
+                fp.write(code + "\n")
+    else:
+        comment = converter.formatter.lang.comment
+        for name, code in outputs.items():
+            sys.stdout.write("%s\n%s\n" % (comment % name, code))
+    return 0
+
+
+def _write_results(results):
+    """Writes the results of converting files to the standard output in the
+    order of the input files and returns the exit code"""
+    exit_code = 0
+    for output, error in results:
+        if error is not None:
+            sys.stderr.write("%s\n" % error)
+            exit_code = 1
+        if output is not None:
+            sys.stdout.write(output + "\n")
+            sys.stdout.flush()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+""" Defines a class bundling a parser and a formatter, which converts formulas
+from one language into another in a single step.
+"""
+
+from .language import LanguageC, LanguageMathematica, get_language
+from .parser_text import ParserText, ParseError, _error_message
+from .formatter import Formatter, FormatterC, FormatterMathematica
+
+
+class ConversionError(ParseError):
+    """ Error raised when a formula cannot be converted """
+
+
+class Converter(object):
+    """ Class converting formulas from a source into a target language """
+
+    def __init__(
+        self, source, target, int2float=False, optimize=False, statements=False
+    ):
+        """Initializes the converter. The languages `source` and `target` can
+        either be given by name or as instances of LanguageBase. The flag
+        `int2float` is passed to the target language and `optimize` determines
+        whether common subexpressions are eliminated. If `statements` is True,
+        formulas may span several lines and may be separated by `;`."""
+
+        if int2float:
+            try:
+                target = get_language(target, int2float=True)
+            except TypeError:
+                raise ValueError("`%s` does not support int2float" % target)
+        else:
+            target = get_language(target)
+
+        self.parser = ParserText(get_language(source))
+        if isinstance(target, LanguageC):
+            self.formatter = FormatterC(target)
+        elif isinstance(target, LanguageMathematica):
+            self.formatter = FormatterMathematica(target)
+        else:
+            self.formatter = Formatter(target)
+        self.optimize = optimize
+        self.statements = statements
+
+    def convert(self, text, errors=None):
+        """Converts a text consisting of possibly many lines. If `errors` is a
+        list, lines which cannot be parsed are skipped and a ConversionError is
+        appended for each."""
+        try:
+            if errors is not None:
+                _, parse_errors = self.parser.parse_text_lenient(
+                    text, statements=self.statements
+                )
+                errors.extend(
+                    ConversionError(e.message, e.lineno, e.column, e.offset)
+                    for e in parse_errors
+                )
+            elif self.statements:
+                self.parser.parse_statements(text)
+            else:
+                self.parser.parse_text(text)
+            if self.optimize:
+                self.parser.optimize_runtime()
+            return self.formatter(self.parser)
+        except ParseError as e:
+            raise ConversionError(e.message, e.lineno, e.column, e.offset)
+        except Exception as e:
+            raise ConversionError(_error_message(e))
+
+    def convert_file(self, path, errors=None):
+        """Converts the formulas in the file `path`, which is memory-mapped to
+        support very large files. If `errors` is a list, lines which cannot be
+        parsed are skipped and a ConversionError is appended for each."""
+        try:
+            parse_errors = None if errors is None else []
+            self.parser.parse_file(
+                path, statements=self.statements, errors=parse_errors
+            )
+            if errors is not None:
+                errors.extend(
+                    ConversionError(e.message, e.lineno, e.column, e.offset)
+                    for e in parse_errors
+                )
+            if self.optimize:
+                self.parser.optimize_runtime()
+            return self.formatter(self.parser)
+        except ParseError as e:
+            raise ConversionError(e.message, e.lineno, e.column, e.offset)
+        except Exception as e:
+            raise ConversionError(_error_message(e))
+
+    def convert_lines(self, lines, errors=None):
+        """Converts the formulas given by the iterable `lines` one at a time,
+        yielding the result of every line as soon as it is available. Blank
+        lines are skipped. Since the lines are treated independently, common
+        subexpressions are not eliminated in this mode. If the converter reads
+        statements, one result is yielded per statement. If `errors` is a list,
+        lines which cannot be converted are skipped and a ConversionError is
+        appended for each."""
+
+        parser = self.parser.parser
+        if self.statements:
+            lines = self.parser.iter_statements(lines)
+        else:
+            lines = enumerate(lines, 1)
+        for lineno, line in lines:
+            if line == "" or line.isspace():
+                continue
+            try:
+                parser.parse_string(line)
+                result = self.formatter([self.formatter._rebase(parser)])
+            except Exception as e:
+                column = None if self.statements else getattr(e, "col", None)
+                error = ConversionError(_error_message(e), lineno, column)
+                if errors is None:
+                    raise error
+                errors.append(error)
+                continue
+            yield result
+
+
+# converters of the current process, which are reused for all conversions
+_converters = {}
+
+
+def get_converter(*settings):
+    """Returns a converter created with the arguments `settings`. Converters
+    are cached, such that the grammars are only built once per process."""
+    try:
+        return _converters[settings]
+    except KeyError:
+        converter = _converters[settings] = Converter(*settings)
+        return converter
@@ -0,0 +1,120 @@
+""" Defines a class analyzing the dependencies between the lines of a code.
+
+Each line assigning a variable (including the temporary variables introduced by
+ParserText.optimize_runtime) defines this variable, which is used by later
+lines. Lines which do not depend on each other can be executed concurrently.
+The lines are therefore grouped into levels, where every line only depends on
+lines of earlier levels.
+"""
+
+from collections import defaultdict
+import re
+
+TEMP_VAR = "t_%d"  # < name of the temporary variables of ParserText
+# pattern matching the temporary variables, capturing their number
+TEMP_PATTERN = re.compile("^%s$" % re.escape(TEMP_VAR).replace("%d", r"(\d+)"))
+
+
+def _get_lines(code):
+    """Returns the list of expression trees of `code`, which may be a
+    ParserText, a ParserLine, an expression tree or a list of expression trees.
+    Parser objects are recognized by their attributes, such that the parser
+    modules need not be imported."""
+    if hasattr(code, "result") and hasattr(code, "parse_text"):
+        return code.result
+    if hasattr(code, "result_nested"):
+        return [code.result_nested]
+    if isinstance(code, (dict, str)):
+        return [code]
+    return code
+
+
+def _is_number(s):
+    """ Checks whether the atom `s` is a number """
+    try:
+        float(s)
+    except ValueError:
+        return False
+    return True
+
+
+class DependencyGraph(object):
+    """Graph of the dependencies between lines of code. A line depends on an
+    earlier line if it reads a variable written by it (read after write), if
+    it overwrites a variable read by it (write after read) or if both write the
+    same variable (write after write)."""
+
+    constants = ("PI", "E")  # < atoms which are not variables
+
+    def __init__(self, code):
+        """Builds the graph of `code`, which may be a ParserText, an expression
+        tree or a list of expression trees"""
+        self.lines = list(_get_lines(code))
+        self.reads = []  # < sets of variables read by every line
+        self.writes = []  # < sets of variables written by every line
+        self.dependencies = []  # < sets of earlier lines every line depends on
+        self.levels = []  # < level of every line
+        self._build()
+
+    def _collect_reads(self, token, reads):
+        """ Adds the variables read by the expression `token` to `reads` """
+        if isinstance(token, dict):
+            if token["pos"] == "array":
+                reads.add(token["op"])
+            else:
+                for t in token["args"]:
+                    self._collect_reads(t, reads)
+        elif token and token not in self.constants and not _is_number(token):
+            reads.add(token)
+
+    def _build(self):
+        """ Determines the dependencies and the levels of all lines """
+        last_write = {}  # < line which wrote a variable last
+        readers = defaultdict(list)  # < lines reading a variable since
+
+        for k, line in enumerate(self.lines):
+            reads, writes = set(), set()
+            if isinstance(line, dict) and line["op"] == "=":
+                target, value = line["args"]
+                if isinstance(target, dict):  # assignment to an array element
+                    reads.add(target["op"])
+                    writes.add(target["op"])
+                else:
+                    writes.add(target)
+                self._collect_reads(value, reads)
+            else:
+                self._collect_reads(line, reads)
+
+            dependencies = set()
+            for name in reads:
+                if name in last_write:
+                    dependencies.add(last_write[name])
+            for name in writes:
+                if name in last_write:
+                    dependencies.add(last_write[name])
+                dependencies.update(readers[name])
+
+            for name in reads:
+                readers[name].append(k)
+            for name in writes:
+                last_write[name] = k
+                readers[name] = []
+
+            self.reads.append(reads)
+            self.writes.append(writes)
+            self.dependencies.append(dependencies)
+            self.levels.append(1 + max([self.levels[i] for i in dependencies] or [-1]))
+
+    @property
+    def groups(self):
+        """Lists of the indices of the lines in every level. The lines of a
+        group do not depend on each other and are given in their original
+        order."""
+        groups = [[] for _ in range(max(self.levels or [-1]) + 1)]
+        for k, level in enumerate(self.levels):
+            groups[level].append(k)
+        return groups
+
+    def get_groups(self):
+        """ Returns the lines of code grouped into independent levels """
+        return [[self.lines[k] for k in group] for group in self.groups]
@@ -0,0 +1,271 @@
+""" Defines a class differentiating parsed formulas symbolically.
+
+The derivatives are calculated in forward mode: every line assigning a variable
+is preceded by lines assigning the derivatives of this variable with respect to
+the chosen input variables, which are named like `da_dx`. The derivatives are
+thus calculated from the previous values, if a variable is assigned again. Later
+lines refer to these derivatives by the chain rule. Lines without an assignment
+are followed by their derivatives. If the resulting code is optimized by
+ParserText.optimize_runtime, the values and their derivatives share the
+temporary variables of common subexpressions.
+
+The derivatives of elements of arrays assigned in the code are stored in arrays,
+e.g. `dM_dx[1]`, which are initialized with zeros like `dM_dx = 0. * M` before
+the first element is assigned. Elements of input arrays are treated as constants.
+"""
+
+import copy
+
+from .dependency import _get_lines
+
+
+def _number(value):
+    """ Returns the atom representing the number `value` """
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _is_number(token):
+    """ Checks whether `token` is an atom representing a number """
+    if isinstance(token, dict):
+        return False
+    try:
+        float(token)
+    except ValueError:
+        return False
+    return True
+
+
+def _infix(op, arg1, arg2):
+    """ Returns the node applying the infix operator `op` """
+    return {"op": op, "pos": "infix", "args": [arg1, arg2]}
+
+
+def _function(name, *args):
+    """ Returns the node calling the function `name` """
+    return {"op": name, "pos": "function", "args": list(args)}
+
+
+def _neg(a):
+    """ Returns `-a` """
+    if a == "0":
+        return "0"
+    if isinstance(a, dict) and a["op"] == "UNARY-":
+        return a["args"][0]
+    return {"op": "UNARY-", "pos": "prefix", "args": [a]}
+
+
+def _add(a, b):
+    """ Returns `a + b` """
+    if a == "0":
+        return b
+    if b == "0":
+        return a
+    return _infix("+", a, b)
+
+
+def _sub(a, b):
+    """ Returns `a - b` """
+    if b == "0":
+        return a
+    if a == "0":
+        return _neg(b)
+    return _infix("-", a, b)
+
+
+def _mul(a, b):
+    """ Returns `a * b` """
+    if a == "0" or b == "0":
+        return "0"
+    if a == "1":
+        return b
+    if b == "1":
+        return a
+    return _infix("*", a, b)
+
+
+def _div(a, b):
+    """ Returns `a / b` """
+    if a == "0":
+        return "0"
+    if b == "1":
+        return a
+    return _infix("/", a, b)
+
+
+def _pow(a, b):
+    """ Returns `a ^ b` """
+    if b == "1":
+        return a
+    return _infix("^", a, b)
+
+
+class Differentiator(object):
+    """Calculates the derivatives of formulas given as expression trees with
+    respect to the input variables `variables`. The names of the derivatives
+    of assigned variables are given by `name`, which is formatted with the
+    names of the assigned and the input variable."""
+
+    name = "d%s_d%s"  # < name of the derivative of a variable
+
+    # derivatives of functions of a single argument `u` in terms of `u`
+    rules = {
+        "sin": lambda u: _function("cos", u),
+        "cos": lambda u: _neg(_function("sin", u)),
+        "tan": lambda u: _div("1", _pow(_function("cos", u), "2")),
+        "arcsin": lambda u: _div("1", _function("sqrt", _sub("1", _pow(u, "2")))),
+        "arccos": lambda u: _neg(
+            _div("1", _function("sqrt", _sub("1", _pow(u, "2"))))
+        ),
+        "arctan": lambda u: _div("1", _add("1", _pow(u, "2"))),
+        "sinh": lambda u: _function("cosh", u),
+        "cosh": lambda u: _function("sinh", u),
+        "tanh": lambda u: _sub("1", _pow(_function("tanh", u), "2")),
+        "coth": lambda u: _neg(_div("1", _pow(_function("sinh", u), "2"))),
+        "arcsinh": lambda u: _div("1", _function("sqrt", _add(_pow(u, "2"), "1"))),
+        "arccosh": lambda u: _div("1", _function("sqrt", _sub(_pow(u, "2"), "1"))),
+        "arctanh": lambda u: _div("1", _sub("1", _pow(u, "2"))),
+        "arccoth": lambda u: _div("1", _sub("1", _pow(u, "2"))),
+        "exp": lambda u: _function("exp", u),
+        "ln": lambda u: _div("1", u),
+        "log": lambda u: _div("1", u),
+        "sqrt": lambda u: _div("1", _mul("2", _function("sqrt", u))),
+        "abs": lambda u: _function("sign", u),
+        "sign": lambda u: "0",
+        "trunc": lambda u: "0",
+        "round": lambda u: "0",
+    }
+
+    def __init__(self, variables, name=None):
+        if isinstance(variables, str):
+            variables = [variables]
+        self.variables = list(variables)
+        if name is not None:
+            self.name = name
+        # derivatives of the assigned variables for every input variable
+        self.derivatives = {variable: {} for variable in self.variables}
+        self.arrays = set()  # < arrays whose elements have derivatives
+
+    def differentiate(self, token, variable):
+        """Returns the derivative of the expression `token` with respect to
+        `variable`, using the derivatives of the variables assigned so far"""
+        if not isinstance(token, dict):
+            derivatives = self.derivatives[variable]
+            if token in derivatives:
+                return derivatives[token]
+            return "1" if token == variable else "0"
+
+        op, args = token["op"], token["args"]
+        if token["pos"] == "array":
+            if op in self.arrays:
+                return dict(token, op=self.name % (op, variable))
+            return "0"
+        if token["pos"] == "list":
+            return {
+                "op": "list",
+                "pos": "list",
+                "args": [self.differentiate(t, variable) for t in args],
+            }
+
+        if op in ("+", "-", "*", "/", "^"):
+            u, v = args
+            du = self.differentiate(u, variable)
+            dv = self.differentiate(v, variable)
+            if op == "+":
+                return _add(du, dv)
+            if op == "-":
+                return _sub(du, dv)
+            if op == "*":
+                return _add(_mul(du, v), _mul(u, dv))
+            if op == "/":
+                return _div(_sub(_mul(du, v), _mul(u, dv)), _pow(v, "2"))
+            return self._differentiate_power(u, v, du, dv)
+
+        if op == "UNARY-":
+            return _neg(self.differentiate(args[0], variable))
+        if op == "==":
+            raise ValueError("Equations cannot be differentiated")
+        if op not in self.rules or len(args) != 1:
+            raise ValueError("Cannot differentiate the function `%s`" % op)
+        du = self.differentiate(args[0], variable)
+        if du == "0":
+            return "0"
+        return _mul(self.rules[op](args[0]), du)
+
+    def _differentiate_power(self, u, v, du, dv):
+        """ Returns the derivative of `u ^ v` """
+        if dv == "0":
+            if _is_number(v):
+                exponent = _number(float(v) - 1)
+            else:
+                exponent = _sub(v, "1")
+            return _mul(_mul(v, _pow(u, exponent)), du)
+        # u^v * (v' log(u) + v u' / u)
+        inner = _add(_mul(dv, _function("log", u)), _div(_mul(v, du), u))
+        return _mul(_pow(u, v), inner)
+
+    def __call__(self, code):
+        """Returns the lines of `code`, which may be a ParserText, an expression
+        tree or a list of expression trees, together with their derivatives
+        with respect to all input variables. The derivatives of an assigned
+        variable precede the assignment, since they may read the variable."""
+        res = []
+        for line in _get_lines(code):
+            if isinstance(line, dict) and line["op"] == "=":
+                target, value = line["args"]
+                if isinstance(target, dict) and target["op"] not in self.arrays:
+                    res.extend(self._allocate(target["op"]))
+                for variable in self.variables:
+                    derivative = copy.deepcopy(self.differentiate(value, variable))
+                    res.append(self._assign(target, variable, derivative))
+                if isinstance(target, dict):
+                    self.arrays.add(target["op"])
+                elif isinstance(value, dict) and value["pos"] == "list":
+                    self.arrays.add(target)
+                else:
+                    self.arrays.discard(target)
+                res.append(line)
+            else:
+                res.append(line)
+                if line == "":
+                    continue
+                for variable in self.variables:
+                    res.append(copy.deepcopy(self.differentiate(line, variable)))
+        return res
+
+    def _allocate(self, name):
+        """Returns the lines initializing the derivatives of the elements of
+        the array `name` with zeros"""
+        zeros = _infix("*", "0.", name)
+        return [
+            {"op": "=", "pos": "infix", "args": [self.name % (name, v), zeros]}
+            for v in self.variables
+        ]
+
+    def _assign(self, target, variable, derivative):
+        """Returns the line assigning the derivative of `target` with respect
+        to `variable` and records the derivative for later lines"""
+        if isinstance(target, dict):  # element of an array
+            name = self.name % (target["op"], variable)
+            target = dict(target, op=name)
+        else:
+            name = self.name % (target, variable)
+            # constant derivatives are used directly by later lines
+            if _is_number(derivative):
+                self.derivatives[variable][target] = derivative
+            else:
+                self.derivatives[variable][target] = name
+            target = name
+        return {"op": "=", "pos": "infix", "args": [target, derivative]}
+
+
+def differentiate(parser, variables, optimize=True, **kwargs):
+    """Adds the derivatives of the code parsed by the ParserText `parser` with
+    respect to `variables` to its result. If `optimize` is True, the values and
+    the derivatives are optimized together by `optimize_runtime`, which
+    receives the keyword arguments. Returns the lines of the new code."""
+    parser.result = Differentiator(variables)(parser.result)
+    if optimize:
+        parser.optimize_runtime(**kwargs)
+    return parser.result
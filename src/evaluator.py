@@ -0,0 +1,223 @@
+""" Defines a class evaluating parsed formulas directly on numpy arrays.
+
+The expression trees are compiled once into a flat list of instructions, which
+call numpy ufuncs on a list of registers. Evaluating the formulas for many sets
+of parameters thus neither requires generating code nor calling `exec`.
+"""
+
+import numpy as np
+
+from .dependency import _get_lines
+
+
+def _coth(x):
+    """ Hyperbolic cotangent """
+    return 1 / np.tanh(x)
+
+
+def _arccoth(x):
+    """ Inverse hyperbolic cotangent """
+    return np.arctanh(1 / x)
+
+
+def _list(*args):
+    """ Constructs an array from its elements """
+    return np.array(args)
+
+
+def _get_item(index):
+    """ Returns a function reading the element `index` of an array """
+    return lambda arr: arr[index]
+
+
+def _set_item(index):
+    """ Returns a function setting the element `index` of an array """
+
+    def func(arr, value):
+        arr[index] = value
+        return arr
+
+    return func
+
+
+class Evaluator(object):
+    """Class evaluating formulas given as expression trees. The formulas are
+    compiled when the evaluator is created and can then be evaluated for
+    different inputs by calling the evaluator with a dictionary of values."""
+
+    operators = {
+        "+": np.add,
+        "-": np.subtract,
+        "*": np.multiply,
+        "/": np.true_divide,
+        "^": np.power,
+        "==": np.equal,
+        "UNARY-": np.negative,
+        "abs": np.abs,
+        "sign": np.sign,
+        "sin": np.sin,
+        "cos": np.cos,
+        "tan": np.tan,
+        "arcsin": np.arcsin,
+        "arccos": np.arccos,
+        "arctan": np.arctan,
+        "sinh": np.sinh,
+        "cosh": np.cosh,
+        "tanh": np.tanh,
+        "coth": _coth,
+        "arcsinh": np.arcsinh,
+        "arccosh": np.arccosh,
+        "arctanh": np.arctanh,
+        "arccoth": _arccoth,
+        "exp": np.exp,
+        "ln": np.log,
+        "log": np.log,
+        "sqrt": np.sqrt,
+        "trunc": np.trunc,
+        "round": np.round,
+        "list": _list,
+    }  # < functions implementing the operators of the expression trees
+
+    # additional names of functions used by the individual languages
+    language_operators = {
+        "LanguagePython": {
+            "asin": np.arcsin,
+            "acos": np.arccos,
+            "atan": np.arctan,
+            "asinh": np.arcsinh,
+            "acosh": np.arccosh,
+            "atanh": np.arctanh,
+            "log10": np.log10,
+        },
+        "LanguageMathematica": {"log10": np.log10},
+    }
+
+    constants = {"PI": np.pi, "E": np.e}
+
+    def __init__(self, code, language=None):
+        """Compiles the formulas given by `code`, which may be a ParserText, a
+        ParserLine, an expression tree or a list of expression trees. The
+        function names and the array indices are interpreted according to
+        `language`. Without a language, indices start at zero."""
+
+        self.functions = dict(self.operators)
+        self.array_base = 0  # < index of the first element of an array
+        if language is not None:
+            self.array_base = language.array_base
+            for cls in reversed(type(language).__mro__):
+                self.functions.update(self.language_operators.get(cls.__name__, {}))
+
+        self._compile(_get_lines(code))
+
+    def _compile(self, lines):
+        """ Compiles the expression trees into a list of instructions """
+        self.registers = []  # < initial values of the registers
+        self.inputs = {}  # < registers of the variables read from the input
+        self.instructions = []  # < tuples of function, output and arguments
+        self.variables = {}  # < current registers of assigned variables
+        self._copied = set()  # < arrays which have been copied before writing
+        self._atoms = {}  # < registers of the constants
+
+        result = None
+        for line in lines:
+            if isinstance(line, dict) and line["op"] == "=":
+                target, value = line["args"]
+                reg = self._compile_token(value)
+                if isinstance(target, dict):  # assignment to array element
+                    self._compile_set_item(target, reg)
+                else:
+                    self.variables[target] = reg
+                    self._copied.discard(target)
+            elif line != "":
+                result = self._compile_token(line)
+
+        self.result = result  # < register of the last unassigned expression
+
+    def _new_register(self, value=None):
+        """ Adds a register and returns its index """
+        self.registers.append(value)
+        return len(self.registers) - 1
+
+    def _load(self, name):
+        """ Returns the register holding the variable `name` """
+        if name in self.variables:
+            return self.variables[name]
+        if name not in self.inputs:
+            self.inputs[name] = self._new_register()
+        return self.inputs[name]
+
+    def _get_index(self, token):
+        """ Returns the zero-based index of the array element `token` """
+        return tuple(int(i) - self.array_base for i in token["args"])
+
+    def _compile_token(self, token):
+        """Compiles a single expression tree and returns the register holding
+        its value"""
+
+        if not isinstance(token, dict):  # atom
+            if token in self._atoms:
+                return self._atoms[token]
+            if token in self.constants:
+                reg = self._new_register(self.constants[token])
+            else:
+                try:
+                    value = float(token)
+                except ValueError:
+                    return self._load(token)
+                reg = self._new_register(value)
+            self._atoms[token] = reg
+            return reg
+
+        if token["pos"] == "array":
+            index = self._get_index(token)
+            func, args = _get_item(index), (self._load(token["op"]),)
+
+        else:
+            try:
+                func = self.functions[token["op"]]
+            except KeyError:
+                raise ValueError("Unknown operator `%s`" % token["op"])
+            args = tuple(self._compile_token(t) for t in token["args"])
+
+        reg = self._new_register()
+        self.instructions.append((func, reg, args))
+        return reg
+
+    def _compile_set_item(self, target, reg_value):
+        """ Compiles the assignment of the register `reg_value` to an element """
+        name = target["op"]
+        reg_array = self._load(name)
+        if name not in self._copied:
+            # copy the array, such that the input is not modified
+            reg_copy = self._new_register()
+            self.instructions.append((np.array, reg_copy, (reg_array,)))
+            self.variables[name] = reg_array = reg_copy
+            self._copied.add(name)
+
+        func = _set_item(self._get_index(target))
+        self.instructions.append((func, reg_array, (reg_array, reg_value)))
+
+    def __call__(self, values=None, **kwargs):
+        """Evaluates the formulas for the input variables given as a dictionary
+        `values` or as keyword arguments. Returns a dictionary with the values
+        of all assigned variables. The value of the last line without an
+        assignment is returned with the key None."""
+        if values is None:
+            values = kwargs
+        elif kwargs:
+            values = dict(values, **kwargs)
+
+        regs = list(self.registers)
+        for name, reg in self.inputs.items():
+            try:
+                regs[reg] = values[name]
+            except KeyError:
+                raise ValueError("Value of variable `%s` is missing" % name)
+
+        for func, out, args in self.instructions:
+            regs[out] = func(*[regs[a] for a in args])
+
+        res = {name: regs[reg] for name, reg in self.variables.items()}
+        if self.result is not None:
+            res[None] = regs[self.result]
+        return res
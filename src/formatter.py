@@ -1,9 +1,9 @@
 """ Defines classes which can convert the parsed formula into the style of a
 certain language """
 
-from .parser_line import ParserLine
-from .parser_text import ParserText
-from .language import LanguageBase
+from .language import LanguageBase, LanguageC, LanguageMathematica, LanguagePython
+from .instrumentation import stage, count_nodes
+from .dependency import TEMP_PATTERN, _get_lines
 
 
 def _operator_associative(token, a_id=0):
@@ -18,6 +18,30 @@ def _operator_associative(token, a_id=0):
     return False
 
 
+def _shift_indices(token, offset):
+    """ Returns a copy of `token`, where all array indices are shifted """
+    if not isinstance(token, dict):
+        return token
+    if token["pos"] == "array":
+        args = [str(int(t) + offset) for t in token["args"]]
+    else:
+        args = [_shift_indices(t, offset) for t in token["args"]]
+    return dict(token, args=args)
+
+
+def _rebase_indices(code, array_base):
+    """Returns the lines of the ParserText `code` or the expression tree of
+    the ParserLine `code`, whose array indices are shifted to start at
+    `array_base`. Other codes are returned unchanged."""
+    if hasattr(code, "result") and hasattr(code, "parse_text"):
+        offset = array_base - code.parser.language.array_base
+        return [_shift_indices(token, offset) for token in code.result]
+    if hasattr(code, "result_nested"):
+        offset = array_base - code.language.array_base
+        return _shift_indices(code.result_nested, offset)
+    return code
+
+
 def _strip_par(s):
     """ Strips surrounding parentheses from the expression string 's' """
     if s[0] == "(":
@@ -35,63 +59,35 @@ class Formatter(object):
             self.lang = language
         else:
             raise ValueError("`language` is not of type LanguageBase")
+        self.state = None  # < state of the language while formatting a code
 
     def _convert_to_string_rec(self, token):
         """ Converts a token into their string representation """
 
         if isinstance(token, dict):
 
-            # get the operator, which must always be defined
-            op = self.lang.operators.get(token["op"], token["op"])
+            # write functions missing in the language by other functions
+            inline = self.lang.inline_functions.get(token["op"])
+            if inline is not None and token["pos"] in ("function", "prefix"):
+                token = inline(*token["args"])
 
-            if token["pos"] == "function":  # operator is a function
-                args = (
-                    _strip_par(self._convert_to_string_rec(t)) for t in token["args"]
-                )
-                s = "%s%s%s%s" % (
-                    op,
-                    self.lang.func_lpar,
-                    self.lang.func_delim.join(args),
-                    self.lang.func_rpar,
-                )
+            # get the operator, which must always be defined
+            op = self.lang.format_operator(token, self.state)
 
-            elif token["pos"] == "array":  # operator is an array
-                args = (
-                    _strip_par(self._convert_to_string_rec(t)) for t in token["args"]
-                )
-                s = "%s%s%s%s" % (
-                    op,
-                    self.lang.array_lpar,
-                    self.lang.array_delim.join(args),
-                    self.lang.array_rpar,
+            if token["pos"] == "array":  # indices are integers
+                args = [str(t) for t in token["args"]]
+            elif token["pos"] == "list":
+                args = [self._convert_list(t) for t in token["args"]]
+            else:
+                args = [self._convert_to_string_rec(t) for t in token["args"]]
+            if token["pos"] == "infix":
+                associative = (
+                    _operator_associative(token, 0),
+                    _operator_associative(token, 1),
                 )
-
-            elif token["pos"] == "infix":  # operator must have two arguments
-                arg1 = self._convert_to_string_rec(token["args"][0])
-                arg2 = self._convert_to_string_rec(token["args"][1])
-
-                # brackets may be dropped for associative operators
-                if _operator_associative(token, 0):
-                    arg1 = _strip_par(arg1)
-                if _operator_associative(token, 1) or token["op"] == "=":
-                    arg2 = _strip_par(arg2)
-
-                s = "%s%s %s %s%s" % (self.lang.lpar, arg1, op, arg2, self.lang.rpar)
-
-            # operator has exactly one argument
-            elif token["pos"] == "prefix":
-                arg = self._convert_to_string_rec(token["args"][0])
-                if token["op"] == "UNARY-":
-                    s = "%s%s " % (op, arg)
-                else:
-                    s = "%s%s%s%s " % (
-                        op,
-                        self.lang.func_lpar,
-                        _strip_par(arg),
-                        self.lang.func_rpar,
-                    )
             else:
-                raise ValueError("Unknown operator positions: `%s`" % token["pos"])
+                associative = (False, False)
+            s = self._format_node(op, token["op"], token["pos"], args, associative)
 
         else:
             s = self.lang.format_atom(token)
@@ -99,32 +95,449 @@ class Formatter(object):
 
         return s.strip()
 
+    def _format_node(self, op, name, pos, args, associative=(False, False)):
+        """Builds the string representation of a single node from the string
+        `op` of its operator, the operator `name`, the position `pos` and the
+        string representations `args` of its arguments. Array indices and the
+        elements of lists are used as given. `associative` tells for every
+        argument whether it has the same associative operator as the node,
+        such that its brackets may be dropped."""
+        lang = self.lang
+        if pos == "function" or (pos == "infix" and name in lang.infix_functions):
+            s = "%s%s%s%s" % (
+                op,
+                lang.func_lpar,
+                lang.func_delim.join(_strip_par(a) for a in args),
+                lang.func_rpar,
+            )
+
+        elif pos == "array":  # operator is an array
+            s = "%s%s%s%s" % (
+                op,
+                lang.array_lpar,
+                lang.array_delim.join(args),
+                lang.array_rpar,
+            )
+
+        elif pos == "list":  # array given by its elements
+            s = lang.list_constructor % self._format_list(args)
+
+        elif pos == "infix":  # operator must have two arguments
+            arg1, arg2 = args
+
+            # brackets may be dropped for associative operators
+            if associative[0]:
+                arg1 = _strip_par(arg1)
+            if associative[1] or name == "=":
+                arg2 = _strip_par(arg2)
+
+            s = "%s%s %s %s%s" % (lang.lpar, arg1, op, arg2, lang.rpar)
+
+        # operator has exactly one argument
+        elif pos == "prefix":
+            if name == "UNARY-":
+                s = "%s%s " % (op, args[0])
+            else:
+                s = "%s%s%s%s " % (
+                    op,
+                    lang.func_lpar,
+                    _strip_par(args[0]),
+                    lang.func_rpar,
+                )
+        else:
+            raise ValueError("Unknown operator positions: `%s`" % pos)
+
+        return s.strip()
+
+    def _format_list(self, args):
+        """ Joins the string representations of list elements to a list """
+        return "%s%s%s" % (
+            self.lang.list_lpar,
+            self.lang.list_delim.join(args),
+            self.lang.list_rpar,
+        )
+
+    def _convert_list(self, token):
+        """ Converts a possibly nested list into their string representation """
+        if isinstance(token, dict) and token["pos"] == "list":
+            return self._format_list([self._convert_list(t) for t in token["args"]])
+        return _strip_par(self._convert_to_string_rec(token))
+
     def convert_to_string(self, token):
         """ Converts token into their string representation """
         return _strip_par(self._convert_to_string_rec(token))
 
     def __call__(self, code):
-        """ Converts a completely parsed code """
+        """Converts a completely parsed code. Parser objects are recognized by
+        their attributes, such that the parser modules need not be imported"""
+        with stage("format") as info:
+            self.state = self.lang.new_state()
+            try:
+                res = self._format_code(code)
+            finally:
+                self.state = None
+            if info is not None:
+                info["size"] = len(res)
+                tree = getattr(code, "result", getattr(code, "result_nested", code))
+                info["nodes"] = count_nodes(tree)
+        return res
 
-        # Parser object for many lines
-        if isinstance(code, ParserText):
-            res = self.__call__(code.result)
+    def format_lines(self, lines):
+        """Converts the expression trees `lines` of a single code and returns
+        the list of their string representations"""
+        self.state = self.lang.new_state()
+        try:
+            return [self.convert_to_string(token) for token in lines]
+        finally:
+            self.state = None
 
-        # Parser object for one line
-        elif isinstance(code, ParserLine):
-            res = self.convert_to_string(code.result_nested)
+    def _rebase(self, code):
+        """Returns the lines of the ParserText `code` or the expression tree
+        of the ParserLine `code`, whose array indices are converted to the
+        array base of the language, if the formatter supports it. Other codes
+        are returned unchanged."""
+        if hasattr(code, "result") and hasattr(code, "parse_text"):
+            return code.result
+        if hasattr(code, "result_nested"):
+            return code.result_nested
+        return code
+
+    def _format_code(self, code):
+        """ Converts a completely parsed code recursively """
 
         # Dictionary structure of token
-        elif isinstance(code, dict):
+        if isinstance(code, dict):
             res = self.convert_to_string(code)
 
+        # Atoms, like numbers and variables
+        elif isinstance(code, str):
+            res = self.convert_to_string(code)
+
+        # Parser object for many lines
+        elif hasattr(code, "result") and hasattr(code, "parse_text"):
+            res = self._format_code(code.result)
+
+        # Parser object for one line
+        elif hasattr(code, "result_nested"):
+            res = self.convert_to_string(code.result_nested)
+
         # List of any of the above
         elif hasattr(code, "__iter__"):
-            res = [self.__call__(token) for token in code]
+            res = [self._format_code(token) for token in code]
             res = self.lang.eol.join(res)
 
-        # remaining type (possibly a string already)
+        # remaining type
         else:
             res = self.convert_to_string(code)
 
         return res
+
+    def format_groups(self, code, executor=None):
+        """Formats the code grouped into levels of statements, which do not
+        depend on each other (see DependencyGraph). Each group is preceded by a
+        comment. If `executor` is given, the statements of a group are
+        submitted as tasks to the `concurrent.futures` executor of this name,
+        which is only supported for Python."""
+        from .dependency import DependencyGraph
+
+        if executor is not None and not isinstance(self.lang, LanguagePython):
+            raise ValueError("Tasks can only be written in Python")
+
+        res = []
+        for level, lines in enumerate(DependencyGraph(code).get_groups()):
+            res.append(self.lang.comment % ("group %d" % level))
+            if executor is None or len(lines) == 1:
+                res.append(self._format_code(lines))
+            else:
+                res.extend(self._format_tasks(lines, executor))
+        return self.lang.eol.join(res)
+
+    def _format_tasks(self, lines, executor):
+        """Returns the lines of Python code submitting the statements `lines`
+        to the executor and collecting their results"""
+        futures, results = [], []
+        for k, token in enumerate(lines):
+            future = "future_%d" % k
+            if isinstance(token, dict) and token["op"] == "=":
+                target = self.convert_to_string(token["args"][0])
+                value = self.convert_to_string(token["args"][1])
+                results.append("%s = %s.result()" % (target, future))
+            else:
+                value = self.convert_to_string(token)
+                results.append("%s.result()" % future)
+            futures.append("%s = %s.submit(lambda: %s)" % (future, executor, value))
+        return futures + results
+
+
+class FormatterC(Formatter):
+    """Formatter writing C statements. Temporary variables introduced by the
+    optimization are declared as `const double`."""
+
+    def __init__(self, language=None):
+        """ Constructor """
+        if language is None:
+            language = LanguageC()
+        super(FormatterC, self).__init__(language)
+        self.renames = {}  # < replacements of variable names
+
+    def _convert_to_string_rec(self, token):
+        """ Converts a token into their string representation """
+        if not isinstance(token, dict) and token in self.renames:
+            return self.renames[token]
+        return super(FormatterC, self)._convert_to_string_rec(token)
+
+    def format_statement(self, token, declared=None):
+        """Converts the token into a C statement. Temporary variables are
+        declared when they are assigned. If `declared` is a set, all other
+        assigned variables which are not contained in it are declared as well
+        and added to the set."""
+        s = self.convert_to_string(token) + ";"
+        if isinstance(token, dict) and token["op"] == "=":
+            target = token["args"][0]
+            if not isinstance(target, dict):
+                if TEMP_PATTERN.match(target):
+                    s = "const double " + s
+                elif declared is not None and target not in declared:
+                    declared.add(target)
+                    s = "double " + s
+        return s
+
+    def _rebase(self, code):
+        """ Converts the array indices of a parsed code to start at zero """
+        return _rebase_indices(code, self.lang.array_base)
+
+    def _format_code(self, code):
+        """ Converts a completely parsed code recursively """
+        code = self._rebase(code)
+        if isinstance(code, (list, tuple)):
+            return self.lang.eol.join(self.format_statement(token) for token in code)
+        return super(FormatterC, self)._format_code(code)
+
+    def format_function(self, code, name, args, outputs=None, indent="    "):
+        """Wraps the code into a C function called `name`. The input variables
+        `args` are passed as `double`, unless an entry already contains a
+        declaration like `const double M[3][3]`. The variables given in
+        `outputs` are returned via pointers. If `outputs` is None, all assigned
+        variables except temporary ones are returned. Array indices of a
+        parsed code are converted to start at zero."""
+        code = _get_lines(self._rebase(code))
+
+        # determine the variables returned by the function
+        if outputs is None:
+            outputs = []
+            for token in code:
+                if isinstance(token, dict) and token["op"] == "=":
+                    target = token["args"][0]
+                    if (
+                        not isinstance(target, dict)
+                        and not TEMP_PATTERN.match(target)
+                        and target not in outputs
+                    ):
+                        outputs.append(target)
+
+        # build the signature
+        params = []
+        for arg in args:
+            if " " in arg or "[" in arg:
+                params.append(arg)
+            else:
+                params.append("double " + arg)
+        params.extend("double *" + output for output in outputs)
+
+        # build the body, where outputs are accessed via pointers
+        self.renames = {output: "(*%s)" % output for output in outputs}
+        declared = set(outputs) | set(arg.split("[")[0].split()[-1] for arg in args)
+        try:
+            body = []
+            for token in code:
+                body.append(indent + self.format_statement(token, declared))
+        finally:
+            self.renames = {}
+
+        lines = ["void %s(%s)" % (name, ", ".join(params)), "{"] + body + ["}"]
+        return "\n".join(lines)
+
+
+class FormatterMathematica(Formatter):
+    """Formatter writing Mathematica code. Temporary variables introduced by
+    the optimization are renamed, e.g. `t_0` to `t0`, since an underscore
+    denotes a pattern in Mathematica. If the code already uses such a name,
+    the next unused one is chosen instead."""
+
+    local_var = "t%d"  # < name of the temporary variables in Mathematica
+
+    def __init__(self, language=None):
+        """ Constructor """
+        if language is None:
+            language = LanguageMathematica()
+        super(FormatterMathematica, self).__init__(language)
+        self.renames = {}  # < replacements of variable names
+
+    def _local_names(self, code, reserved=()):
+        """Returns the names of the temporary variables of `code` in
+        Mathematica, which differ from all other variables of `code` and from
+        the names in `reserved`"""
+        from .dependency import DependencyGraph
+
+        if hasattr(code, "result_nested"):
+            code = code.result_nested
+        graph = DependencyGraph(code)
+        used = set(reserved).union(*graph.reads).union(*graph.writes)
+        temporaries = {}
+        for name in used:
+            m = TEMP_PATTERN.match(name)
+            if m:
+                temporaries[name] = int(m.group(1))
+        used.difference_update(temporaries)
+
+        names = {}
+        for name in sorted(temporaries, key=temporaries.get):
+            index = temporaries[name]
+            while self.local_var % index in used:
+                index += 1
+            names[name] = self.local_var % index
+            used.add(names[name])
+        return names
+
+    def __call__(self, code):
+        """ Converts a completely parsed code """
+        self.renames = self._local_names(code)
+        try:
+            return super(FormatterMathematica, self).__call__(code)
+        finally:
+            self.renames = {}
+
+    def _convert_to_string_rec(self, token):
+        """ Converts a token into their string representation """
+        if not isinstance(token, dict):
+            if token in self.renames:
+                return self.renames[token]
+            m = TEMP_PATTERN.match(token)
+            if m:
+                return self.local_var % int(m.group(1))
+        return super(FormatterMathematica, self)._convert_to_string_rec(token)
+
+    def _format_compile_args(self, args):
+        """ Returns the specifications of the arguments of Compile """
+        specs = []
+        for arg in args:
+            if "{" in arg or "_" in arg:
+                specs.append(arg)
+            else:
+                specs.append("{%s, _Real}" % arg)
+        return "{%s}" % ", ".join(specs)
+
+    def _array_shapes(self, code):
+        """Returns the shapes of the arrays whose elements are assigned in
+        `code`, which are given by the largest indices"""
+        shapes = {}
+        for token in code:
+            if isinstance(token, dict) and token["op"] == "=":
+                target = token["args"][0]
+                if isinstance(target, dict) and target["pos"] == "array":
+                    index = [int(i) - self.lang.array_base + 1 for i in target["args"]]
+                    shape = shapes.setdefault(target["op"], index)
+                    shapes[target["op"]] = [max(a, b) for a, b in zip(shape, index)]
+        return shapes
+
+    def format_compile(self, code, args, outputs=None, indent="  "):
+        """Wraps the code into a Compile expression with the input variables
+        `args`, which are compiled as real numbers, unless an entry already
+        gives a specification like `{M, _Real, 2}`. The compiled function
+        returns the variables given in `outputs`, as a list if there are more
+        than one. If `outputs` is None, the values of the lines without an
+        assignment and all assigned variables except temporary ones are
+        returned.
+
+        The assigned variables are local constants defined by nested With
+        blocks, such that they can be inlined by the compiler. If an element of
+        an array is assigned or a variable is assigned more than once, a
+        Module with local variables is used instead, where assigned arrays are
+        initialized with zeros. Array indices of a parsed code are converted
+        to start at one."""
+        code = _get_lines(_rebase_indices(code, self.lang.array_base))
+
+        # determine the assigned variables and the returned values
+        assigned, results = [], []
+        use_module = False
+        for token in code:
+            if isinstance(token, dict) and token["op"] == "=":
+                target = token["args"][0]
+                if isinstance(target, dict):
+                    use_module = True
+                    target = target["op"]
+                elif target in assigned:
+                    use_module = True
+                if target not in assigned:
+                    assigned.append(target)
+                    if outputs is None and not TEMP_PATTERN.match(target):
+                        results.append(target)
+            elif outputs is None:
+                results.append(token)
+        if outputs is not None:
+            results = list(outputs)
+
+        names = set(arg.strip("{}").split(",")[0].strip() for arg in args)
+        self.renames = self._local_names(list(code) + list(results), names)
+        try:
+            result = [self.convert_to_string(token) for token in results]
+            if len(result) == 1:
+                result = result[0]
+            else:
+                result = "{%s}" % ", ".join(result)
+
+            if use_module:
+                body = self._format_module(code, names, assigned, result, indent)
+            else:
+                body = self._format_with(code, result, indent)
+        finally:
+            self.renames = {}
+        return "Compile[%s,\n%s%s]" % (self._format_compile_args(args), indent, body)
+
+    def _format_with(self, code, result, indent):
+        """Returns nested With blocks defining the assigned variables of `code`
+        and returning `result`. Variables are defined in the same block unless
+        they depend on each other."""
+        from .dependency import DependencyGraph
+
+        graph = DependencyGraph(code)
+        blocks, block, bound = [], [], set()
+        for k, token in enumerate(code):
+            if not graph.writes[k]:
+                continue
+            if graph.reads[k] & bound:
+                blocks.append(block)
+                block, bound = [], set()
+            block.append(self.convert_to_string(token))
+            bound |= graph.writes[k]
+        if block:
+            blocks.append(block)
+
+        lines = []
+        for depth, block in enumerate(blocks):
+            lines.append("%sWith[{%s}," % (indent * depth, ", ".join(block)))
+        lines.append(indent * len(blocks) + result + "]" * len(blocks))
+        return ("\n" + indent).join(lines)
+
+    def _format_module(self, code, names, assigned, result, indent):
+        """Returns a Module with local variables, which executes the lines of
+        `code` and returns `result`. The arguments of Compile are given by
+        their `names`."""
+        shapes = self._array_shapes(code)
+        local = []
+        for name in assigned:
+            s = self.convert_to_string(name)
+            if name in names:  # arguments of Compile cannot be changed
+                s = "%s = %s" % (s, s)
+            elif name in shapes:
+                s = "%s = Table[0., %s]" % (
+                    s,
+                    ", ".join("{%d}" % n for n in shapes[name]),
+                )
+            local.append(s)
+
+        statements = [self.convert_to_string(token) for token in code]
+        lines = ["Module[{%s}," % ", ".join(local)]
+        lines.extend(indent + s + ";" for s in statements)
+        lines.append(indent + result + "]")
+        return ("\n" + indent).join(lines)
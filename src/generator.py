@@ -0,0 +1,124 @@
+""" Defines a class for generating random expression trees, which are mainly
+used for testing and benchmarking the parsers and the optimizer.
+
+The generated trees have the same structure as the ones produced by ParserLine,
+such that they can be formatted in any language and parsed again.
+"""
+
+import copy
+import random
+
+from .formatter import Formatter
+
+
+class ExpressionGenerator(object):
+    """Generates random expressions with a given number of operators, a
+    maximal depth and a given mix of operators"""
+
+    infix = "+-*/^"  # < operators taking two arguments
+    default_operators = {
+        "+": 3.0,
+        "-": 2.0,
+        "*": 3.0,
+        "/": 1.0,
+        "^": 0.5,
+        "sin": 0.3,
+        "cos": 0.3,
+        "exp": 0.2,
+        "sqrt": 0.2,
+    }
+
+    def __init__(
+        self,
+        operators=None,
+        variables=("x", "y", "z", "a", "b"),
+        number_prob=0.3,
+        repetition=0.0,
+        seed=None,
+    ):
+        """Initializes the generator. `operators` maps operators and function
+        names to their relative weights. Leaves are numbers with probability
+        `number_prob` and variables otherwise. `repetition` is the probability
+        that a subexpression is replaced by a copy of an earlier generated
+        subexpression of the same size, which creates common subexpressions."""
+        if operators is None:
+            operators = self.default_operators
+        self.operators = list(operators.keys())
+        self.weights = [operators[op] for op in self.operators]
+        self.variables = variables
+        self.number_prob = number_prob
+        self.repetition = repetition
+        self.random = random.Random(seed)
+        self._pool = {}  # < generated subexpressions indexed by their size
+
+    def _leaf(self):
+        """ Returns a random number or variable """
+        if self.random.random() < self.number_prob:
+            return "%.4g" % self.random.uniform(0.1, 10)
+        else:
+            return self.random.choice(self.variables)
+
+    def _tree(self, size, depth):
+        """Generates a tree with `size` operators and at most `depth` levels.
+        Returns the tree together with its actual number of levels."""
+        if size == 0:
+            return self._leaf(), 1
+
+        pool = [
+            (token, height)
+            for token, height in self._pool.get(size, [])
+            if depth is None or height <= depth
+        ]
+        if pool and self.random.random() < self.repetition:
+            token, height = self.random.choice(pool)
+            return copy.deepcopy(token), height
+
+        # maximal number of operators in the arguments, given the depth
+        capacity = size if depth is None else 2 ** (depth - 2) - 1
+        ops = [
+            (op, w)
+            for op, w in zip(self.operators, self.weights)
+            if op in self.infix or size - 1 <= capacity
+        ]
+        op = self.random.choices([o for o, _ in ops], [w for _, w in ops])[0]
+        depth_sub = None if depth is None else depth - 1
+
+        if op in self.infix:
+            size_left = self.random.randint(
+                max(0, size - 1 - capacity), min(size - 1, capacity)
+            )
+            args = [
+                self._tree(size_left, depth_sub),
+                self._tree(size - 1 - size_left, depth_sub),
+            ]
+            pos = "infix"
+        else:
+            args = [self._tree(size - 1, depth_sub)]
+            pos = "function"
+
+        token = {"op": op, "pos": pos, "args": [arg for arg, _ in args]}
+        height = 1 + max(h for _, h in args)
+        self._pool.setdefault(size, []).append((token, height))
+        return token, height
+
+    def tree(self, size, depth=None):
+        """Returns a random expression tree containing `size` operators, whose
+        depth (counting the leaves) does not exceed `depth`"""
+        if depth is not None and size > 2 ** (depth - 1) - 1:
+            raise ValueError("%d operators do not fit in depth %d" % (size, depth))
+        return self._tree(size, depth)[0]
+
+    def lines(self, count, size, depth=None, assign="v%d"):
+        """Returns a list of `count` expression trees, which are assigned to
+        variables named according to `assign` unless it is None"""
+        res = []
+        for k in range(count):
+            token = self.tree(size, depth)
+            if assign is not None:
+                token = {"op": "=", "pos": "infix", "args": [assign % k, token]}
+            res.append(token)
+        return res
+
+    def text(self, language, count, size, depth=None, assign="v%d"):
+        """ Returns the generated lines formatted in the given language """
+        return Formatter(language)(self.lines(count, size, depth, assign))
@@ -0,0 +1,189 @@
+""" Defines hooks for measuring where time is spent during a conversion.
+
+Functions registered with `add_callback` (or temporarily with `instrument`) are
+called after every stage of the conversion pipeline with the arguments
+`(name, duration, size, nodes)`. Here, `name` identifies the stage, `duration`
+is the wall time in seconds, `size` measures the input of the stage (e.g. the
+number of characters or lines) and `nodes` is the number of nodes in the
+expression trees produced or consumed by the stage. Both `size` and `nodes` may
+be None if they are not meaningful for a stage. The stages are
+
+    pre_process         LanguageBase.pre_process of a single line
+    parse               pyparsing's parseString of a single line
+    nested_structure    ParserLine.get_nested_structure
+    annotate            ParserText._annotate_expression
+    optimize_iteration  a single iteration of ParserText._optimize_once
+    format              a call of Formatter
+
+If no callback is registered, the overhead of the hooks is negligible.
+"""
+
+import sys
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from time import perf_counter as _timer
+
+# functions which are notified about every finished stage
+_callbacks = []
+
+
+def add_callback(callback):
+    """ Registers `callback` to be notified about all finished stages """
+    _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    """ Removes a callback registered with `add_callback` """
+    _callbacks.remove(callback)
+
+
+@contextmanager
+def instrument(callback):
+    """Context manager registering `callback` while the block is executed. The
+    callback is returned, such that it can be used in the `with` statement, e.g.
+    `with instrument(StageStatistics()) as stats: ...`"""
+    add_callback(callback)
+    try:
+        yield callback
+    finally:
+        remove_callback(callback)
+
+
+def is_active():
+    """ Returns whether any callback is registered """
+    return bool(_callbacks)
+
+
+@contextmanager
+def stage(name, size=None):
+    """Context manager measuring the stage `name`. If callbacks are registered,
+    a dictionary is yielded, whose entries `size` and `nodes` can be set by the
+    code inside the block. Otherwise, None is yielded and nothing is measured."""
+    if not _callbacks:
+        yield None
+        return
+
+    info = {"size": size, "nodes": None}
+    start = _timer()
+    yield info
+    duration = _timer() - start
+    for callback in list(_callbacks):
+        callback(name, duration, info["size"], info["nodes"])
+
+
+def count_nodes(tree):
+    """Counts the nodes of an expression tree, including the atoms. `tree` may
+    also be a list of trees."""
+    if isinstance(tree, dict):
+        return 1 + sum(count_nodes(arg) for arg in tree["args"])
+    elif isinstance(tree, (list, tuple)):
+        return sum(count_nodes(t) for t in tree)
+    elif tree is None or tree == "":
+        return 0
+    else:
+        return 1
+
+
+def _percentile(values, q):
+    """Returns the `q`-th percentile (with `q` between 0 and 100) of the sorted
+    list `values`, interpolating linearly between data points"""
+    if not values:
+        return None
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+class StageStatistics(object):
+    """Callback aggregating the durations, sizes and node counts of all stages.
+    Use it with `instrument` or `add_callback`. If `window` is given, only the
+    durations of the latest `window` calls of every stage are kept for the
+    minimum, maximum and percentiles, which bounds the memory of long-running
+    processes. The counts and totals always include all calls."""
+
+    percentiles = (50, 90, 99)  # < percentiles shown in the summary
+
+    def __init__(self, window=None):
+        self.window = window
+        self.durations = defaultdict(lambda: deque(maxlen=window))
+        self.counts = defaultdict(int)
+        self.totals = defaultdict(float)
+        self.sizes = defaultdict(int)
+        self.nodes = defaultdict(int)
+
+    def __call__(self, name, duration, size, nodes):
+        """ Records a finished stage """
+        self.durations[name].append(duration)
+        self.counts[name] += 1
+        self.totals[name] += duration
+        if size is not None:
+            self.sizes[name] += size
+        if nodes is not None:
+            self.nodes[name] += nodes
+
+    def clear(self):
+        """ Removes all recorded data """
+        self.durations.clear()
+        self.counts.clear()
+        self.totals.clear()
+        self.sizes.clear()
+        self.nodes.clear()
+
+    def percentile(self, name, q):
+        """ Returns the `q`-th percentile of the durations of stage `name` """
+        return _percentile(sorted(self.durations[name]), q)
+
+    def summary(self):
+        """Returns a dictionary with the statistics of all stages, which can be
+        serialized as JSON"""
+        res = {}
+        for name, durations in self.durations.items():
+            values = sorted(durations)
+            stats = {
+                "count": self.counts[name],
+                "total": self.totals[name],
+                "mean": self.totals[name] / self.counts[name],
+                "min": values[0],
+                "max": values[-1],
+                "size": self.sizes.get(name),
+                "nodes": self.nodes.get(name),
+            }
+            for q in self.percentiles:
+                stats["p%d" % q] = _percentile(values, q)
+            res[name] = stats
+        return res
+
+    def __str__(self):
+        """ Returns the summary as a table with durations in milliseconds """
+        columns = ["count", "total", "mean"] + ["p%d" % q for q in self.percentiles]
+        lines = ["%-20s" % "stage" + "".join("%12s" % c for c in columns)]
+        summary = self.summary()
+        for name in sorted(summary, key=lambda n: -summary[n]["total"]):
+            stats = summary[name]
+            line = "%-20s%12d" % (name, stats["count"])
+            line += "".join("%12.3f" % (1e3 * stats[c]) for c in columns[1:])
+            lines.append(line)
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile(filename=None, sort="cumulative", limit=30, stream=None):
+    """Context manager running cProfile while the block is executed, e.g. for
+    a single conversion. The statistics are written to `filename`, which can be
+    read with pstats, or printed to `stream` (default: stderr) if no filename
+    is given."""
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if filename is not None:
+            profiler.dump_stats(filename)
+        else:
+            stats = pstats.Stats(profiler, stream=stream or sys.stderr)
+            stats.sort_stats(sort).print_stats(limit)
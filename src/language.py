@@ -1,19 +1,9 @@
 """ This file defines the supported languages for both parsing and writing """
 
 import re
-from pyparsing import (
-    Literal,
-    CaselessLiteral,
-    Word,
-    Combine,
-    Optional,
-    nums,
-    alphas,
-    upcaseTokens,
-    replaceWith,
-    Keyword,
-    CaselessKeyword,
-)
+
+# Note that pyparsing is only imported when a grammar is built, such that
+# languages can be used for formatting without loading the parser
 
 
 def appendString(appendage):
@@ -22,6 +12,16 @@ def appendString(appendage):
     return lambda strg, loc, toks: toks[0] + appendage
 
 
+def _infix(op, arg1, arg2):
+    """ Returns the expression tree applying the infix operator `op` """
+    return {"op": op, "pos": "infix", "args": [arg1, arg2]}
+
+
+def _function(name, *args):
+    """ Returns the expression tree calling the function `name` """
+    return {"op": name, "pos": "function", "args": list(args)}
+
+
 class LanguageBase(object):
     """Base class defining a generic language.
     Derive from this class to make include your own language"""
@@ -34,16 +34,43 @@ class LanguageBase(object):
     array_lpar = "["
     array_delim = ","
     array_rpar = "]"
+    array_base = 0  # index of the first element of an array
+    list_lpar = "["
+    list_delim = ", "
+    list_rpar = "]"
+    list_constructor = "%s"  # wraps nested lists to construct an array
 
     op_assign = "="
 
     eol = "\n"  # end of line
+    statement_delim = ";"  # separates statements given on the same line
+    comment_block = None  # delimiters of block comments ignored in the input
+    comment = "# %s"  # format of comments written in the output
+
+    # infix operators which are written as functions, e.g. `pow(a, b)`
+    infix_functions = ()
+
+    # functions without an equivalent in the language, which are replaced by
+    # the expression tree returned for their arguments
+    inline_functions = {}
+    unsupported = ()  # < functions which cannot be written in the language
 
     replacements = {}
     operators = {}
 
     def get_parser_atoms(self):
         """ Function defining the atoms of the grammar """
+        from pyparsing import (
+            Literal,
+            CaselessLiteral,
+            Word,
+            Combine,
+            Optional,
+            nums,
+            alphas,
+            upcaseTokens,
+            CaselessKeyword,
+        )
 
         point = Literal(".")
         e = CaselessLiteral("E")
@@ -81,6 +108,21 @@ class LanguageBase(object):
         expression"""
         return str(s)
 
+    def new_state(self):
+        """Returns the state, which is shared by the calls of format_operator
+        while formatting a single code, or None if the language has none"""
+        return None
+
+    def format_operator(self, token, state=None):
+        """Returns the name of the operator of the expression `token`. Languages
+        may override this to choose the name depending on the arguments and on
+        the `state` created by new_state."""
+        if token["op"] in self.unsupported:
+            raise ValueError(
+                "`%s` is not supported by %s" % (token["op"], type(self).__name__)
+            )
+        return self.operators.get(token["op"], token["op"])
+
     def pre_process(self, s):
         """ Function used to pre_process an input string """
         return s
@@ -92,6 +134,8 @@ class LanguagePython(LanguageBase):
     convenience with numpy usage.
     """
 
+    list_constructor = "np.array(%s)"
+
     replacements = {
         "PI": "np.pi",
         "E": "np.e",
@@ -126,10 +170,21 @@ class LanguagePython(LanguageBase):
         super(LanguagePython, self).__init__()
         self.int2float = int2float
         # regular expression for detecting integers
-        self.pattern_int = re.compile("^[+-]?\d+$")
+        self.pattern_int = re.compile(r"^[+-]?\d+$")
 
     def get_parser_atoms(self):
         """ Function defining the atoms of the grammar """
+        from pyparsing import (
+            Literal,
+            Word,
+            Combine,
+            Optional,
+            nums,
+            replaceWith,
+            Keyword,
+            CaselessLiteral,
+        )
+
         atoms = super(LanguagePython, self).get_parser_atoms()
         atoms["exp"] = Literal("**").setParseAction(replaceWith("^"))
         atoms["consts"] = Keyword("np.pi").setParseAction(replaceWith("PI")) | Keyword(
@@ -137,15 +192,15 @@ class LanguagePython(LanguageBase):
         ).setParseAction(replaceWith("E"))
 
         if self.int2float:
+            # numbers with a point or an exponent are tried first, since the
+            # integer would otherwise match their leading digits
             point = Literal(".")
-            e = CaselessKeyword("E")
-            atoms["float"] = Word("+-" + nums, nums).setParseAction(
-                appendString(".")
-            ) | Combine(
+            e = CaselessLiteral("E")
+            exponent = e + Word("+-" + nums, nums)
+            atoms["float"] = Combine(
                 Word("+-" + nums, nums)
-                + Optional(point + Optional(Word(nums)))
-                + Optional(e + Word("+-" + nums, nums))
-            )
+                + (point + Optional(Word(nums)) + Optional(exponent) | exponent)
+            ) | Word("+-" + nums, nums).setParseAction(appendString("."))
 
         return atoms
 
@@ -156,6 +211,120 @@ class LanguagePython(LanguageBase):
             return self.replacements.get(s, str(s))
 
 
+class LanguagePythonScalar(LanguagePython):
+    """Language class writing python code for scalar values. Functions and
+    constants of the `math` module are used, or of the `cmath` module if
+    `complex` is True, which are much faster than numpy for single numbers.
+    Operations on the variables given in `arrays` and on values computed from
+    them are written using numpy. Variables assigned such values are treated
+    as arrays by the following lines of the same formatted code. Functions
+    without a scalar equivalent are taken from numpy or `scipy.special`.
+    """
+
+    list_constructor = "np.array(%s)"
+
+    scalar_operators = {
+        "^": "**",
+        "UNARY-": "-",
+        "sign": "np.sign",
+        "sin": "math.sin",
+        "cos": "math.cos",
+        "tan": "math.tan",
+        "arcsin": "math.asin",
+        "arccos": "math.acos",
+        "arctan": "math.atan",
+        "sinh": "math.sinh",
+        "cosh": "math.cosh",
+        "tanh": "math.tanh",
+        "arcsinh": "math.asinh",
+        "arccosh": "math.acosh",
+        "arctanh": "math.atanh",
+        "exp": "math.exp",
+        "ln": "math.log",
+        "log": "math.log",
+        "sqrt": "math.sqrt",
+        "trunc": "math.trunc",
+        "sphericalharmonic": "scipy.special.sph_harm",
+        "expintegrale": "scipy.special.expn",
+        "gamma": "math.gamma",
+    }  # < operators applied to scalar values
+
+    # functions of the `math` module which are also defined in `cmath`
+    complex_functions = (
+        "sin",
+        "cos",
+        "tan",
+        "asin",
+        "acos",
+        "atan",
+        "sinh",
+        "cosh",
+        "tanh",
+        "asinh",
+        "acosh",
+        "atanh",
+        "exp",
+        "log",
+        "sqrt",
+    )
+
+    def __init__(self, int2float=False, arrays=(), complex=False):
+        super(LanguagePythonScalar, self).__init__(int2float)
+        self.arrays = set(arrays)  # < variables holding numpy arrays
+        self.complex = complex
+
+        module = "cmath" if complex else "math"
+        self.replacements = {"PI": module + ".pi", "E": module + ".e"}
+        self.scalar_operators = dict(self.scalar_operators)
+        if complex:
+            for op, name in self.scalar_operators.items():
+                if name[len("math.") :] in self.complex_functions:
+                    self.scalar_operators[op] = "c" + name
+            self.scalar_operators["gamma"] = "scipy.special.gamma"
+
+    def get_parser_atoms(self):
+        """ Function defining the atoms of the grammar """
+        from pyparsing import Keyword, replaceWith
+
+        atoms = super(LanguagePythonScalar, self).get_parser_atoms()
+        for module in ("math", "cmath"):
+            atoms["consts"] |= Keyword(module + ".pi").setParseAction(
+                replaceWith("PI")
+            ) | Keyword(module + ".e").setParseAction(replaceWith("E"))
+        return atoms
+
+    def new_state(self):
+        """Returns the set of arrays, which starts with the declared ones and
+        collects the variables assigned arrays while formatting a code"""
+        return set(self.arrays)
+
+    def is_array(self, token, arrays=None):
+        """Checks whether the value of the expression `token` is an array. The
+        variables holding arrays are given by `arrays`, which defaults to the
+        declared ones."""
+        if arrays is None:
+            arrays = self.arrays
+        if isinstance(token, dict):
+            if token["pos"] == "list":
+                return True
+            if token["pos"] == "array":  # element of an array
+                return False
+            return any(self.is_array(t, arrays) for t in token["args"])
+        return token in arrays
+
+    def format_operator(self, token, state=None):
+        """Returns the numpy function if an argument of `token` is an array and
+        the scalar function otherwise. Assigned arrays are added to `state`."""
+        if token["op"] == "=":
+            target, value = token["args"]
+            if state is not None and not isinstance(target, dict):
+                if self.is_array(value, state):
+                    state.add(target)
+        elif self.is_array(token, state):
+            return self.operators.get(token["op"], token["op"])
+        return self.scalar_operators.get(token["op"], token["op"])
+
+
 class LanguageMathematica(LanguageBase):
     """ Parser for  Mathematica style formulas """
 
@@ -164,6 +333,12 @@ class LanguageMathematica(LanguageBase):
     func_rpar = "]"
     array_lpar = "[["
     array_rpar = "]]"
+    array_base = 1
+    list_lpar = "{"
+    list_rpar = "}"
+
+    comment_block = ("(*", "*)")
+    comment = "(* %s *)"
 
     replacements = {
         "PI": "Pi",
@@ -199,6 +374,8 @@ class LanguageMathematica(LanguageBase):
 
     def get_parser_atoms(self):
         """ Function defining the atoms of the grammar """
+        from pyparsing import Literal, replaceWith, Keyword
+
         atoms = super(LanguageMathematica, self).get_parser_atoms()
         atoms["assign"] = Literal("=") | Literal(":=") | Literal("==")
         atoms["consts"] = Keyword("Pi").setParseAction(replaceWith("PI")) | Keyword(
@@ -215,3 +392,107 @@ class LanguageMathematica(LanguageBase):
         # replace remaining symbols
         s = re.sub(r"\\\[(\w+)\]", lambda m: m.group(1).lower(), s)
         return s
+
+
+class LanguageC(LanguageBase):
+    """Language class with the settings for the C language. The mathematical
+    functions and constants are taken from `math.h`. Integers are written as
+    floating point numbers by default, since integer division truncates in C.
+    """
+
+    array_lpar = "["
+    array_delim = "]["
+    array_rpar = "]"
+    list_lpar = "{"
+    list_rpar = "}"
+
+    comment_block = ("/*", "*/")
+    comment = "/* %s */"
+
+    infix_functions = ("^",)
+
+    replacements = {
+        "PI": "M_PI",
+        "E": "M_E",
+    }
+    operators = {
+        "^": "pow",
+        "UNARY-": "-",
+        "abs": "fabs",
+        "sin": "sin",
+        "cos": "cos",
+        "tan": "tan",
+        "arcsin": "asin",
+        "arccos": "acos",
+        "arctan": "atan",
+        "sinh": "sinh",
+        "cosh": "cosh",
+        "tanh": "tanh",
+        "arcsinh": "asinh",
+        "arccosh": "acosh",
+        "arctanh": "atanh",
+        "exp": "exp",
+        "ln": "log",
+        "log": "log",
+        "sqrt": "sqrt",
+        "trunc": "trunc",
+        "round": "round",
+        "gamma": "tgamma",
+    }
+    inline_functions = {
+        "coth": lambda u: _infix("/", "1", _function("tanh", u)),
+        "arccoth": lambda u: _function("atanh", _infix("/", "1", u)),
+        "sign": lambda u: _infix("-", _infix(">", u, "0"), _infix("<", u, "0")),
+    }
+    unsupported = ("sphericalharmonic", "expintegrale")
+
+    def __init__(self, int2float=True):
+        super(LanguageC, self).__init__()
+        self.int2float = int2float
+        # regular expression for detecting integers
+        self.pattern_int = re.compile(r"^[+-]?\d+$")
+
+    def get_parser_atoms(self):
+        """ Function defining the atoms of the grammar """
+        from pyparsing import replaceWith, Keyword
+
+        atoms = super(LanguageC, self).get_parser_atoms()
+        atoms["consts"] = Keyword("M_PI").setParseAction(replaceWith("PI")) | Keyword(
+            "M_E"
+        ).setParseAction(replaceWith("E"))
+        return atoms
+
+    def format_atom(self, s):
+        if self.int2float and self.pattern_int.match(s):
+            return s + "."
+        else:
+            return self.replacements.get(s, str(s))
+
+
+# languages which can be selected by name, e.g. from the command line
+LANGUAGES = {
+    "python": LanguagePython,
+    "pythonscalar": LanguagePythonScalar,
+    "mathematica": LanguageMathematica,
+    "c": LanguageC,
+}
+
+
+def get_language(name, **kwargs):
+    """Returns an instance of the language called `name`. Both the short names
+    given in `LANGUAGES` and the class names, like `LanguagePython`, are
+    accepted. Additional keyword arguments are passed to the constructor."""
+    if isinstance(name, LanguageBase):
+        return name
+
+    key = name.lower()
+    if key.startswith("language"):
+        key = key[len("language") :]
+    try:
+        cls = LANGUAGES[key]
+    except KeyError:
+        raise ValueError(
+            "Unknown language `%s`. Supported languages are: %s"
+            % (name, ", ".join(sorted(LANGUAGES)))
+        )
+    return cls(**kwargs)
@@ -6,8 +6,9 @@ of the pyparsing webpage. The code was written by `Paul McGuire`.
 """
 
 import copy
-from pyparsing import Optional, ZeroOrMore, Forward, downcaseTokens
-from .language import LanguageBase
+import re
+from .language import LanguageBase, LanguagePython
+from .instrumentation import stage, count_nodes
 
 
 def _show_token(strg, loc, toks):
@@ -17,10 +18,17 @@ def _show_token(strg, loc, toks):
     print("Toks: %r" % toks)
 
 
+# regular expressions matching the atoms, which are handled without the grammar
+_PATTERN_NUMBER = r"\d+(?:\.\d*)?(?:[eE][+-]?\d+)?"
+_PATTERN_VARIABLE = r"[A-Za-z][A-Za-z0-9_]*"
+
+
 class ParserLine(object):
     """Base class describing a generic parser handling input in a 'common'
     style"""
 
+    use_fast_path = True  # < parse trivial lines without the full grammar
+
     def __init__(self, language):
         """ Initializes the parser """
 
@@ -32,7 +40,22 @@ class ParserLine(object):
         self.result_parse = []
         self.result_stack = []
         self.result_nested = None
-        self.parser = self.init_parser()
+        self._parser = None  # the grammar is built when it is first needed
+
+        # number of lines parsed by the fast path and by the full grammar
+        self.stats = {"fast": 0, "full": 0}
+        atom = "(%s|%s)" % (_PATTERN_NUMBER, _PATTERN_VARIABLE)
+        self._pattern_fast = re.compile(
+            r"\s*(?:(%s)\s*%s(?!=)\s*)?%s\s*$"
+            % (_PATTERN_VARIABLE, re.escape(language.op_assign), atom)
+        )
+
+    @property
+    def parser(self):
+        """ The grammar used for parsing, which is built on first access """
+        if self._parser is None:
+            self._parser = self.init_parser()
+        return self._parser
 
     def set_assignment(self, strg, loc, toks):
         """Helper function used to remember the variable the value is assigned
@@ -71,6 +94,7 @@ class ParserLine(object):
         term    :: factor [ multop factor ]*
         expr    :: term [ addop term ]*
         """
+        from pyparsing import Optional, ZeroOrMore, Forward, downcaseTokens
 
         atoms = self.language.get_parser_atoms()
 
@@ -137,13 +161,13 @@ class ParserLine(object):
         equation = expr + Optional(cmpop + expr).setParseAction(self.push_first)
 
         # assignment operator
-        self.parser = (
+        parser = (
             (variable ^ array).setParseAction(self.push_first)
             + atoms["assign"]
             + equation
         ).setParseAction(self._push2stack("=")) | equation
 
-        return self.parser
+        return parser
 
     def _get_nested_structure_rec(self, s, array_list=False, func_list=False):
         """ Calculates the nested structure from the expression """
@@ -230,18 +254,62 @@ class ParserLine(object):
 
         return res
 
+    def _is_atom(self, s):
+        """Checks whether the variable or number `s` is read as a plain atom by
+        the grammar. Constants and numbers, which might be converted to floats,
+        are left to the grammar."""
+        if s[0].isdigit():
+            return not (
+                isinstance(self.language, LanguagePython) and self.language.int2float
+            )
+        return s.upper() not in ("PI", "E") and s not in (
+            self.language.replacements.values()
+        )
+
+    def _parse_fast(self, s):
+        """Parses a line consisting of a single atom or of an assignment of an
+        atom to a variable. Returns False if the line is not of this form."""
+        m = self._pattern_fast.match(s)
+        if m is None:
+            return False
+        target, value = m.groups()
+        if value[0].isdigit():
+            value = value.replace("e", "E")  # the grammar reads `E` caselessly
+        if not self._is_atom(value) or (target and not self._is_atom(target)):
+            return False
+
+        if target:
+            self.result_parse = [target, self.language.op_assign, value]
+            self.result_stack = [target, value, "="]
+            self.result_nested = {"op": "=", "pos": "infix", "args": [target, value]}
+        else:
+            self.result_parse = [value]
+            self.result_stack = [value]
+            self.result_nested = value
+        return True
+
     def parse_string(self, s):
-        """ Parses a formula given as a string """
+        """Parses a formula given as a string. Lines consisting of a single atom
+        or of the assignment of an atom are parsed without the grammar, which is
+        counted in the attribute `stats`."""
         # reset cache
         self.result_stack = []
 
         # process the input string
-        s = self.language.pre_process(s)
+        with stage("pre_process", len(s)):
+            s = self.language.pre_process(s)
         if s.strip() == "":
             self.result_parse = []
             self.result_nested = ""
+        elif self.use_fast_path and self._parse_fast(s):
+            self.stats["fast"] += 1
         else:
-            self.result_parse = self.parser.parseString(s)
-            self.result_nested = self.get_nested_structure()
+            self.stats["full"] += 1
+            with stage("parse", len(s)):
+                self.result_parse = self.parser.parseString(s, parseAll=True)
+            with stage("nested_structure", len(self.result_stack)) as info:
+                self.result_nested = self.get_nested_structure()
+                if info is not None:
+                    info["nodes"] = count_nodes(self.result_nested)
 
         return self.result_nested
@@ -4,9 +4,157 @@ are calculated once and stored in a temporary variable.
 """
 
 from .parser_line import ParserLine
+from .statements import iter_statements
+from .dependency import DependencyGraph, TEMP_VAR, TEMP_PATTERN
+from .instrumentation import stage, count_nodes
 
 from collections import defaultdict
 import copy
+import heapq
+import json
+import time
+
+
+class ParseError(ValueError):
+    """Error raised when a line of a text cannot be parsed. The attributes
+    `lineno` and `column` locate the error, starting at 1, while `offset` is
+    the byte offset of the line in the input file."""
+
+    def __init__(self, message, lineno=None, column=None, offset=None):
+        self.message = message
+        self.lineno = lineno
+        self.column = column
+        self.offset = offset
+        if lineno is not None:
+            if column is not None:
+                message = "line %d, column %d: %s" % (lineno, column, message)
+            else:
+                message = "line %d: %s" % (lineno, message)
+        super(ParseError, self).__init__(message)
+
+
+def _error_message(e):
+    """ Returns a concise description of the exception `e` """
+    if hasattr(e, "col"):  # syntax errors reported by pyparsing
+        return "invalid syntax"
+    return str(e)
+
+
+def _is_assignment(token):
+    """ Checks whether `token` assigns a value to a variable """
+    return (
+        isinstance(token, dict)
+        and token["op"] == "="
+        and not isinstance(token["args"][0], dict)
+    )
+
+
+def _is_array_assignment(token):
+    """ Checks whether `token` assigns a value to an element of an array """
+    return (
+        isinstance(token, dict)
+        and token["op"] == "="
+        and isinstance(token["args"][0], dict)
+        and token["args"][0]["pos"] == "array"
+    )
+
+
+def _collect_indices(token, name, indices):
+    """Adds the indices of the elements of the array `name` accessed in `token`
+    to `indices`. Returns False if some index is not a constant."""
+    if not isinstance(token, dict):
+        return True
+    if token["pos"] == "array" and token["op"] == name:
+        try:
+            indices.append(tuple(int(i) for i in token["args"]))
+        except (TypeError, ValueError):
+            return False
+        return True
+    return all(_collect_indices(t, name, indices) for t in token["args"])
+
+
+def _get_elements(shape):
+    """ Returns the number of elements of an array with the given shape """
+    if isinstance(shape, (tuple, list)):
+        size = 1
+        for dim in shape:
+            size *= dim
+        return size
+    return shape
+
+
+def _rename(token, names):
+    """ Returns a copy of `token`, where the atoms in `names` are replaced """
+    if isinstance(token, dict):
+        token = dict(token, args=[_rename(t, names) for t in token["args"]])
+        token.pop("hash", None)
+        return token
+    return names.get(token, token)
+
+
+def _optimize_component(cls, language, lines):
+    """Eliminates the common subexpressions of `lines` using a new parser of
+    class `cls`. This function is executed by the worker processes of
+    ParserText.optimize_runtime_parallel."""
+    parser = cls(language)
+    parser.result = lines
+    parser.optimize_runtime()
+    return parser.result, parser.report
+
+
+class OptimizationReport(object):
+    """Summary of a single run of ParserText.optimize_runtime. The attribute
+    `temporaries` lists the introduced temporary variables in the order of
+    their creation. Each entry is a dictionary with the `name` of the
+    variable, the replaced `expression` (as an expression tree), the number of
+    its `occurrences` and the `saving` in the estimated cost."""
+
+    def __init__(self, language, cost_before):
+        self.language = language
+        self.temporaries = []
+        self.cost_before = cost_before
+        self.cost_after = cost_before
+        self.iteration_times = []  # < wall time of every iteration in seconds
+        self.dropped = []  # < variables whose unused assignments were removed
+        self.converged = False  # < whether no further saving could be found
+        self.limit = None  # < name of the limit which stopped the optimization
+        self.peak_live = None  # < live temporaries before and after scheduling
+
+    @property
+    def iterations(self):
+        """ The number of iterations of the optimizer """
+        return len(self.iteration_times)
+
+    def to_dict(self):
+        """Returns the report as a dictionary of basic types. The replaced
+        expressions are formatted in the language of the parser."""
+        from .formatter import Formatter
+
+        formatter = Formatter(self.language)
+        return {
+            "cost_before": self.cost_before,
+            "cost_after": self.cost_after,
+            "iterations": self.iterations,
+            "iteration_times": self.iteration_times,
+            "dropped": self.dropped,
+            "converged": self.converged,
+            "limit": self.limit,
+            "peak_live": self.peak_live,
+            "temporaries": [
+                {
+                    "name": temporary["name"],
+                    "expression": formatter(temporary["expression"]),
+                    "occurrences": temporary["occurrences"],
+                    "saving": temporary["saving"],
+                    "size": temporary.get("size", 1),
+                }
+                for temporary in self.temporaries
+            ],
+        }
+
+    def to_json(self, **kwargs):
+        """ Returns the report as a JSON string """
+        return json.dumps(self.to_dict(), **kwargs)
 
 
 class ParserText(object):
@@ -16,6 +164,7 @@ class ParserText(object):
     costs = {
         "UNARY-": 0.0,
         "array": 0.0,
+        "list": 0.0,
         "-": 1.0,
         "+": 1.0,
         "*": 1.0,
@@ -25,7 +174,8 @@ class ParserText(object):
         "exp": 3.0,
     }  # < costs for known operations
     optimize_threshold = 5.0  # < least saving to actually perform an optimization
-    temp_var = "t_%d"  # < name of the temporary variables used for optimization
+    temp_var = TEMP_VAR  # < name of the temporary variables used for optimization
+    temp_pattern = TEMP_PATTERN  # < pattern matching the temporary variables
 
     def __init__(self, language):
 
@@ -35,8 +185,11 @@ class ParserText(object):
 
         # iterator counting the number of temporary variables
         self.temp_count = 0
-        # used for looking for variables
-        self.temp_pattern = None
+        # summary of the last optimization
+        self.report = None
+        # number of elements of the variables, if the costs are shape-aware
+        self._sizes = None
+        self.shapes = None
 
     def parse_text(self, text):
         """Parses many formulas given as individual lines and returns a list
@@ -45,32 +198,130 @@ class ParserText(object):
         self.result = []
         for s in text.split("\n"):
             if s != "" and not s.isspace():
-                self.parser.parse_string(s)
-                self.result.append(self.parser.get_nested_structure())
+                self.result.append(self.parser.parse_string(s))
+
+        return self.result
+
+    def iter_statements(self, lines):
+        """Joins and splits the given lines into complete statements using the
+        separators and comments of the language. Yields tuples of the line
+        number where a statement starts and the statement."""
+        language = self.parser.language
+        return iter_statements(
+            lines, language.statement_delim, language.comment_block
+        )
+
+    def _parse_lines(self, lines, errors=None, placeholder=None, columns=True):
+        """Parses the formulas given as tuples of the line number, the offset
+        and the string. Failures are raised as ParseError unless `errors` is a
+        list, to which they are appended instead. Failed lines are then
+        replaced by `placeholder` or skipped if it is None. Columns are only
+        reported if `columns` is True, since they refer to the parsed string."""
+
+        self.result = []
+        for lineno, offset, s in lines:
+            if isinstance(s, ParseError):  # line could not be read
+                error = s
+            elif s == "" or s.isspace():
+                continue
+            else:
+                try:
+                    self.result.append(self.parser.parse_string(s))
+                    continue
+                except Exception as e:
+                    column = getattr(e, "col", None) if columns else None
+                    error = ParseError(_error_message(e), lineno, column, offset)
+            if errors is None:
+                raise error
+            errors.append(error)
+            if placeholder is not None:
+                self.result.append(copy.deepcopy(placeholder))
 
         return self.result
 
+    def parse_statements(self, text):
+        """Parses many formulas, which may span several lines and may be
+        separated by `;`. Statements continue on the next line as long as
+        brackets are open or a line ends with an operator. Errors are reported
+        as ParseError with the line where the statement starts."""
+        lines = self.iter_statements(text.split("\n"))
+        return self._parse_lines(
+            ((lineno, None, s) for lineno, s in lines), columns=False
+        )
+
+    def parse_text_lenient(self, text, placeholder=None, statements=False):
+        """Parses many formulas like `parse_text` without stopping at lines
+        which cannot be parsed. Such lines are replaced by `placeholder` or
+        skipped if it is None. If `statements` is True, the formulas are split
+        as in `parse_statements`. Returns the list of tokens and the list of
+        ParseError describing the failed lines."""
+        errors = []
+        if statements:
+            lines = self.iter_statements(text.split("\n"))
+            lines = ((lineno, None, s) for lineno, s in lines)
+        else:
+            lines = ((lineno, None, s) for lineno, s in enumerate(text.split("\n"), 1))
+        self._parse_lines(lines, errors, placeholder, not statements)
+        return self.result, errors
+
+    def parse_file(
+        self, path, encoding="utf-8", statements=False, errors=None, placeholder=None
+    ):
+        """Parses the formulas given as individual lines of the file `path`.
+        The file is memory-mapped and read line by line, such that only the
+        parsed formulas are kept in memory. If `statements` is True, formulas
+        may span several lines as in `parse_statements`. Errors are reported
+        as ParseError with the location of the offending line. If `errors` is
+        a list, they are appended to it instead and the failed lines are
+        replaced by `placeholder` or skipped if it is None."""
+        from .reader import MappedTextReader
+
+        with MappedTextReader(path, encoding) as reader:
+            if statements:
+                lines = (
+                    (lineno, None, s)
+                    for lineno, s in self.iter_statements(reader.lines(errors))
+                )
+            else:
+                lines = reader.items(errors is None)
+            return self._parse_lines(lines, errors, placeholder, not statements)
+
+    def _get_size(self, token):
+        """ Returns the number of elements of the value of `token` """
+        if isinstance(token, dict):
+            return token.get("size", 1)
+        return self._sizes.get(token, 1)
+
     def _calculate_costs_rec(self, token):
-        """ Calculates the cost and the hash of each subexpression """
+        """Calculates the cost and the hash of each subexpression. If shapes
+        have been declared, the cost of an operation is multiplied by the
+        number of elements it acts on, which is stored as `size`."""
 
         if isinstance(token, dict):
 
             if token["pos"] == "array":
-                token_cost = self.costs.get(token["pos"], self.default_cost)
+                op_cost = self.costs.get(token["pos"], self.default_cost)
             else:
-                token_cost = self.costs.get(token["op"], self.default_cost)
+                op_cost = self.costs.get(token["op"], self.default_cost)
+            token_cost = 0.0
             token_hash = str(hash(token["op"]))
 
             args = []
+            size = 1
             for t in token["args"]:
                 t, dc, dh = self._calculate_costs_rec(t)
                 args.append(t)
                 token_cost += dc
                 token_hash += str(dh)
+                if self._sizes is not None and token["pos"] != "array":
+                    size = max(size, self._get_size(t))
 
+            if self._sizes is not None:
+                token["size"] = size
             token["args"] = args
-            token["cost"] = token_cost
+            token["cost"] = token_cost + op_cost * size
             token["hash"] = hash(token_hash)
+            token_cost = token["cost"]
 
         else:
             token_cost = 0.0
@@ -81,12 +332,21 @@ class ParserText(object):
     def _annotate_expression(self, lines):
         """ Calculates the cost and the hash of all expressions """
 
-        cost = 0.0
-        lines_annotated = []
-        for line in lines:
-            res, dc, _ = self._calculate_costs_rec(line)
-            lines_annotated.append(res)
-            cost += dc
+        with stage("annotate", len(lines)) as info:
+            if self.shapes is not None:
+                self._sizes = dict(self.shapes)
+            cost = 0.0
+            lines_annotated = []
+            for line in lines:
+                res, dc, _ = self._calculate_costs_rec(line)
+                lines_annotated.append(res)
+                cost += dc
+                if self._sizes is not None and _is_assignment(res):
+                    # the size of the assigned variable is used in later lines
+                    self._sizes[res["args"][0]] = self._get_size(res["args"][1])
+
+            if info is not None:
+                info["nodes"] = count_nodes(lines_annotated)
 
         return lines_annotated, cost
 
@@ -126,7 +386,7 @@ class ParserText(object):
             if count < 2:
                 del costs[hash_id]
 
-        return costs
+        return costs, counter
 
     def _replace_subexpressions(self, token, hash_replace, hash_token, replacement):
         """Replaces the subexpression with the hash `hash_replace` in the
@@ -153,21 +413,23 @@ class ParserText(object):
 
     def _optimize_once(self, lines):
         """Tries to find a common subexpression which migth be put in front
-        of the formula definition"""
+        of the formula definition. Returns the new lines, the saving and a
+        dictionary describing the introduced temporary variable, which is
+        None if no optimization was performed"""
 
         lines, cost = self._annotate_expression(lines)
         if cost < self.optimize_threshold:
-            return lines, 0.0
+            return lines, 0.0, None
 
         # build a hash map with possible savings
-        costs = self._costs_subexpressions(lines)
+        costs, counter = self._costs_subexpressions(lines)
         if len(costs) == 0:
-            return lines, 0.0
+            return lines, 0.0, None
 
         # find the hash with the maximum saving
         hash_replace = max(costs, key=costs.get)
         if costs[hash_replace] - self.costs["="] < self.optimize_threshold:
-            return lines, 0.0
+            return lines, 0.0, None
 
         # find the dictionaries with the respective hash and replace them by
         temp_var = self.temp_var % self.temp_count
@@ -190,24 +452,598 @@ class ParserText(object):
             first_line, {"op": "=", "pos": "infix", "args": [temp_var, hash_token]}
         )
         res, cost_new = self._annotate_expression(res)
-        return res, cost - cost_new
+        temporary = {
+            "name": temp_var,
+            "expression": hash_token,
+            "occurrences": counter[hash_replace],
+            "saving": cost - cost_new,
+        }
+        if self._sizes is not None:
+            temporary["size"] = self._get_size(hash_token)
+        return res, cost - cost_new, temporary
+
+    def _infix(self, op, arg1, arg2):
+        """ Returns an infix operation whose size is known """
+        token = {"op": op, "pos": "infix", "args": [arg1, arg2]}
+        token["size"] = max(self._get_size(arg1), self._get_size(arg2))
+        return token
+
+    def _factors(self, token):
+        """Returns the factors of a chain of multiplications and divisions as
+        tuples of the factor and a flag whether it divides"""
+        if isinstance(token, dict) and token["pos"] == "infix":
+            if token["op"] == "*":
+                return self._factors(token["args"][0]) + self._factors(token["args"][1])
+            if token["op"] == "/":
+                return self._factors(token["args"][0]) + [(token["args"][1], True)]
+        return [(token, False)]
+
+    def _product(self, factors):
+        """ Returns the product of a non-empty list of factors """
+        res = factors[0]
+        for factor in factors[1:]:
+            res = self._infix("*", res, factor)
+        return res
+
+    def _reassociate(self, token):
+        """Reorders chains of multiplications and divisions, such that factors
+        with a single element are combined before arrays are involved, e.g.
+        `2 * x * k` becomes `(2 * k) * x` if `x` is an array"""
+        if not isinstance(token, dict):
+            return token
+
+        factors = self._factors(token)
+        if len(factors) == 1:
+            token["args"] = [self._reassociate(t) for t in token["args"]]
+            return token
+
+        factors = [(self._reassociate(t), divides) for t, divides in factors]
+        scalar = [(t, d) for t, d in factors if self._get_size(t) == 1]
+        if len(scalar) < 2 or len(scalar) == len(factors):
+            # grouping does not reduce the number of operations on arrays
+            res = factors[0][0]
+            for t, divides in factors[1:]:
+                res = self._infix("/" if divides else "*", res, t)
+            return res
+
+        scalar_num = [t for t, d in scalar if not d]
+        scalar_den = [t for t, d in scalar if d]
+        array_num = [t for t, d in factors if not d and self._get_size(t) > 1]
+        array_den = [t for t, d in factors if d and self._get_size(t) > 1]
+
+        # combine all factors with a single element
+        if scalar_num:
+            res = self._product(scalar_num)
+            if scalar_den:
+                res = self._infix("/", res, self._product(scalar_den))
+                scalar_den = []
+            if array_num:
+                res = self._infix("*", res, self._product(array_num))
+        else:
+            res = self._product(array_num)
+
+        for t in array_den:
+            res = self._infix("/", res, t)
+        if scalar_den:
+            res = self._infix("/", res, self._product(scalar_den))
+        return res
+
+    def _is_scalar(self, token):
+        """ Checks whether `token` is an operation with a single element """
+        return (
+            isinstance(token, dict)
+            and token["pos"] != "array"
+            and self._get_size(token) == 1
+        )
+
+    def _count_scalars_rec(self, token, scalars):
+        """Counts the subexpressions with a single element, which are arguments
+        of operations on arrays. `scalars` maps their hash to a temporary."""
+        if not isinstance(token, dict) or self._get_size(token) == 1:
+            return
+        for t in token["args"]:
+            if self._is_scalar(t):
+                if t["hash"] in scalars:
+                    scalars[t["hash"]]["occurrences"] += 1
+                else:
+                    scalars[t["hash"]] = {
+                        "name": None,
+                        "expression": t,
+                        "occurrences": 1,
+                        "saving": 0.0,
+                        "size": 1,
+                    }
+            else:
+                self._count_scalars_rec(t, scalars)
+
+    def _hoist_scalars_rec(self, token, hoisted, definitions):
+        """Replaces the subexpressions with a single element contained in
+        `hoisted`, which are arguments of operations on arrays, by temporary
+        variables"""
+        if not isinstance(token, dict) or self._get_size(token) == 1:
+            return token
+
+        args = []
+        for t in token["args"]:
+            if self._is_scalar(t) and t["hash"] in hoisted:
+                temporary = hoisted[t["hash"]]
+                if temporary["name"] is None:
+                    temporary["name"] = self.temp_var % self.temp_count
+                    self.temp_count += 1
+                    self.report.temporaries.append(temporary)
+                    definitions.append(
+                        {"op": "=", "pos": "infix", "args": [temporary["name"], t]}
+                    )
+                t = temporary["name"]
+            else:
+                t = self._hoist_scalars_rec(t, hoisted, definitions)
+            args.append(t)
+        token["args"] = args
+        return token
 
-    def optimize_runtime(self):
+    def _hoist_scalars(self, lines):
+        """Reassociates products, such that subexpressions with a single
+        element are evaluated before they enter operations on arrays. Those
+        which occur more than once are moved to temporary variables defined
+        before the line they are first used in, if this saves more than the
+        cost of the assignment."""
+        lines = [self._reassociate(line) for line in lines]
+        lines = self._annotate_expression(lines)[0]
+
+        # a temporary saves evaluating the value at all but one occurrence
+        scalars = {}
+        for line in lines:
+            self._count_scalars_rec(line, scalars)
+        hoisted = {}  # < temporary variables indexed by the hash of their value
+        cost_assign = self.costs.get("=", self.default_cost)
+        for key, temporary in scalars.items():
+            cost = temporary["expression"]["cost"]
+            temporary["saving"] = (temporary["occurrences"] - 1) * cost - cost_assign
+            if temporary["saving"] > 0:
+                hoisted[key] = temporary
+
+        res = []
+        for line in lines:
+            definitions = []
+            line = self._hoist_scalars_rec(line, hoisted, definitions)
+            res.extend(definitions)
+            res.append(line)
+        return res
+
+    def _assemble_array(self, elements, ndim):
+        """Returns a (nested) list node containing the values of `elements`,
+        which maps zero-based indices to expressions. Returns None if some of
+        the elements are missing."""
+        shape = [1 + max(index[d] for index in elements) for d in range(ndim)]
+        size = 1
+        for dim in shape:
+            size *= dim
+        if len(elements) != size or any(min(index) < 0 for index in elements):
+            return None
+
+        def build(prefix):
+            if len(prefix) == ndim:
+                return elements[prefix]
+            args = [build(prefix + (i,)) for i in range(shape[len(prefix)])]
+            return {"op": "list", "pos": "list", "args": args}
+
+        return build(())
+
+    def _accesses_within(self, name, elements, lines):
+        """Checks whether `lines` only access elements of the array `name`
+        with the zero-based indices given by `elements`"""
+        indices = []
+        if not all(_collect_indices(line, name, indices) for line in lines):
+            return False
+        if indices and self.parser.language.array_base != 0:
+            return False  # the indices of the list would differ
+        return all(index in elements for index in indices)
+
+    def vectorize_arrays(self):
+        """Replaces blocks of consecutive lines assigning all elements of an
+        array, like `C[0,0] = a`, `C[0,1] = b`, ..., by a single line
+        constructing the array from a (nested) list of its elements. Common
+        subexpressions of the elements can then be eliminated together by
+        `optimize_runtime`. Returns the names of the assembled arrays.
+
+        Arrays used before the block, which may be larger inputs, and arrays
+        whose later accesses are not within the block are left alone. Since the
+        list is indexed from zero, arrays are only assembled for languages with
+        a different array base if they are not accessed after the block."""
+
+        base = self.parser.language.array_base
+        lines = self.result
+        graph = DependencyGraph(lines)
+        used = set()  # < variables read or written by the earlier lines
+        res, arrays = [], []
+        k = 0
+        while k < len(lines):
+            line = lines[k]
+            if not _is_array_assignment(line):
+                res.append(line)
+                used.update(graph.reads[k], graph.writes[k])
+                k += 1
+                continue
+
+            # collect the consecutive assignments to elements of the array
+            name = line["args"][0]["op"]
+            ndim = len(line["args"][0]["args"])
+            elements = {}
+            end = k
+            while end < len(lines) and _is_array_assignment(lines[end]):
+                target, value = lines[end]["args"]
+                try:
+                    index = tuple(int(i) - base for i in target["args"])
+                except (TypeError, ValueError):  # index is not a constant
+                    break
+                if target["op"] != name or len(index) != ndim or index in elements:
+                    break
+                elements[index] = value
+                end += 1
+            end = max(end, k + 1)
+
+            node = self._assemble_array(elements, ndim) if elements else None
+            reads = set().union(*DependencyGraph(list(elements.values())).reads)
+            if len(elements) < 2 or name in reads or name in used:
+                node = None
+            elif not self._accesses_within(name, elements, lines[end:]):
+                node = None
+
+            if node is None:
+                res.extend(lines[k:end])
+            else:
+                res.append({"op": "=", "pos": "infix", "args": [name, node]})
+                arrays.append(name)
+            for j in range(k, end):
+                used.update(graph.reads[j], graph.writes[j])
+            k = end
+
+        self.result = res
+        return arrays
+
+    def eliminate_dead_code(self, outputs):
+        """Removes all assignments which do not contribute to the variables
+        given in `outputs`. Lines without an assignment are always kept. Returns
+        the list of removed lines."""
+
+        graph = DependencyGraph(self.result)
+        live = set(outputs)
+        keep = [True] * len(graph.lines)
+        for k in reversed(range(len(graph.lines))):
+            writes = graph.writes[k]
+            if writes and not writes & live:
+                keep[k] = False
+                continue
+            if _is_assignment(graph.lines[k]):
+                live -= writes
+            live |= graph.reads[k]
+
+        self.result = [line for line, kept in zip(graph.lines, keep) if kept]
+        return [line for line, kept in zip(graph.lines, keep) if not kept]
+
+    def _is_temporary(self, name):
+        """ Checks whether `name` is a temporary variable of the optimization """
+        return self.temp_pattern.match(name) is not None
+
+    def _count_reads(self, graph):
+        """ Returns the number of lines reading each temporary variable """
+        reads = defaultdict(int)
+        for names in graph.reads:
+            for name in names:
+                if self._is_temporary(name):
+                    reads[name] += 1
+        return reads
+
+    def peak_live(self, lines=None):
+        """Returns the maximal number of temporary variables, which are live at
+        the same time when `lines` (by default the parsed code) are executed. A
+        temporary variable is live from its assignment up to its last use."""
+        if lines is None:
+            lines = self.result
+        graph = DependencyGraph(lines)
+        remaining = self._count_reads(graph)
+        live = set()
+        peak = 0
+        for reads, writes in zip(graph.reads, graph.writes):
+            defined = set(name for name in writes if self._is_temporary(name))
+            peak = max(peak, len(live | defined))
+            for name in reads & live:
+                remaining[name] -= 1
+                if remaining[name] == 0:
+                    live.remove(name)
+            live.update(name for name in defined if remaining[name] > 0)
+        return peak
+
+    def schedule_statements(self):
+        """Reorders independent lines, such that fewer temporary variables are
+        live at the same time. The lines are scheduled one by one using the
+        dependencies determined by DependencyGraph. Among the lines whose
+        dependencies have been scheduled, the one freeing the most temporary
+        variables and defining the fewest is chosen, where ties are broken by
+        the original order. Lines without an assignment, whose values are the
+        output, keep their relative order. Returns the peak number of live
+        temporary variables before and after scheduling."""
+
+        graph = DependencyGraph(self.result)
+        count = len(graph.lines)
+        peak_before = self.peak_live(graph.lines)
+
+        dependencies = [set(d) for d in graph.dependencies]
+        previous = None
+        for k in range(count):
+            if not graph.writes[k]:
+                if previous is not None:
+                    dependencies[k].add(previous)
+                previous = k
+        dependents = [[] for _ in range(count)]
+        for k, deps in enumerate(dependencies):
+            for i in deps:
+                dependents[i].append(k)
+        waiting = [len(deps) for deps in dependencies]
+
+        remaining = self._count_reads(graph)  # < unscheduled reads of temporaries
+        readers = defaultdict(list)  # < lines reading a temporary variable
+        for k, reads in enumerate(graph.reads):
+            for name in reads:
+                if name in remaining:
+                    readers[name].append(k)
+
+        def priority(k):
+            freed = sum(remaining[name] == 1 for name in graph.reads[k] & live)
+            defined = sum(remaining[name] > 0 for name in graph.writes[k])
+            return defined - freed
+
+        # lines which are ready, ordered by their priority and index
+        live = set()
+        ready = [(priority(k), k) for k in range(count) if waiting[k] == 0]
+        heapq.heapify(ready)
+        scheduled = [False] * count
+        order = []
+        while ready:
+            score, k = heapq.heappop(ready)
+            if scheduled[k]:
+                continue
+            if score != priority(k):  # outdated entry
+                heapq.heappush(ready, (priority(k), k))
+                continue
+            scheduled[k] = True
+            order.append(k)
+
+            changed = set()
+            for name in graph.reads[k] & live:
+                remaining[name] -= 1
+                if remaining[name] == 0:
+                    live.remove(name)
+                elif remaining[name] == 1:
+                    changed.update(readers[name])
+            live.update(name for name in graph.writes[k] if remaining[name] > 0)
+            for i in dependents[k]:
+                waiting[i] -= 1
+                if waiting[i] == 0:
+                    changed.add(i)
+            for i in changed:
+                if waiting[i] == 0 and not scheduled[i]:
+                    heapq.heappush(ready, (priority(i), i))
+
+        self.result = [graph.lines[k] for k in order]
+        return peak_before, self.peak_live(self.result)
+
+    def optimize_runtime(
+        self,
+        shapes=None,
+        outputs=None,
+        max_time=None,
+        max_iterations=None,
+        max_temporaries=None,
+        callback=None,
+        schedule=False,
+    ):
         """Optimizes the list of formulas by calculating subexpressions and
-        assigning them to temporary variables"""
+        assigning them to temporary variables. A summary of the optimization is
+        stored in the attribute `report`.
+
+        `shapes` may map variables to their number of elements or their shape.
+        The cost of an operation then scales with the number of elements and
+        variables which are not given are treated as scalars. Products are
+        additionally reassociated, such that scalars are multiplied before they
+        enter operations on arrays, and subexpressions involving only scalars,
+        which are used repeatedly, are moved to temporary variables.
+
+        If `outputs` is given, assignments which do not contribute to these
+        variables are removed before the optimization.
+
+        The optimization can be bounded by the wall time `max_time` in seconds,
+        the number of iterations `max_iterations` and the number of temporary
+        variables `max_temporaries`. The function `callback` is called with the
+        report after every iteration and stops the optimization by returning
+        True. If the optimization is stopped early, the result of the last
+        iteration is kept and the attribute `limit` of the report names the
+        reason, while `converged` is False.
+
+        If `schedule` is True, the lines are finally reordered by
+        `schedule_statements` to reduce the number of temporary variables live
+        at the same time, which is stored in the attribute `peak_live` of the
+        report.
+        """
 
         # prepare optimization
         self.temp_count = 0
-        lines = copy.copy(self.result)
+        if shapes is not None:
+            self.shapes = {
+                name: _get_elements(shape) for name, shape in shapes.items()
+            }
+        limits = {
+            "max_time": max_time,
+            "max_iterations": max_iterations,
+            "max_temporaries": max_temporaries,
+            "callback": callback,
+        }
+        try:
+            self._optimize_runtime(outputs, limits)
+        finally:
+            self.shapes = self._sizes = None
+        if schedule:
+            before, after = self.schedule_statements()
+            self.report.peak_live = {"before": before, "after": after}
+        return self.result
+
+    def _collect_hashes(self, token, hashes):
+        """ Adds the hashes of all subexpressions of `token` to `hashes` """
+        if isinstance(token, dict):
+            hashes.add(token["hash"])
+            for t in token["args"]:
+                self._collect_hashes(t, hashes)
+        return hashes
+
+    def _components(self, lines):
+        """Splits the annotated lines into groups, which do not share any
+        subexpression that might be replaced by a temporary variable. Returns
+        the lists of the indices of the lines in every group."""
+        costs, _ = self._costs_subexpressions(lines)
+        candidates = set(
+            hash_id
+            for hash_id, cost in costs.items()
+            if cost - self.costs["="] >= self.optimize_threshold
+        )
+
+        # join lines sharing a candidate using a union-find structure
+        parent = list(range(len(lines)))
+
+        def find(k):
+            while parent[k] != k:
+                parent[k] = parent[parent[k]]
+                k = parent[k]
+            return k
+
+        owner = {}  # < first line containing a subexpression
+        for k, line in enumerate(lines):
+            for hash_id in self._collect_hashes(line, set()) & candidates:
+                if hash_id in owner:
+                    parent[find(k)] = find(owner[hash_id])
+                else:
+                    owner[hash_id] = k
+
+        groups = defaultdict(list)
+        for k in range(len(lines)):
+            groups[find(k)].append(k)
+        return sorted(groups.values())
+
+    def optimize_runtime_parallel(self, workers=None):
+        """Optimizes the formulas like `optimize_runtime`, but splits them into
+        groups of lines not sharing any subexpression, which are optimized
+        independently by `workers` processes. The temporary variables of all
+        groups are renamed to be unique and defined right before the line in
+        which they are first used. Shapes, outputs and limits are not supported
+        in this mode."""
+
+        self.temp_count = 0
+        lines, cost = self._annotate_expression(copy.deepcopy(self.result))
+        self.report = OptimizationReport(self.parser.language, cost)
+        components = self._components(lines)
+        jobs = [[lines[k] for k in component] for component in components]
+
+        cls, language = type(self), self.parser.language
+        if workers == 1 or len(jobs) < 2:
+            results = [_optimize_component(cls, language, job) for job in jobs]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            from itertools import repeat
+
+            with ProcessPoolExecutor(workers) as executor:
+                results = list(
+                    executor.map(
+                        _optimize_component, repeat(cls), repeat(language), jobs
+                    )
+                )
+
+        # merge the results, keeping the order of the original lines
+        definitions = [[] for _ in lines]  # < temporaries defined before a line
+        merged = list(lines)
+        self.report.converged = True
+        for component, (res, report) in zip(components, results):
+            names = {}
+            for temporary in report.temporaries:
+                names[temporary["name"]] = self.temp_var % self.temp_count
+                self.temp_count += 1
+            for temporary in report.temporaries:
+                temporary = dict(temporary, name=names[temporary["name"]])
+                temporary["expression"] = _rename(temporary["expression"], names)
+                self.report.temporaries.append(temporary)
+            self.report.iteration_times.extend(report.iteration_times)
+            self.report.converged &= report.converged
+
+            pending = []
+            indices = iter(component)
+            for line in res:
+                if _is_assignment(line) and line["args"][0] in names:
+                    pending.append(_rename(line, names))
+                else:
+                    k = next(indices)
+                    definitions[k] = pending
+                    merged[k] = _rename(line, names)
+                    pending = []
+
+        result = []
+        for k, line in enumerate(merged):
+            result.extend(definitions[k])
+            result.append(line)
+        self.result, self.report.cost_after = self._annotate_expression(result)
+        return self.result
+
+    def _check_limits(self, limits, start):
+        """ Returns the name of the first limit which has been reached or None """
+        callback = limits["callback"]
+        if callback is not None and self.report.iterations and callback(self.report):
+            return "callback"
+        if limits["max_time"] is not None and time.time() - start >= limits["max_time"]:
+            return "max_time"
+        max_iterations = limits["max_iterations"]
+        if max_iterations is not None and self.report.iterations >= max_iterations:
+            return "max_iterations"
+        max_temporaries = limits["max_temporaries"]
+        if max_temporaries is not None and self.temp_count >= max_temporaries:
+            return "max_temporaries"
+        return None
+
+    def _optimize_runtime(self, outputs, limits):
+        """ Performs the optimization described in `optimize_runtime` """
+        start_all = time.time()
+        lines, cost = self._annotate_expression(copy.deepcopy(self.result))
+        self.report = OptimizationReport(self.parser.language, cost)
+        if outputs is not None:
+            self.result = lines
+            for line in self.eliminate_dead_code(outputs):
+                target = line["args"][0]
+                if isinstance(target, dict):
+                    target = target["op"]
+                self.report.dropped.append(target)
+            lines = self._annotate_expression(self.result)[0]
+        if self.shapes is not None:
+            lines = self._hoist_scalars(lines)
 
         # do the optimization iteration
         while True:
-            lines_new, savings = self._optimize_once(copy.deepcopy(lines))
+            self.report.limit = self._check_limits(limits, start_all)
+            if self.report.limit is not None:
+                break
+
+            start = time.time()
+            with stage("optimize_iteration", len(lines)) as info:
+                lines_new, savings, temporary = self._optimize_once(
+                    copy.deepcopy(lines)
+                )
+                if info is not None:
+                    info["nodes"] = count_nodes(lines_new)
+            self.report.iteration_times.append(time.time() - start)
+
             if savings > self.optimize_threshold:
                 self.temp_count += 1
+                self.report.temporaries.append(temporary)
                 lines = lines_new
             else:
+                self.report.converged = True
                 break
 
         self.result = lines
+        self.report.cost_after = self._annotate_expression(lines)[1]
         return self.result
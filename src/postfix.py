@@ -0,0 +1,375 @@
+""" Defines a flat encoding of expression trees as postfix programs.
+
+The nested dictionaries produced by ParserLine are convenient, but slow to
+traverse and to pickle between processes. A PostfixProgram stores the nodes of
+many lines in post-order in a few integer buffers:
+
+    kinds     position of the node, see POSITIONS (0 for atoms)
+    values    index of the operator or the atom in the string table
+    arity     number of arguments of the node
+    sizes     number of nodes of the subtree ending at the node
+
+The arguments of a node precede it, such that its last argument ends right
+before it and the subtree of node `i` occupies `i - sizes[i] + 1` to `i`. Atoms
+and operators are interned in a shared string table. Slices of programs and
+programs attached to shared memory use views of the buffers without copying.
+Costs, hashes and formatted strings are computed by linear scans.
+"""
+
+from array import array
+
+from .dependency import _get_lines
+from .formatter import Formatter, _strip_par
+from .language import LanguageBase
+
+POSITIONS = ("atom", "infix", "prefix", "function", "array", "list")
+_KIND = {pos: kind for kind, pos in enumerate(POSITIONS)}
+_ATOM, _INFIX, _PREFIX, _FUNCTION, _ARRAY, _LIST = range(len(POSITIONS))
+
+_FIELDS = ("kinds", "values", "arity", "sizes")
+
+
+class PostfixProgram(object):
+    """Flat representation of a list of expression trees. The attribute
+    `line_ends` holds the index after the last node of every line."""
+
+    def __init__(self, strings=None):
+        self.strings = [] if strings is None else strings  # < string table
+        self._index = {s: k for k, s in enumerate(self.strings)}
+        self.kinds = array("i")
+        self.values = array("i")
+        self.arity = array("i")
+        self.sizes = array("i")
+        self.line_ends = array("i")
+        self._shm = None  # < shared memory holding the buffers
+
+    def __len__(self):
+        """ Returns the number of lines """
+        return len(self.line_ends)
+
+    @property
+    def nodes(self):
+        """ The total number of nodes """
+        return len(self.kinds)
+
+    def intern(self, s):
+        """ Returns the index of the string `s` in the string table """
+        try:
+            return self._index[s]
+        except KeyError:
+            self._index[s] = len(self.strings)
+            self.strings.append(s)
+            return self._index[s]
+
+    def _append(self, kind, value, arity, size):
+        """ Appends a single node """
+        self.kinds.append(kind)
+        self.values.append(self.intern(value))
+        self.arity.append(arity)
+        self.sizes.append(size)
+
+    def _append_tree(self, token):
+        """ Appends the nodes of a tree in post-order and returns their number """
+        if not isinstance(token, dict):
+            self._append(_ATOM, token, 0, 1)
+            return 1
+        size = 1
+        for t in token["args"]:
+            size += self._append_tree(t)
+        self._append(_KIND[token["pos"]], token["op"], len(token["args"]), size)
+        return size
+
+    def append_tree(self, token):
+        """ Appends an expression tree as a new line """
+        self._append_tree(token)
+        self.line_ends.append(len(self.kinds))
+
+    def append_stack(self, stack):
+        """Appends a line given by the expression stack of ParserLine, i.e.,
+        the attribute `result_stack`, without building the nested structure.
+        The resulting nodes agree with those of the nested structure."""
+        starts = []  # < indices of the first nodes of the finished subtrees
+        markers = []  # < number of finished subtrees when a bracket opened
+        pending = None  # < kind and arity of a function or array to come
+        base = len(self.kinds)
+
+        for op in stack:
+            if op in ("(", "["):
+                markers.append(len(starts))
+                continue
+            if op in (")", "]"):
+                count = len(starts) - markers.pop()
+                pending = (_FUNCTION if op == ")" else _ARRAY, count)
+                continue
+
+            index = len(self.kinds)
+            if pending is not None:
+                kind, arity = pending
+                pending = None
+            elif op == "UNARY-":
+                kind, arity = _PREFIX, 1
+            elif op in ("+", "-", "*", "/", "^", "=", "=="):
+                kind, arity = _INFIX, 2
+            else:
+                kind, arity = _ATOM, 0
+
+            start = starts[-arity] if arity else index
+            del starts[len(starts) - arity :]
+            if kind == _INFIX and op == "^" and self._is_atom(start, "E"):
+                # E^x is represented by the exponential function
+                for field in _FIELDS:
+                    del getattr(self, field)[start]
+                index -= 1
+                kind, op, arity = _PREFIX, "exp", 1
+            self._append(kind, op, arity, index - start + 1)
+            starts.append(start)
+
+        if starts:
+            # the grammar may leave tokens of failed alternatives at the bottom
+            # of the stack, which are ignored like in ParserLine
+            for field in _FIELDS:
+                del getattr(self, field)[base : starts[-1]]
+            self.line_ends.append(len(self.kinds))
+
+    def _is_atom(self, index, s):
+        """ Checks whether node `index` is the atom `s` """
+        return self.kinds[index] == _ATOM and self.strings[self.values[index]] == s
+
+    @classmethod
+    def from_trees(cls, trees):
+        """Creates a program from a list of expression trees or a ParserText
+        object"""
+        program = cls()
+        for token in _get_lines(trees):
+            program.append_tree(token)
+        return program
+
+    @classmethod
+    def from_stacks(cls, stacks):
+        """ Creates a program from a list of expression stacks of ParserLine """
+        program = cls()
+        for stack in stacks:
+            program.append_stack(stack)
+        return program
+
+    def _buffers(self):
+        """ Returns the string table and the buffers used by the linear scans """
+        return self.strings, self.kinds, self.values, self.arity
+
+    def _line_start(self, k):
+        """ Returns the index of the first node of line `k` """
+        return self.line_ends[k - 1] if k > 0 else 0
+
+    def __getitem__(self, key):
+        """Returns the lines selected by the slice `key` as a program, whose
+        buffers are views of the buffers of this program. Only the line ends
+        are copied."""
+        if not isinstance(key, slice):
+            raise TypeError("PostfixProgram can only be sliced")
+        first, last, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError("PostfixProgram only supports contiguous slices")
+        last = max(first, last)
+        start = self._line_start(first)
+        end = self._line_start(last)
+
+        res = PostfixProgram.__new__(PostfixProgram)
+        res.strings = self.strings
+        res._index = self._index
+        for field in _FIELDS:
+            setattr(res, field, memoryview(getattr(self, field))[start:end])
+        res.line_ends = array("i", (e - start for e in self.line_ends[first:last]))
+        res._shm = None
+        return res
+
+    def __getstate__(self):
+        """ Returns copies of the buffers for pickling """
+        state = {"strings": self.strings}
+        for field in _FIELDS + ("line_ends",):
+            state[field] = array("i", getattr(self, field))
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(state["strings"])
+        for field in _FIELDS + ("line_ends",):
+            setattr(self, field, state[field])
+
+    def to_shared_memory(self):
+        """Copies the buffers into a new block of shared memory. Returns the
+        SharedMemory object, which the caller has to unlink eventually, and a
+        descriptor, which can be passed to other processes to attach to it
+        using `from_shared_memory`."""
+        from multiprocessing import shared_memory
+
+        n_nodes, n_lines = self.nodes, len(self)
+        itemsize = array("i").itemsize
+        shm = shared_memory.SharedMemory(
+            create=True, size=max(1, itemsize * (4 * n_nodes + n_lines))
+        )
+        buf = shm.buf.cast("i")
+        try:
+            for k, field in enumerate(_FIELDS):
+                values = array("i", getattr(self, field))
+                buf[k * n_nodes : (k + 1) * n_nodes] = values
+            buf[4 * n_nodes : 4 * n_nodes + n_lines] = self.line_ends
+        finally:
+            buf.release()
+        descriptor = {
+            "name": shm.name,
+            "nodes": n_nodes,
+            "lines": n_lines,
+            "strings": self.strings,
+        }
+        return shm, descriptor
+
+    @classmethod
+    def from_shared_memory(cls, descriptor):
+        """Attaches to the shared memory described by `descriptor`, which is
+        returned by `to_shared_memory`. The buffers are views of the shared
+        memory, which must be released by calling `close`."""
+        from multiprocessing import shared_memory
+
+        program = cls(descriptor["strings"])
+        shm = shared_memory.SharedMemory(name=descriptor["name"])
+        buf = shm.buf.cast("i")
+        n_nodes, n_lines = descriptor["nodes"], descriptor["lines"]
+        for k, field in enumerate(_FIELDS):
+            setattr(program, field, buf[k * n_nodes : (k + 1) * n_nodes])
+        program.line_ends = array("i", buf[4 * n_nodes : 4 * n_nodes + n_lines])
+        program._shm = (shm, buf)
+        return program
+
+    def close(self):
+        """ Releases the views of the shared memory and detaches from it """
+        if self._shm is not None:
+            shm, buf = self._shm
+            for field in _FIELDS:
+                getattr(self, field).release()
+                setattr(self, field, array("i"))
+            buf.release()
+            shm.close()
+            self._shm = None
+
+    def to_trees(self):
+        """ Returns the list of expression trees of all lines """
+        trees = []
+        stack = []
+        strings, kinds, values, arity = self._buffers()
+        line = 0
+        for i in range(self.nodes):
+            n = arity[i]
+            if kinds[i] == _ATOM:
+                stack.append(strings[values[i]])
+            else:
+                args = stack[len(stack) - n :]
+                del stack[len(stack) - n :]
+                pos = POSITIONS[kinds[i]]
+                stack.append({"op": strings[values[i]], "pos": pos, "args": args})
+            if i + 1 == self.line_ends[line]:
+                trees.append(stack.pop())
+                line += 1
+        return trees
+
+    def costs(self, costs=None, default_cost=None):
+        """Returns the cost of every subtree given the table `costs` of the
+        operators and the cost of unknown operators, which default to the ones
+        of ParserText"""
+        if costs is None or default_cost is None:
+            from .parser_text import ParserText
+
+            costs = ParserText.costs if costs is None else costs
+            if default_cost is None:
+                default_cost = ParserText.default_cost
+        res = array("d", bytes(8 * self.nodes))
+        stack = []
+        strings, kinds, values, arity = self._buffers()
+        for i in range(self.nodes):
+            kind, n = kinds[i], arity[i]
+            if kind == _ATOM:
+                cost = 0.0
+            else:
+                key = "array" if kind == _ARRAY else strings[values[i]]
+                cost = costs.get(key, default_cost) + sum(stack[len(stack) - n :])
+                del stack[len(stack) - n :]
+            stack.append(cost)
+            res[i] = cost
+        return res
+
+    def line_costs(self, costs=None, default_cost=None):
+        """ Returns the total cost of every line """
+        node_costs = self.costs(costs, default_cost)
+        return [node_costs[end - 1] for end in self.line_ends]
+
+    def hashes(self):
+        """Returns the hash of every subtree, which agrees with the hash used
+        by ParserText for identifying common subexpressions"""
+        res = []
+        stack = []  # < keys of the subtrees, which are hashed
+        strings, kinds, values, arity = self._buffers()
+        for i in range(self.nodes):
+            n = arity[i]
+            if kinds[i] == _ATOM:
+                h = hash(strings[values[i]])
+                key = str(h)
+            else:
+                key = str(hash(strings[values[i]]))
+                key += "".join(stack[len(stack) - n :])
+                del stack[len(stack) - n :]
+                h = hash(key)
+            stack.append(key)
+            res.append(h)
+        return res
+
+    def format(self, formatter):
+        """Returns the lines formatted by `formatter`. The rules of Formatter
+        are applied in a single scan over the nodes. Derived formatters and
+        languages choosing operators per node are applied to the rebuilt
+        expression trees."""
+        lang = formatter.lang
+        if type(formatter) is not Formatter:
+            return [formatter(token) for token in self.to_trees()]
+        if (
+            type(lang).format_operator is not LanguageBase.format_operator
+            or lang.inline_functions
+            or lang.unsupported
+        ):
+            return formatter.format_lines(self.to_trees())
+
+        res = []
+        # entries of the stack are tuples of the string, the operator, the
+        # position and the raw atom or list literal
+        stack = []
+        strings, kinds, values, arity = self._buffers()
+        line = 0
+        for i in range(self.nodes):
+            kind, n = kinds[i], arity[i]
+            name = strings[values[i]]
+            if kind == _ATOM:
+                stack.append((lang.format_atom(name).strip(), None, _ATOM, name))
+            else:
+                args = stack[len(stack) - n :]
+                del stack[len(stack) - n :]
+                stack.append(self._format_node(formatter, name, kind, args))
+            if i + 1 == self.line_ends[line]:
+                res.append(_strip_par(stack.pop()[0]))
+                line += 1
+        return res
+
+    def _format_node(self, formatter, name, kind, args):
+        """Formats a single node given the entries of its arguments using the
+        rules of `formatter`"""
+        raw = None
+        if kind == _ARRAY:
+            strings = [a[3] for a in args]
+        elif kind == _LIST:
+            strings = [a[3] if a[2] == _LIST else _strip_par(a[0]) for a in args]
+            raw = formatter._format_list(strings)
+        else:
+            strings = [a[0] for a in args]
+        if name in ("+", "*"):
+            associative = [a[1] == name for a in args]
+        else:
+            associative = (False, False)
+        op = formatter.lang.operators.get(name, name)
+        s = formatter._format_node(op, name, POSITIONS[kind], strings, associative)
+        return s, name, kind, raw
@@ -0,0 +1,233 @@
+""" Defines a class eliminating common subexpressions across many files.
+
+Related files, like the matrix elements of a single model, often repeat the
+same expensive subexpressions. ParserText.optimize_runtime only finds the ones
+repeated within a single file. A Project instead collects subexpressions shared
+between files and moves them into a shared block of code, which is written as
+a separate module. Every formatted file starts with a statement evaluating this
+module in its own namespace, e.g. `exec(open("shared.py").read())` in Python or
+`Get["shared.m"]` in Mathematica, such that it can be evaluated on its own.
+When all files are evaluated together in a single namespace, the files can be
+formatted without these statements and the shared module is evaluated once
+before them, which computes each shared quantity exactly once.
+
+Only subexpressions depending on the inputs of a file, i.e. not on variables
+assigned within it, are shared, since the same name may refer to different
+quantities in different files.
+"""
+
+import os
+from collections import OrderedDict
+
+from .parser_text import ParserText
+from .dependency import DependencyGraph
+
+
+class Project(object):
+    """Set of files, whose common subexpressions are computed in a shared
+    module called `module`. The attribute `shared` holds the lines of the
+    shared module and `files` maps the names of the files to their parsers."""
+
+    shared_var = "s%d"  # < name of the variables defined in the shared module
+    min_files = 2  # < least number of files sharing a subexpression
+
+    # statements evaluating the shared module and the extension of its file in
+    # the individual languages
+    references = {
+        "LanguagePython": ('exec(open("%(path)s").read())', ".py"),
+        "LanguageMathematica": ('Get["%(path)s"]', ".m"),
+    }
+
+    def __init__(self, language, module="shared"):
+        """Initializes the project, whose files are written in `language`"""
+        self.language = language
+        self.module = module
+        self.files = OrderedDict()
+        self.shared = []
+        self.names = []  # < variables defined in the shared module
+        self._parser = ParserText(language)  # < used for the costs and hashes
+
+    def _new_parser(self):
+        """ Returns a parser for a single file """
+        return ParserText(self.language)
+
+    def add_text(self, name, text):
+        """ Adds the file `name` given by its content `text` """
+        parser = self._new_parser()
+        parser.parse_text(text)
+        self.files[name] = parser
+        return parser
+
+    def add_file(self, path, name=None, encoding="utf-8", statements=False):
+        """Adds the file `path`, which is referred to by `name`. The name
+        defaults to the name of the file without its extension."""
+        if name is None:
+            name = os.path.splitext(os.path.basename(path))[0]
+        parser = self._new_parser()
+        parser.parse_file(path, encoding, statements)
+        self.files[name] = parser
+        return parser
+
+    def _collect(self, token, local, block, candidates):
+        """Adds the subexpressions of `token`, which only read inputs of the
+        file, to `candidates`. Returns whether `token` only reads inputs."""
+        if not isinstance(token, dict):
+            return token not in local
+        inputs = token["pos"] != "array" or token["op"] not in local
+        for t in token["args"]:
+            inputs = self._collect(t, local, block, candidates) and inputs
+        if inputs:
+            entry = candidates.get(token["hash"])
+            if entry is None:
+                entry = {"token": token, "cost": 0.0, "count": 0, "blocks": set()}
+                candidates[token["hash"]] = entry
+            entry["cost"] += token["cost"]
+            entry["count"] += 1
+            entry["blocks"].add(block)
+        return inputs
+
+    def _find_candidates(self, blocks):
+        """ Returns the input-only subexpressions of all blocks of lines """
+        candidates = {}
+        for block, lines in enumerate(blocks):
+            graph = DependencyGraph(lines)
+            local = set().union(*graph.writes)
+            for line in lines:
+                if isinstance(line, dict) and line["op"] == "=":
+                    self._collect(line["args"][1], local, block, candidates)
+                else:
+                    self._collect(line, local, block, candidates)
+        return candidates
+
+    def _saving(self, entry):
+        """Returns the saving of computing the subexpression described by
+        `entry` once in the shared module, or None if it is not shared"""
+        shared = len(entry["blocks"]) >= self.min_files or (
+            entry["blocks"] == {0} and entry["count"] > 1
+        )
+        if not shared or entry["count"] < 2:
+            return None
+        return entry["cost"] - self._parser.costs["="]
+
+    def _sort_shared(self, lines):
+        """Orders the definitions of the shared module, such that every
+        variable is defined before it is used"""
+        definitions = OrderedDict((line["args"][0], line) for line in lines)
+        order, visited = [], set()
+
+        def visit(name):
+            if name not in visited:
+                visited.add(name)
+                reads = DependencyGraph([definitions[name]]).reads[0]
+                for other in definitions:
+                    if other in reads:
+                        visit(other)
+                order.append(definitions[name])
+
+        for name in definitions:
+            visit(name)
+        return order
+
+    def extract_shared(self):
+        """Moves the subexpressions shared by several files into the shared
+        module, starting with the one giving the largest saving. Returns the
+        names of the new variables of the shared module."""
+        parser = self._parser
+        files = list(self.files.values())
+        new_names = []
+        used = set()  # < variables of the files, which must not be shadowed
+        for p in files:
+            graph = DependencyGraph(p.result)
+            used.update(*graph.reads)
+            used.update(*graph.writes)
+        index = len(self.names)
+        while True:
+            # the shared module is treated as the first block of lines
+            blocks = [parser._annotate_expression(self.shared)[0]]
+            for p in files:
+                p.result = parser._annotate_expression(p.result)[0]
+                blocks.append(p.result)
+            candidates = self._find_candidates(blocks)
+
+            best, best_saving = None, parser.optimize_threshold
+            for hash_id, entry in candidates.items():
+                saving = self._saving(entry)
+                if saving is not None and saving >= best_saving:
+                    best, best_saving = hash_id, saving
+            if best is None:
+                break
+
+            name = self.shared_var % index
+            while name in used:
+                index += 1
+                name = self.shared_var % index
+            index += 1
+            self.names.append(name)
+            new_names.append(name)
+            token = candidates[best]["token"]
+            reads = DependencyGraph([token]).reads[0]
+
+            # replace the subexpression in all blocks, in which it only reads
+            # inputs, since it refers to a different quantity otherwise
+            for lines in blocks:
+                if reads & set().union(*DependencyGraph(lines).writes):
+                    continue
+                for k, line in enumerate(lines):
+                    line = parser._replace_subexpressions(line, best, None, name)[0]
+                    lines[k] = line
+
+            blocks[0].append({"op": "=", "pos": "infix", "args": [name, token]})
+            self.shared = self._sort_shared(blocks[0])
+
+        return new_names
+
+    def optimize_runtime(self, **kwargs):
+        """Extracts the shared subexpressions and then eliminates the common
+        subexpressions of every file by ParserText.optimize_runtime, which
+        receives the keyword arguments. Returns the names of the variables of
+        the shared module."""
+        names = self.extract_shared()
+        for parser in self.files.values():
+            parser.optimize_runtime(**kwargs)
+        return names
+
+    def get_cost(self):
+        """ Returns the cost of evaluating the shared module and all files """
+        cost = self._parser.get_cost(self.shared)
+        for parser in self.files.values():
+            cost += parser.get_cost()
+        return cost
+
+    def _get_reference(self, lang):
+        """ Returns the statement and the file extension for the language """
+        for cls in type(lang).__mro__:
+            if cls.__name__ in self.references:
+                return self.references[cls.__name__]
+        return lang.comment % "evaluate %(path)s first", ""
+
+    def get_path(self, lang):
+        """ Returns the name of the file of the shared module in `lang` """
+        return self.module + self._get_reference(lang)[1]
+
+    def _reference(self, lang, lines):
+        """ Returns the statement evaluating the shared module or None """
+        reads = set().union(*DependencyGraph(lines).reads) if lines else set()
+        if not reads & set(self.names):
+            return None
+        return self._get_reference(lang)[0] % {"path": self.get_path(lang)}
+
+    def format(self, formatter, references=True):
+        """Formats the shared module and all files using `formatter`. Returns
+        an ordered dictionary mapping the name of the shared module and the
+        names of the files to their code. If `references` is True, files using
+        shared variables start with a statement evaluating the shared module,
+        which is expected in the file given by `get_path`."""
+        res = OrderedDict()
+        res[self.module] = formatter(self.shared)
+        for name, parser in self.files.items():
+            code = formatter(parser)
+            reference = self._reference(formatter.lang, parser.result)
+            if references and reference is not None:
+                code = reference + formatter.lang.eol + code
+            res[name] = code
+        return res
@@ -0,0 +1,82 @@
+""" Defines a class for reading very large input files line by line.
+
+The file is memory-mapped, such that only the line currently being processed is
+copied and decoded. The whole file thus never has to be held in memory.
+"""
+
+import mmap
+
+
+class MappedTextReader(object):
+    """Iterates over the lines of a memory-mapped file. Each item is a tuple of
+    the line number (starting at 1), the byte offset of the line in the file and
+    the decoded line without the line break. Lines which cannot be decoded raise
+    a ParseError locating the line, unless the lines are read leniently by
+    `items` or `lines`."""
+
+    def __init__(self, path, encoding="utf-8"):
+        self.path = path
+        self.encoding = encoding
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty files cannot be mapped
+            self._map = None
+
+    def close(self):
+        """ Closes the memory map and the file """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """ Returns the size of the file in bytes """
+        return 0 if self._map is None else len(self._map)
+
+    def __iter__(self):
+        return self.items()
+
+    def items(self, strict=True):
+        """Yields the tuples of the line number, the offset and the line. If
+        `strict` is False, lines which cannot be decoded are yielded as a
+        ParseError in place of the line instead of raising it."""
+        if self._map is None:
+            return
+
+        data = self._map
+        size = len(data)
+        lineno, offset = 1, 0
+        while offset < size:
+            end = data.find(b"\n", offset)
+            if end < 0:
+                end = size
+            line = data[offset:end]
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            try:
+                text = line.decode(self.encoding)
+            except UnicodeDecodeError as e:
+                from .parser_text import ParseError
+
+                text = ParseError(str(e), lineno, None, offset)
+                if strict:
+                    raise text
+            yield lineno, offset, text
+            lineno, offset = lineno + 1, end + 1
+
+    def lines(self, errors=None):
+        """Yields the decoded lines. If `errors` is a list, lines which cannot
+        be decoded are appended to it as ParseError and yielded as empty lines,
+        such that the following lines keep their numbers."""
+        for _, _, text in self.items(errors is None):
+            if not isinstance(text, str):
+                errors.append(text)
+                text = ""
+            yield text
@@ -0,0 +1,316 @@
+""" Defines a long-running server converting formulas on request.
+
+Starting a new process for every conversion is dominated by importing pyparsing
+and building the grammars. The server instead keeps converters for every
+combination of settings in a pool of worker processes, which are reused for all
+requests. Clients connect via TCP on localhost or via a Unix socket and send
+requests as JSON objects, one per line:
+
+    {"id": 1, "source": "mathematica", "target": "python", "formulas": ["a = Sin[x]"]}
+
+The optional keys `int2float`, `optimize` and `statements` correspond to the
+arguments of Converter. Every entry of `formulas` may consist of several lines
+and is converted independently. The response contains the converted formulas
+and the error messages of the failed ones:
+
+    {"id": 1, "results": ["a = np.sin(x)"], "errors": [null]}
+
+Invalid requests are answered with a message in the key `error`.
+
+The request `{"command": "metrics"}` returns statistics on the latencies and the
+throughput of the server. Run the server with
+
+    python -m src.server [--port PORT | --unix PATH] [--workers N]
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .instrumentation import StageStatistics
+
+# settings of the converters built when a worker starts
+DEFAULT_WARM = (("mathematica", "python"),)
+
+
+def _init_worker(warm):
+    """ Builds the converters and their grammars for the given language pairs """
+    from .converter import get_converter
+
+    for source, target in warm:
+        get_converter(source, target, False, False, False).parser.parser.parser
+
+
+def _convert_batch(settings, formulas):
+    """Converts a list of formulas with the converter of the worker. Returns
+    the results, the error messages and the time spent in the conversion."""
+    from .converter import get_converter, ConversionError
+
+    start = time.perf_counter()
+    converter = get_converter(*settings)
+    results, errors = [], []
+    for text in formulas:
+        try:
+            results.append(converter.convert(text))
+            errors.append(None)
+        except ConversionError as e:
+            results.append(None)
+            errors.append(str(e))
+    return results, errors, time.perf_counter() - start
+
+
+def _get_settings(request):
+    """Returns the settings of the converter and the list of formulas of
+    `request`. Raises ValueError if they have the wrong types."""
+    formulas = request.get("formulas", [])
+    if isinstance(formulas, str):
+        formulas = [formulas]
+    if not isinstance(formulas, list) or not all(
+        isinstance(text, str) for text in formulas
+    ):
+        raise ValueError("`formulas` must be a string or a list of strings")
+
+    settings = []
+    for key, default in (("source", "mathematica"), ("target", "python")):
+        value = request.get(key, default)
+        if not isinstance(value, str):
+            raise ValueError("`%s` must be a string" % key)
+        settings.append(value)
+    for key in ("int2float", "optimize", "statements"):
+        value = request.get(key, False)
+        if not isinstance(value, (bool, int)) and value is not None:
+            raise ValueError("`%s` must be a boolean" % key)
+        settings.append(bool(value))
+    return tuple(settings), formulas
+
+
+class ConversionServer(object):
+    """Server converting formulas using a pool of workers. If `processes` is
+    False, a single thread is used instead of the worker processes, which
+    avoids starting processes but does not convert requests in parallel."""
+
+    window = 10000  # < number of latencies kept for the statistics
+    limit = 2 ** 26  # < largest size of a request in bytes
+
+    def __init__(self, workers=None, processes=True, warm=DEFAULT_WARM):
+        if processes:
+            self.executor = ProcessPoolExecutor(
+                workers, initializer=_init_worker, initargs=(warm,)
+            )
+        else:
+            self.executor = ThreadPoolExecutor(
+                1, initializer=_init_worker, initargs=(warm,)
+            )
+        self.stats = StageStatistics(self.window)
+        self.requests = 0
+        self.formulas = 0
+        self.errors = 0
+        self.start_time = time.time()
+        self.address = None  # < address the server is listening on
+        self._server = None
+        self._loop = None
+        self._stopped = None
+
+    def metrics(self):
+        """Returns a dictionary with the number of handled requests, formulas
+        and errors, the throughput in formulas per second and the statistics of
+        the latencies of requests and conversions"""
+        uptime = time.time() - self.start_time
+        busy = self.stats.totals.get("request", 0.0)
+        return {
+            "uptime": uptime,
+            "requests": self.requests,
+            "formulas": self.formulas,
+            "errors": self.errors,
+            "throughput": self.formulas / uptime if uptime > 0 else 0.0,
+            "throughput_busy": self.formulas / busy if busy > 0 else 0.0,
+            "stages": self.stats.summary(),
+        }
+
+    async def process(self, request):
+        """ Handles a single request given as a dictionary """
+        response = {"id": request.get("id")}
+        if request.get("command") == "metrics":
+            response["metrics"] = self.metrics()
+            return response
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            settings, formulas = _get_settings(request)
+            results, errors, duration = await loop.run_in_executor(
+                self.executor, _convert_batch, settings, formulas
+            )
+        except Exception as e:  # invalid settings or a failed worker
+            response["error"] = str(e) or type(e).__name__
+            self.errors += 1
+            return response
+
+        self.requests += 1
+        self.formulas += len(formulas)
+        self.errors += sum(error is not None for error in errors)
+        self.stats("convert", duration, len(formulas), None)
+        self.stats("request", time.perf_counter() - start, len(formulas), None)
+        response["results"] = results
+        response["errors"] = errors
+        return response
+
+    async def handle_connection(self, reader, writer):
+        """ Answers the requests of a single client """
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as e:  # no final line break
+                    line = e.partial
+                except asyncio.LimitOverrunError:
+                    await self._skip_line(reader)
+                    line = None
+                if line == b"":
+                    break
+                response = await self._respond(line)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, line):
+        """Returns the response to the request given by the bytes `line`, which
+        is None if the request exceeds the limit"""
+        if line is None:
+            return {
+                "id": None,
+                "error": "request exceeds the limit of %d bytes" % self.limit,
+            }
+        try:
+            request = json.loads(line.decode("utf-8"))
+            if not isinstance(request, dict):
+                raise ValueError("request is not a JSON object")
+        except ValueError as e:
+            return {"id": None, "error": "invalid request: %s" % e}
+        return await self.process(request)
+
+    async def _skip_line(self, reader):
+        """ Discards the rest of a line exceeding the limit """
+        while True:
+            try:
+                await reader.readuntil(b"\n")
+                return
+            except asyncio.IncompleteReadError:
+                return
+            except asyncio.LimitOverrunError as e:
+                await reader.readexactly(e.consumed)
+
+    async def start(self, host="127.0.0.1", port=0, path=None):
+        """Starts listening on the Unix socket `path` or on the TCP `port` of
+        `host`. If `port` is 0, a free port is chosen. The actual address is
+        stored in the attribute `address`."""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        if path is not None:
+            self._server = await asyncio.start_unix_server(
+                self.handle_connection, path=path, limit=self.limit
+            )
+            self.address = path
+        else:
+            self._server = await asyncio.start_server(
+                self.handle_connection, host=host, port=port, limit=self.limit
+            )
+            self.address = self._server.sockets[0].getsockname()[:2]
+        return self._server
+
+    async def serve(self, host="127.0.0.1", port=0, path=None, ready=None):
+        """Runs the server until `stop` is called. The function `ready` is
+        called once the server accepts connections."""
+        await self.start(host, port, path)
+        if ready is not None:
+            ready()
+        try:
+            await self._stopped.wait()
+        finally:
+            self._server.close()
+            await self._server.wait_closed()
+            self.executor.shutdown()
+
+    def stop(self):
+        """ Stops the server; this method may be called from any thread """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+
+class ConversionClient(object):
+    """Simple blocking client of a ConversionServer, which sends one request
+    at a time"""
+
+    def __init__(self, address):
+        """Connects to the server listening on `address`, which is either a
+        tuple of host and port or the path of a Unix socket"""
+        if isinstance(address, str):
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.connect(address)
+        self._file = self.socket.makefile("rwb")
+        self._count = 0
+
+    def close(self):
+        """ Closes the connection """
+        self._file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def request(self, request):
+        """ Sends a request given as a dictionary and returns the response """
+        self._count += 1
+        request.setdefault("id", self._count)
+        self._file.write(json.dumps(request).encode("utf-8") + b"\n")
+        self._file.flush()
+        return json.loads(self._file.readline().decode("utf-8"))
+
+    def convert(self, formulas, source="mathematica", target="python", **options):
+        """Converts a list of formulas. The keyword arguments `int2float`,
+        `optimize` and `statements` are passed to the converter. Returns the
+        response containing the lists `results` and `errors`."""
+        request = {"source": source, "target": target, "formulas": formulas}
+        request.update(options)
+        return self.request(request)
+
+    def metrics(self):
+        """ Returns the metrics of the server """
+        return self.request({"command": "metrics"})["metrics"]
+
+
+def main(args=None):
+    """ Runs the server from the command line """
+    parser = argparse.ArgumentParser(description="Serve formula conversions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket")
+    parser.add_argument("--workers", type=int, help="number of worker processes")
+    args = parser.parse_args(args)
+
+    server = ConversionServer(workers=args.workers)
+
+    def ready():
+        sys.stderr.write("listening on %s\n" % (server.address,))
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
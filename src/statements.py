@@ -0,0 +1,100 @@
+""" Defines a function splitting input text into complete statements.
+
+Exports of computer algebra systems, like Mathematica's `InputForm` or `CForm`,
+wrap long expressions across several lines and separate statements by `;`. The
+splitter keeps track of the bracket depth, of strings and of comments and yields
+one complete statement at a time, such that each statement can be handed to
+ParserLine.
+"""
+
+import re
+
+# operators at the end of a line, which indicate that the statement continues
+_CONTINUATION = ("+", "-", "*", "/", "^", "=", ",", "<", ">", "&", "|", "\\")
+
+_BRACKETS_OPEN = "([{"
+_BRACKETS_CLOSE = ")]}"
+
+
+def iter_statements(lines, separator=";", comment=None):
+    """Joins and splits the given lines into complete statements. A statement
+    continues on the next line if brackets are still open, if the line ends
+    with a binary operator or with a backslash. Statements on the same line are
+    separated by `separator`. Block comments, given by a tuple of delimiters
+    like `("(*", "*)")`, are removed. Yields tuples of the line number (starting
+    at 1) where the statement starts and the statement itself."""
+
+    tokens = [re.escape(c) for c in _BRACKETS_OPEN + _BRACKETS_CLOSE + '"']
+    if separator:
+        tokens.append(re.escape(separator))
+    if comment:
+        tokens = [re.escape(comment[0]), re.escape(comment[1])] + tokens
+    pattern = re.compile("|".join(tokens))
+
+    buffer = []  # parts of the current statement
+    start = None  # line number where the current statement started
+    depth = 0  # number of open brackets
+    comment_depth = 0  # number of open comments
+    in_string = False
+
+    def flush():
+        """ returns the current statement and resets the buffer """
+        statement = " ".join(part.strip() for part in buffer if part.strip())
+        del buffer[:]
+        return statement
+
+    for lineno, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        pos = 0  # position up to which the line has been handled
+        for m in pattern.finditer(line):
+            token = m.group()
+            if in_string:
+                if token == '"' and line[m.start() - 1 : m.start()] != "\\":
+                    in_string = False
+            elif comment and token == comment[0]:
+                if comment_depth == 0:
+                    buffer.append(line[pos : m.start()])
+                comment_depth += 1
+            elif comment_depth > 0:
+                if comment and token == comment[1]:
+                    comment_depth -= 1
+                    if comment_depth == 0:
+                        pos = m.end()
+            elif token == '"':
+                in_string = True
+            elif token in _BRACKETS_OPEN:
+                depth += 1
+            elif token in _BRACKETS_CLOSE:
+                depth = max(depth - 1, 0)
+            elif token == separator and depth == 0:
+                buffer.append(line[pos : m.start()])
+                if start is None:
+                    start = lineno
+                statement = flush()
+                if statement:
+                    yield start, statement
+                start = None
+                pos = m.end()
+
+        if comment_depth == 0:
+            buffer.append(line[pos:])
+        if start is None and any(part.strip() for part in buffer):
+            start = lineno
+
+        # check whether the statement continues on the next line
+        if depth > 0 or comment_depth > 0 or in_string:
+            continue
+        statement = flush()
+        if statement.endswith(_CONTINUATION):
+            if statement.endswith("\\"):
+                statement = statement[:-1]
+            buffer.append(statement)
+            continue
+        if statement:
+            yield start, statement
+        start = None
+
+    # return the remaining part, which will most likely not be parsable
+    statement = flush()
+    if statement:
+        yield start, statement
@@ -8,6 +8,19 @@ except ImportError:
 from test_optimizing import *
 from test_parsing_python import *
 from test_parsing_mathematica import *
+from test_cli import *
+from test_import_time import *
+from test_instrumentation import *
+from test_generator import *
+from test_evaluator import *
+from test_language_c import *
+from test_reader import *
+from test_statements import *
+from test_dependency import *
+from test_server import *
+from test_postfix import *
+from test_project import *
+from test_derivative import *
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+sys.path.append('..')
+
+import numpy as np
+
+from src.converter import Converter, ConversionError
+from src.cli import main
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin',
+                      'convert_formula.py')
+
+
+class ConverterCheck(unittest.TestCase):
+
+    def test_convert(self):
+        converter = Converter('mathematica', 'python')
+        self.assertEqual(converter.convert("a = Sin[x]\nb = Pi"),
+                         "a = np.sin(x)\nb = np.pi")
+        converter = Converter('LanguageMathematica', 'LanguagePython',
+                              int2float=True, optimize=True)
+        self.assertEqual(converter.convert("a = Sin[x]^2\nb = Sin[x]^2 + 1"),
+                         "t_0 = np.sin(x) ** 2.\na = t_0\nb = t_0 + 1.")
+
+
+    def test_convert_lines(self):
+        converter = Converter('mathematica', 'python')
+        lines = converter.convert_lines(["a = 1\n", "\n", "b = Exp[a]\n"])
+        self.assertEqual(list(lines), ["a = 1", "b = np.exp(a)"])
+        with self.assertRaises(ConversionError) as cm:
+            list(converter.convert_lines(["a = 1", ") = a"]))
+        self.assertEqual(cm.exception.lineno, 2)
+
+
+    def test_convert_statements(self):
+        converter = Converter('mathematica', 'python', statements=True)
+        lines = converter.convert_lines(["a = Sin[x +\n", " y]; b = 2\n"])
+        self.assertEqual(list(lines), ["a = np.sin(x + y)", "b = 2"])
+        self.assertEqual(converter.convert("a = 1;\nb = a +\n 1"),
+                         "a = 1\nb = a + 1")
+
+
+    def test_keep_going(self):
+        converter = Converter('mathematica', 'python')
+        errors = []
+        lines = converter.convert_lines(["a = 1", ")", "b = 2", ")c", "a = Sin[x",
+                                         "a = b c"], errors)
+        self.assertEqual(list(lines), ["a = 1", "b = 2"])
+        self.assertEqual([(e.lineno, e.column) for e in errors],
+                         [(2, 1), (4, 1), (5, 8), (6, 7)])
+
+        errors = []
+        converter = Converter('mathematica', 'python', optimize=True)
+        self.assertEqual(converter.convert("a = 1\n)\nb = 2", errors),
+                         "a = 1\nb = 2")
+        self.assertEqual([e.lineno for e in errors], [2])
+
+
+    def test_wrong_settings(self):
+        self.assertRaises(ValueError, Converter, 'fortran', 'python')
+        self.assertRaises(ValueError, Converter, 'python', 'mathematica',
+                          int2float=True)
+
+
+class CommandLineCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_files(self, contents):
+        paths = []
+        for i, content in enumerate(contents):
+            path = os.path.join(self.folder, 'input%d.m' % i)
+            with open(path, 'w') as fp:
+                fp.write(content)
+            paths.append(path)
+        return paths
+
+
+    def test_stdin(self):
+        proc = subprocess.run([sys.executable, SCRIPT, '-f', 'mathematica',
+                               '-t', 'python', '--int2float'],
+                              input="a = Sin[2*x]\nb = a^2\n",
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              universal_newlines=True)
+        self.assertEqual(proc.returncode, 0)
+        self.assertEqual(proc.stdout, "a = np.sin(2. * x)\nb = a ** 2.\n")
+
+
+    def test_failure(self):
+        proc = subprocess.run([sys.executable, SCRIPT], input="a = 1\n)\n",
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              universal_newlines=True)
+        self.assertEqual(proc.returncode, 1)
+        self.assertIn('line 2', proc.stderr)
+
+
+    def test_keep_going(self):
+        proc = subprocess.run([sys.executable, SCRIPT, '--keep-going'],
+                              input=")\na = 1\n)\nb = 2\n",
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              universal_newlines=True)
+        self.assertEqual(proc.returncode, 1)
+        self.assertEqual(proc.stdout, "a = 1\nb = 2\n")
+        self.assertEqual(proc.stderr.count('invalid syntax'), 2)
+
+        # lines with trailing input are not truncated
+        proc = subprocess.run([sys.executable, SCRIPT, '--keep-going'],
+                              input="a = Sin[x\nb = 1\nc = b d\n",
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              universal_newlines=True)
+        self.assertEqual(proc.returncode, 1)
+        self.assertEqual(proc.stdout, "b = 1\n")
+        self.assertIn('line 1', proc.stderr)
+        self.assertIn('line 3', proc.stderr)
+
+        paths = self.write_files(["a = 1\n)\nb = 2", ")\nc = 3"])
+        for args in [['--cse'], ['-j', '2'], ['-o', os.path.join(self.folder, 'out')]]:
+            self.assertEqual(main(paths + ['-k'] + args), 1)
+
+
+    def test_files(self):
+        paths = self.write_files(["a = Sin[x]\nb = Sin[x] + 1",
+                                  "c = Exp[y]^2\nd = Exp[y]^2 + 1"] * 2)
+        folder_out = os.path.join(self.folder, 'out')
+        for jobs in ['1', '2']:
+            code = main(paths + ['--cse', '-o', folder_out, '--jobs', jobs])
+            self.assertEqual(code, 0)
+            with open(os.path.join(folder_out, 'input3.m.out')) as fp:
+                self.assertEqual(fp.read(),
+                                 "t_0 = np.exp(y) ** 2\nc = t_0\nd = t_0 + 1\n")
+
+        path_bad = os.path.join(self.folder, 'bad.m')
+        with open(path_bad, 'w') as fp:
+            fp.write("a = b\n)\n")
+        self.assertEqual(main([paths[0], path_bad, '-o', folder_out]), 1)
+        self.assertEqual(main([os.path.join(self.folder, 'missing.m'), paths[0],
+                               '-j', '2']), 1)
+
+        # files which cannot be decoded are reported with the line
+        with open(path_bad, 'wb') as fp:
+            fp.write(b"a = b\nc = \xff\n")
+        os.remove(os.path.join(folder_out, 'input0.m.out'))
+        for args in [[], [paths[0], '-o', folder_out]]:
+            proc = subprocess.run([sys.executable, SCRIPT, path_bad] + args,
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                  universal_newlines=True)
+            self.assertEqual(proc.returncode, 1)
+            self.assertIn('bad.m: line 2', proc.stderr)
+        self.assertTrue(os.path.exists(os.path.join(folder_out, 'input0.m.out')))
+
+        # all problems are reported in a single pass
+        with open(path_bad, 'wb') as fp:
+            fp.write(b"a = 1\nb = \xff\n)c = 3\nd = 2\n")
+        for args in [[], ['--cse'], ['--statements']]:
+            proc = subprocess.run([sys.executable, SCRIPT, path_bad, '-k'] + args,
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                  universal_newlines=True)
+            self.assertEqual(proc.returncode, 1)
+            self.assertEqual(proc.stdout, "a = 1\nd = 2\n")
+            self.assertIn('bad.m: line 2', proc.stderr)
+            self.assertIn('bad.m: line 3', proc.stderr)
+
+
+
+    def test_shared(self):
+        paths = self.write_files(["a = Sin[x]^2 * y\nb = Cos[y]",
+                                  "c = Sin[x]^2 + 1\nd = Exp[y]^2 + Exp[y]^2"])
+        folder_out = os.path.join(self.folder, 'out')
+        code = main(paths + ['--cse', '--shared', 'common', '-o', folder_out])
+        self.assertEqual(code, 0)
+        with open(os.path.join(folder_out, 'common.py')) as fp:
+            self.assertEqual(fp.read(), "s0 = np.sin(x) ** 2\n")
+        with open(os.path.join(folder_out, 'input1.out')) as fp:
+            output = fp.read()
+        self.assertEqual(output, 'exec(open("common.py").read())\nc = s0 + 1\n'
+                                 't_0 = np.exp(y) ** 2\nd = t_0 + t_0\n')
+
+        # the output evaluates the shared module written next to it
+        cwd = os.getcwd()
+        os.chdir(folder_out)
+        try:
+            env = {'np': np, 'x': 0.5, 'y': 2.0}
+            exec(output, env)
+        finally:
+            os.chdir(cwd)
+        self.assertAlmostEqual(env['c'], np.sin(0.5)**2 + 1)
+
+        missing = os.path.join(self.folder, 'missing.m')
+        self.assertEqual(main(paths + [missing, '--shared', 'common']), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append('..')
+
+import numpy as np
+
+from src.language import LanguagePython, LanguageMathematica
+from src.parser_text import ParserText
+from src.formatter import Formatter
+from src.dependency import DependencyGraph
+
+
+class DependencyCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = ParserText(LanguageMathematica())
+
+
+    def test_graph(self):
+        self.parser.parse_text("a = Sin[x]\nb = Cos[x]\nc = a + b\nx = 2\n"
+                               "d = x[[1]]\nd = 2\nc")
+        graph = DependencyGraph(self.parser)
+        self.assertEqual(graph.reads[2], {'a', 'b'})
+        self.assertEqual(graph.writes[2], {'c'})
+        self.assertEqual(graph.reads[5], set())
+        self.assertEqual(graph.dependencies, [set(), set(), {0, 1}, {0, 1},
+                                              {3}, {4}, {2}])
+        self.assertEqual(graph.groups, [[0, 1], [2, 3], [4, 6], [5]])
+        self.assertEqual(DependencyGraph([]).groups, [])
+
+
+    def test_format_groups(self):
+        self.parser.parse_text("a = Sin[x]\nb = Cos[x]\nc = a + b")
+        formatter = Formatter(LanguageMathematica())
+        self.assertEqual(formatter.format_groups(self.parser),
+                         "(* group 0 *)\na = Sin[x]\nb = Cos[x]\n"
+                         "(* group 1 *)\nc = a + b")
+        self.assertRaises(ValueError, formatter.format_groups, self.parser,
+                          executor='executor')
+
+
+    def test_format_tasks(self):
+        self.parser.parse_text("a = Sin[x]^2\nb = Cos[x]^2\nc = a + b\nc")
+        self.parser.optimize_runtime()
+        code = Formatter(LanguagePython()).format_groups(self.parser, 'executor')
+        self.assertIn("future_0 = executor.submit(lambda: np.sin(x) ** 2)", code)
+
+        x = np.linspace(0, 1, 5)
+        with ThreadPoolExecutor(2) as executor:
+            values = {'np': np, 'x': x, 'executor': executor}
+            exec(code, values)
+        np.testing.assert_allclose(values['c'], np.ones(5))
+
+
+if __name__ == "__main__":
+    unittest.main()
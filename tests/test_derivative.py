@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import sys
+sys.path.append('..')
+
+import numpy as np
+
+from src.language import LanguagePython, LanguageMathematica
+from src.parser_text import ParserText
+from src.formatter import Formatter
+from src.derivative import Differentiator, differentiate
+
+
+TEXT = ("a = Sin[x]^2 * Exp[y] + ArcTan[x*y]\n"
+        "b = a / (1 + x^2) + Log[a] - Sqrt[Cosh[y]]\n"
+        "c = b^y + Tanh[x]^3 * ArcSinh[y] - 2/x\n"
+        "M[[1]] = c * Cos[x]\n"
+        "d = M[[1]] + E^(x*y)")
+
+
+class DerivativeCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = ParserText(LanguageMathematica())
+        self.formatter = Formatter(LanguagePython())
+
+
+    def evaluate(self, code, x, y):
+        env = {'np': np, 'x': x, 'y': y, 'M': np.zeros(2)}
+        exec(code, env)
+        return env
+
+
+    def test_rules(self):
+        differentiator = Differentiator('x')
+        parse = self.parser.parser.parse_string
+        for text, expected in [("x^3", "3 * (x ** 2)"),
+                               ("Sin[2*x]", "np.cos(2 * x) * 2"),
+                               ("y^x", "(y ** x) * np.log(y)"),
+                               ("-Exp[y]", "0"),
+                               ("E^x", "np.exp(x)"),
+                               ("1 / x", "-1 / (x ** 2)")]:
+            derivative = differentiator.differentiate(parse(text), 'x')
+            self.assertEqual(self.formatter(derivative), expected)
+
+        with self.assertRaises(ValueError):
+            differentiator.differentiate(parse("Log[2, x]"), 'x')
+        with self.assertRaises(ValueError):
+            differentiator.differentiate(parse("Gamma[x]"), 'x')
+
+
+    def test_lines(self):
+        self.parser.parse_text("a = x*y\nb = 2\nb = a + b*x\nx = b\nc = x + y\nc")
+        code = self.formatter(Differentiator(['x', 'y'])(self.parser))
+        self.assertEqual(code.split('\n'), [
+            "da_dx = y", "da_dy = x", "a = x * y",
+            "db_dx = 0", "db_dy = 0", "b = 2",
+            "db_dx = da_dx + b", "db_dy = da_dy", "b = a + (b * x)",
+            "dx_dx = db_dx", "dx_dy = db_dy", "x = b",
+            "dc_dx = dx_dx", "dc_dy = dx_dy + 1", "c = x + y",
+            "c", "dc_dx", "dc_dy"])
+
+        # derivatives are calculated from the previous value
+        self.parser.parse_text("a = x^2\na = a*x")
+        code = self.formatter(Differentiator('x')(self.parser))
+        env = {'x': 2}
+        exec(code, env)
+        self.assertEqual((env['a'], env['da_dx']), (8, 12))
+
+
+    def test_jacobian(self):
+        self.parser.parse_text(TEXT)
+        code = self.formatter(Differentiator(['x', 'y'])(self.parser))
+
+        self.parser.parse_text(TEXT)
+        lines = differentiate(self.parser, ['x', 'y'])
+        self.assertTrue(self.parser.report.temporaries)
+        self.assertLess(self.parser.report.cost_after,
+                        self.parser.report.cost_before)
+        optimized = self.formatter(lines)
+
+        x, y, h = 0.7, 1.3, 1e-6
+        for source in (code, optimized):
+            env = self.evaluate(source, x, y)
+            for variable, dx, dy in (('x', h, 0), ('y', 0, h)):
+                plus = self.evaluate(source, x + dx, y + dy)
+                minus = self.evaluate(source, x - dx, y - dy)
+                for name in 'abcd':
+                    expected = (plus[name] - minus[name]) / (2 * h)
+                    self.assertAlmostEqual(env['d%s_d%s' % (name, variable)],
+                                           expected, places=5)
+                self.assertAlmostEqual(env['dM_d%s' % variable][1],
+                                       (plus['M'][1] - minus['M'][1]) / (2 * h),
+                                       places=5)
+
+
+    def test_arrays(self):
+        parser = ParserText(LanguagePython())
+        parser.parse_text("M[0] = sin(x)\nM[1] = x**2\ny = M[0]*M[1]")
+        code = self.formatter(Differentiator('x')(parser))
+        self.assertEqual(code.split('\n')[0], "dM_dx = 0. * M")
+        env = {'np': np, 'x': 0.5, 'M': np.zeros(2)}
+        exec(code, env)
+        np.testing.assert_allclose(env['dM_dx'], [np.cos(0.5), 1.])
+        self.assertAlmostEqual(env['dy_dx'], np.cos(0.5) * 0.25 + np.sin(0.5))
+
+        # arrays assigned by lists have derivatives as well
+        elements = {'op': 'list', 'pos': 'list', 'args': ['x', '2']}
+        lines = [{'op': '=', 'pos': 'infix', 'args': ['M', elements]},
+                 parser.parser.parse_string("y = M[1]")]
+        code = self.formatter(Differentiator('x')(lines))
+        self.assertEqual(code.split('\n'), ["dM_dx = np.array([1, 0])",
+                                             "M = np.array([x, 2])",
+                                             "dy_dx = dM_dx[1]", "y = M[1]"])
+
+
+if __name__ == '__main__':
+    unittest.main()
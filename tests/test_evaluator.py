@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import sys
+sys.path.append('..')
+
+import numpy as np
+
+from src.language import LanguageMathematica, LanguagePython
+from src.parser_line import ParserLine
+from src.parser_text import ParserText
+from src.formatter import Formatter
+from src.evaluator import Evaluator
+
+
+class EvaluatorCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = ParserText(LanguageMathematica())
+        self.formatter = Formatter(LanguagePython())
+
+
+    def evaluate_python(self, values):
+        """ evaluates the formatted code using exec """
+        namespace = {'np': np}
+        namespace.update(values)
+        exec(self.formatter(self.parser), namespace)
+        return namespace
+
+
+    def test_compare_exec(self):
+        text = ("a = Sin[x]^2 + Cos[y] * Exp[-x / 2]\n"
+                "b = Sqrt[a + 1] - Pi*x\n"
+                "c = ArcTan[b] / (1 + a^2) + E^y\n"
+                "a = a + Log[c^2 + 1]")
+        self.parser.parse_text(text)
+        values = {'x': np.linspace(0, 1, 11), 'y': np.linspace(-1, 2, 11)}
+        expected = self.evaluate_python(values)
+
+        for optimize in [False, True]:
+            if optimize:
+                self.parser.optimize_runtime()
+            evaluator = Evaluator(self.parser, LanguageMathematica())
+            res = evaluator(values)
+            self.assertEqual(sorted(k for k in res if not k.startswith('t_')),
+                             ['a', 'b', 'c'])
+            for k in 'abc':
+                np.testing.assert_allclose(res[k], expected[k])
+
+        # evaluate the same program with different inputs
+        res = evaluator(x=0.5, y=np.zeros(3))
+        self.assertEqual(res['b'].shape, (3,))
+
+
+    def test_expressions(self):
+        evaluator = Evaluator(ParserLine(LanguagePython()).parse_string("1 - x**2"),
+                              LanguagePython())
+        self.assertEqual(evaluator(x=3)[None], -8)
+        self.assertEqual(evaluator.inputs.keys(), {'x'})
+
+        parser = ParserText(LanguagePython())
+        parser.parse_text("a = asin(x)\nb = M[1,0] * 2\nM[0,1] = a + b")
+        evaluator = Evaluator(parser, LanguagePython())
+        matrix = np.zeros((2, 2))
+        matrix[1, 0] = 3
+        res = evaluator(x=1., M=matrix)
+        self.assertAlmostEqual(res['a'], np.pi / 2)
+        self.assertEqual(res['b'], 6)
+        self.assertAlmostEqual(res['M'][0, 1], np.pi / 2 + 6)
+        self.assertEqual(matrix[0, 1], 0)  # input is not modified
+
+        self.assertRaises(ValueError, evaluator, x=1.)
+        self.assertRaises(ValueError, Evaluator, {'op': 'foo', 'pos': 'function',
+                                                  'args': ['x']})
+
+
+    def test_vectorized_arrays(self):
+        self.parser.parse_text("m[[1, 1]] = x\nm[[1, 2]] = 2*x\nm[[2, 1]] = 3\n"
+                               "m[[2, 2]] = 4")
+        self.parser.vectorize_arrays()
+        res = Evaluator(self.parser)(x=1.5)
+        np.testing.assert_allclose(res['m'], [[1.5, 3], [3, 4]])
+
+
+    def test_array_base(self):
+        self.parser.parse_text("m[[1, 1]] = x\nm[[1, 2]] = 2*x\nm[[2, 1]] = 3\n"
+                               "m[[2, 2]] = 4\nr = m[[1, 2]] + n[[2]]")
+        evaluator = Evaluator(self.parser, LanguageMathematica())
+        res = evaluator(x=1.5, m=np.zeros((2, 2)), n=np.array([0., 10.]))
+        np.testing.assert_allclose(res['m'], [[1.5, 3], [3, 4]])
+        self.assertEqual(res['r'], 13)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import sys
+sys.path.append('..')
+
+from src.language import LanguageMathematica
+from src.parser_text import ParserText
+from src.formatter import Formatter
+from src.generator import ExpressionGenerator
+from src.benchmark import run_benchmarks, compare, STAGES
+
+
+def _height(token):
+    if isinstance(token, dict):
+        return 1 + max(_height(t) for t in token['args'])
+    return 1
+
+
+def _size(token):
+    if isinstance(token, dict):
+        return 1 + sum(_size(t) for t in token['args'])
+    return 0
+
+
+class GeneratorCheck(unittest.TestCase):
+
+    def test_size_depth(self):
+        generator = ExpressionGenerator(seed=0, repetition=0.3)
+        for _ in range(50):
+            token = generator.tree(20, depth=6)
+            self.assertEqual(_size(token), 20)
+            self.assertLessEqual(_height(token), 6)
+        self.assertRaises(ValueError, generator.tree, 8, depth=4)
+
+
+    def test_operators(self):
+        generator = ExpressionGenerator(operators={'*': 1}, variables=('x',),
+                                        number_prob=0, seed=0)
+        self.assertEqual(Formatter(LanguageMathematica())(generator.tree(3)),
+                         'x * x * x * x')
+
+
+    def test_round_trip(self):
+        language = LanguageMathematica()
+        text = ExpressionGenerator(seed=1).text(language, 10, 15)
+        self.assertEqual(len(text.split('\n')), 10)
+        parser = ParserText(language)
+        parser.parse_text(text)
+        self.assertEqual(Formatter(language)(parser), text)
+
+
+    def test_repetition(self):
+        language = LanguageMathematica()
+        costs = []
+        for repetition in [0, 0.8]:
+            generator = ExpressionGenerator(repetition=repetition, seed=2)
+            parser = ParserText(language)
+            parser.parse_text(generator.text(language, 10, 20))
+            parser.optimize_runtime()
+            costs.append(parser.report.cost_after / parser.report.cost_before)
+        self.assertLess(costs[1], costs[0])
+
+
+class BenchmarkCheck(unittest.TestCase):
+
+    def test_benchmark(self):
+        results = run_benchmarks(['many_small'], ['python'], repeat=1)
+        self.assertEqual(sorted(results),
+                         sorted('many_small/python/' + s for s in STAGES))
+        for result in results.values():
+            self.assertGreater(result['throughput'], 0)
+
+        baseline = {key: {'time': 2 * res['time']} for key, res in results.items()}
+        self.assertEqual(compare(results, baseline), [])
+        key = 'many_small/python/parse'
+        baseline[key]['time'] = results[key]['time'] / 2
+        self.assertEqual([r[0] for r in compare(results, baseline)], [key])
+        self.assertEqual(compare(results, baseline, threshold=1.5), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
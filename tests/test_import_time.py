@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SCRIPT = """
+import json, sys, time
+start = time.time()
+%s
+duration = time.time() - start
+print(json.dumps({'duration': duration,
+                  'pyparsing': 'pyparsing' in sys.modules,
+                  'parser': 'src.parser_line' in sys.modules}))
+"""
+
+
+class ImportTimeCheck(unittest.TestCase):
+
+    budget = 0.25  # < maximal time in seconds for importing the modules
+
+    def run_script(self, code):
+        output = subprocess.check_output([sys.executable, '-c', SCRIPT % code],
+                                         cwd=ROOT, universal_newlines=True)
+        return json.loads(output)
+
+
+    def test_formatter(self):
+        res = self.run_script(
+            "from src.formatter import Formatter\n"
+            "from src.language import LanguagePython\n"
+            "token = {'op': 'sin', 'pos': 'function', 'args': ['x']}\n"
+            "assert Formatter(LanguagePython())(token) == 'np.sin(x)'")
+        self.assertFalse(res['pyparsing'])
+        self.assertFalse(res['parser'])
+        self.assertLess(res['duration'], self.budget)
+
+
+    def test_parser(self):
+        res = self.run_script(
+            "from src.parser_text import ParserText\n"
+            "from src.language import LanguageMathematica\n"
+            "parser = ParserText(LanguageMathematica())")
+        self.assertFalse(res['pyparsing'])
+        self.assertLess(res['duration'], self.budget)
+
+        res = self.run_script("from src.cli import main")
+        self.assertFalse(res['pyparsing'])
+        self.assertLess(res['duration'], self.budget)
+
+
+if __name__ == "__main__":
+    unittest.main()
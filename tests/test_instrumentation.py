@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import io
+import os
+import sys
+import tempfile
+sys.path.append('..')
+
+from src.language import LanguageMathematica, LanguagePython
+from src.parser_text import ParserText
+from src.formatter import Formatter
+from src.instrumentation import (instrument, profile, count_nodes, is_active,
+                                 StageStatistics)
+
+
+class InstrumentationCheck(unittest.TestCase):
+
+    def convert(self, text):
+        parser = ParserText(LanguageMathematica())
+        parser.parse_text(text)
+        parser.optimize_runtime()
+        return Formatter(LanguagePython())(parser)
+
+
+    def test_callback(self):
+        records = []
+        callback = lambda *args: records.append(args)
+        with instrument(callback):
+            self.assertTrue(is_active())
+            self.convert("a = Sin[x]^2\nb = Sin[x]^2 + 1")
+        self.assertFalse(is_active())
+
+        names = [r[0] for r in records]
+        for name in ['pre_process', 'parse', 'nested_structure', 'annotate',
+                     'optimize_iteration', 'format']:
+            self.assertIn(name, names)
+        self.assertEqual(names.count('parse'), 2)
+        self.assertEqual(names.count('optimize_iteration'), 2)
+        self.assertEqual(names[-1], 'format')
+
+        for name, duration, size, nodes in records:
+            self.assertGreaterEqual(duration, 0)
+        self.assertEqual(records[-1][2], len("t_0 = np.sin(x) ** 2\na = t_0\n"
+                                             "b = t_0 + 1"))
+        self.assertEqual(records[-1][3], 6 + 3 + 5)
+
+        # no records outside of the context
+        self.convert("a = 1")
+        self.assertEqual(records[-1][0], 'format')
+
+
+    def test_statistics(self):
+        with instrument(StageStatistics()) as stats:
+            for _ in range(5):
+                self.convert("a = Sin[x]^2")
+        self.assertEqual(len(stats.durations['parse']), 5)
+        self.assertLessEqual(stats.percentile('parse', 50),
+                             stats.percentile('parse', 90))
+        summary = stats.summary()
+        self.assertEqual(summary['parse']['count'], 5)
+        self.assertEqual(summary['parse']['size'], 5 * len("a = Sin[x]^2"))
+        self.assertIn('p99', summary['format'])
+        self.assertIn('nested_structure', str(stats))
+
+        # only the latest durations are kept
+        stats = StageStatistics(window=2)
+        for duration in (3., 1., 2.):
+            stats('parse', duration, None, None)
+        summary = stats.summary()['parse']
+        self.assertEqual(list(stats.durations['parse']), [1., 2.])
+        self.assertEqual((summary['count'], summary['total']), (3, 6.))
+        self.assertEqual((summary['min'], summary['max']), (1., 2.))
+
+
+    def test_count_nodes(self):
+        token = {'op': '+', 'pos': 'infix',
+                 'args': ['a', {'op': 'sin', 'pos': 'function', 'args': ['b']}]}
+        self.assertEqual(count_nodes(token), 4)
+        self.assertEqual(count_nodes([token, 'c']), 5)
+        self.assertEqual(count_nodes(''), 0)
+
+
+    def test_profile(self):
+        stream = io.StringIO()
+        with profile(stream=stream):
+            self.convert("a = Sin[x]")
+        self.assertIn('parse_string', stream.getvalue())
+
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with profile(filename):
+                self.convert("a = Sin[x]")
+            self.assertGreater(os.path.getsize(filename), 0)
+        finally:
+            os.remove(filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import os
+import sys
+import ctypes
+import shutil
+import subprocess
+import tempfile
+sys.path.append('..')
+
+import numpy as np
+
+from src.language import LanguageC, LanguageMathematica, LanguagePython
+from src.parser_line import ParserLine
+from src.parser_text import ParserText
+from src.formatter import Formatter, FormatterC
+from src.evaluator import Evaluator
+
+COMPILER = shutil.which('cc') or shutil.which('gcc')
+
+
+class LanguageCCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = ParserText(LanguageMathematica())
+        self.formatter = FormatterC()
+
+
+    def test_format(self):
+        parser = ParserLine(LanguageMathematica())
+        formatter = Formatter(LanguageC())
+        self.assertEqual(formatter(parser.parse_string("Sin[x]^2 + E^y / 2")),
+                         "pow(sin(x),2.) + (exp(y) / 2.)")
+        parser.parse_string("M[[1, 2]] * Pi")
+        self.assertEqual(self.formatter(parser), "M[0][1] * M_PI")
+        self.assertEqual(formatter(parser.parse_string("ArcTan[x] - Gamma[x]")),
+                         "atan(x) - tgamma(x)")
+
+        # functions missing in math.h
+        self.assertEqual(formatter(parser.parse_string("Sign[x] + Coth[x + 1]")),
+                         "((x > 0.) - (x < 0.)) + (1. / tanh(x + 1.))")
+        self.assertEqual(formatter(parser.parse_string("ArcCoth[x]")),
+                         "atanh(1. / x)")
+        with self.assertRaises(ValueError):
+            formatter(parser.parse_string("ExpIntegralE[1, x]"))
+
+        self.parser.parse_text("a = Sin[x]^2 + 1\nb = Sin[x]^2 * a")
+        self.parser.optimize_runtime()
+        self.assertEqual(self.formatter(self.parser),
+                         "const double t_0 = pow(sin(x),2.);\n"
+                         "a = t_0 + 1.;\nb = t_0 * a;")
+
+
+    def test_parse(self):
+        parser = ParserLine(LanguageC())
+        formatter = Formatter(LanguagePython())
+        self.assertEqual(formatter(parser.parse_string("a = M_PI * x[1][2]")),
+                         "a = np.pi * x[1,2]")
+
+
+    def test_function(self):
+        self.parser.parse_text("a = Sin[x]^2 + 1\nb = a * y")
+        code = self.formatter.format_function(self.parser, 'calc', ['x', 'y'],
+                                              ['b'])
+        self.assertEqual(code, "void calc(double x, double y, double *b)\n{\n"
+                               "    double a = pow(sin(x),2.) + 1.;\n"
+                               "    (*b) = a * y;\n}")
+
+
+    @unittest.skipIf(COMPILER is None, 'no C compiler available')
+    def test_compile(self):
+        text = ("a = Sin[x]^2 + Cos[y] * Exp[-x / 2]\n"
+                "b = Sqrt[a + 1] - Pi*x + M[[2, 1]]\n"
+                "c = ArcTan[b] / (1 + a^2) + E^y + Sin[x]^2 + Coth[x]\n"
+                "d = Tanh[a*b] + Log[c^2 + 1]^3 - 1/3 + Sign[y] - ArcCoth[c]")
+        self.parser.parse_text(text)
+        self.parser.optimize_runtime()
+        outputs = ['a', 'b', 'c', 'd']
+        code = self.formatter.format_function(
+            self.parser, 'calc', ['x', 'y', 'const double M[2][2]'], outputs)
+
+        # compile the code as a shared library
+        folder = tempfile.mkdtemp()
+        try:
+            path_c = os.path.join(folder, 'calc.c')
+            path_lib = os.path.join(folder, 'calc.so')
+            with open(path_c, 'w') as fp:
+                fp.write('#include <math.h>\n\n' + code + '\n')
+            subprocess.check_call([COMPILER, '-O2', '-shared', '-fPIC',
+                                   '-Werror=implicit-function-declaration',
+                                   '-o', path_lib, path_c, '-lm'])
+            lib = ctypes.CDLL(path_lib)
+        finally:
+            shutil.rmtree(folder)
+
+        matrix = np.array([[0., 1.], [2., 3.]])
+        for x, y in [(0.3, -0.2), (1.5, 2.)]:
+            res = [ctypes.c_double() for _ in outputs]
+            lib.calc(ctypes.c_double(x), ctypes.c_double(y),
+                     matrix.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+                     *[ctypes.byref(r) for r in res])
+
+            expected = Evaluator(self.parser, LanguageMathematica())(
+                x=x, y=y, M=matrix)
+            for name, value in zip(outputs, res):
+                self.assertAlmostEqual(value.value, expected[name])
+
+
+if __name__ == "__main__":
+    unittest.main()
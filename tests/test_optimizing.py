@@ -6,11 +6,12 @@ except ImportError:
     import unittest
 
 import sys
+import json
 sys.path.append('..')
 
 import numpy as np
 
-from src.language import LanguagePython
+from src.language import LanguagePython, LanguageMathematica
 from src.parser_text import ParserText
 from src.formatter import Formatter
 
@@ -58,5 +59,195 @@ class ParserOptimizeCheck(ParserPythonCheck):
                     "t_1 = np.sin(a)\nt_0 = t_1 ** (b ** c)\nt_0\nt_0 + t_1")
         
 
+    def test_report(self):
+        self.parse("a = sin(x)**2\nb = sin(x)**2 + sin(x)")
+        report = self.parser.report
+        self.assertEqual(report.iterations, 3)
+        self.assertEqual(len(report.iteration_times), 3)
+        self.assertGreater(report.cost_before, report.cost_after)
+        self.assertEqual(report.cost_after, self.parser.get_cost())
+
+        data = json.loads(report.to_json())
+        self.assertEqual([t['name'] for t in data['temporaries']],
+                         ['t_0', 't_1'])
+        self.assertEqual(data['temporaries'][0]['expression'], 'np.sin(x) ** 2')
+        self.assertEqual(data['temporaries'][0]['occurrences'], 2)
+        self.assertEqual(data['temporaries'][1]['expression'], 'np.sin(x)')
+        self.assertEqual(data['temporaries'][1]['occurrences'], 2)
+        savings = sum(t['saving'] for t in data['temporaries'])
+        self.assertAlmostEqual(savings, report.cost_before - report.cost_after)
+
+        self.parse("a = 1")
+        self.assertEqual(self.parser.report.temporaries, [])
+        self.assertEqual(self.parser.report.iterations, 1)
+
+
+    def test_shapes(self):
+        code = ("a = 2*k/L*x\nb = x*2*k + sin(2*k)*y\nc = x/L/k\nd = k*x\n"
+                "e = sin(2*k)*x")
+        self.parser.parse_text(code)
+        self.parser.optimize_runtime(shapes={'x': 100, 'y': (10, 10)})
+        self.assertEqual(self.formatter(self.parser),
+                         "a = ((2 * k) / L) * x\nt_0 = np.sin(2 * k)\n"
+                         "b = (2 * k * x) + (t_0 * y)\nc = x / (L * k)\n"
+                         "d = k * x\ne = t_0 * x")
+        report = self.parser.report
+        self.assertGreater(report.cost_before, report.cost_after)
+        self.assertEqual([(t['size'], t['occurrences']) for t in report.temporaries],
+                         [(1, 2)])
+
+        # scalars used once are not hoisted
+        self.parser.parse_text("z = sin(2*k*x)/L")
+        self.parser.optimize_runtime(shapes={'x': 1000})
+        self.assertEqual(self.formatter(self.parser), "z = np.sin(2 * k * x) / L")
+        report = self.parser.report
+        self.assertEqual(report.temporaries, [])
+        self.assertLessEqual(report.cost_after, report.cost_before)
+
+        # the costs scale with the number of elements
+        self.parser.parse_text("a = x + 1")
+        self.parser.optimize_runtime(shapes={'x': (3, 4)})
+        self.assertEqual(self.parser.report.cost_before, 12 + 2 * 12)
+
+        # the results do not change
+        values = {'k': 1.5, 'L': 3., 'x': np.arange(100.), 'y': np.ones(100)}
+        self.parser.parse_text(code)
+        expected = dict(values)
+        exec(self.formatter(self.parser), {'np': np}, expected)
+        self.parser.optimize_runtime(shapes={'x': 100, 'y': 100})
+        result = dict(values)
+        exec(self.formatter(self.parser), {'np': np}, result)
+        for name in 'abcde':
+            np.testing.assert_allclose(result[name], expected[name])
+
+
+    def test_dead_code(self):
+        self.parser.parse_text("a = sin(x)\nb = cos(x)\nc = a**2\nd = c + b\n"
+                               "a = 1\ny[1] = b\nc\nz[0] = a")
+        dropped = self.parser.eliminate_dead_code(['c', 'z'])
+        self.assertEqual(self.formatter(dropped),
+                         "b = np.cos(x)\nd = c + b\ny[1] = b")
+        self.assertEqual(self.formatter(self.parser),
+                         "a = np.sin(x)\nc = a ** 2\na = 1\nc\nz[0] = a")
+
+        self.parser.parse_text("a = sin(x)**2\nb = sin(x)**2 + y\nc = b + 1")
+        self.parser.optimize_runtime(outputs=['a'])
+        self.assertEqual(self.formatter(self.parser), "a = np.sin(x) ** 2")
+        self.assertEqual(self.parser.report.dropped, ['b', 'c'])
+        self.assertEqual(self.parser.report.temporaries, [])
+
+
+    def test_vectorize_arrays(self):
+        self.parser.parse_text("C[0,0] = sin(x)**2\nC[0,1] = sin(x)**2 + 1\n"
+                               "C[1,0] = 1\nC[1,1] = a\nd = C[0,1]\nD[1] = 1\n"
+                               "D[0] = C[0,0]\nF[1] = 2\nF[0] = F[1]\nG[1] = 1\n"
+                               "H[0] = 1\nH[0] = 2")
+        self.assertEqual(self.parser.vectorize_arrays(), ['C', 'D'])
+        self.parser.optimize_runtime()
+        self.assertEqual(self.formatter(self.parser),
+                         "t_0 = np.sin(x) ** 2\n"
+                         "C = np.array([[t_0, t_0 + 1], [1, a]])\nd = C[0,1]\n"
+                         "D = np.array([C[0,0], 1])\nF[1] = 2\nF[0] = F[1]\n"
+                         "G[1] = 1\nH[0] = 1\nH[0] = 2")
+
+        parser = ParserText(LanguageMathematica())
+        parser.parse_text("c[[1]] = Sin[x]\nc[[2]] = 2")
+        self.assertEqual(parser.vectorize_arrays(), ['c'])
+        self.assertEqual(Formatter(LanguageMathematica())(parser),
+                         "c = {Sin[x], 2}")
+
+        # the indices of later reads would not match the list
+        text = ("C[[1, 1]] = a\nC[[1, 2]] = b\nC[[2, 1]] = c\nC[[2, 2]] = d\n"
+                "r = C[[1, 1]]")
+        parser.parse_text(text)
+        self.assertEqual(parser.vectorize_arrays(), [])
+        self.assertEqual(len(parser.result), 5)
+
+        # arrays used before the block or elsewhere may be larger inputs
+        self.parser.parse_text("r = C[2,2]\nC[0,0] = a\nC[0,1] = b\n"
+                               "C[1,0] = c\nC[1,1] = d")
+        self.assertEqual(self.parser.vectorize_arrays(), [])
+        self.parser.parse_text("C[0,0] = a\nC[0,1] = b\nC[1,0] = c\n"
+                               "C[1,1] = d\nr = C[2,2]")
+        self.assertEqual(self.parser.vectorize_arrays(), [])
+
+
+    def test_schedule(self):
+        self.parser.parse_text("a = sin(x)**2\nb = cos(y)**2\nc = sin(x)**2 + 1\n"
+                               "d = cos(y)**2 + 1\na\nb")
+        self.parser.optimize_runtime(schedule=True)
+        self.assertEqual(self.formatter(self.parser),
+                         "t_0 = np.sin(x) ** 2\na = t_0\nc = t_0 + 1\na\n"
+                         "t_1 = np.cos(y) ** 2\nb = t_1\nd = t_1 + 1\nb")
+        self.assertEqual(self.parser.report.peak_live, {'before': 2, 'after': 1})
+        self.assertEqual(self.parser.report.to_dict()['peak_live'],
+                         {'before': 2, 'after': 1})
+
+        # dependencies between the lines are kept
+        self.parser.parse_text("t_0 = 2*x\na = t_0\nx = 1\nt_1 = x*a\nb = t_1\n"
+                               "c = t_0")
+        self.assertEqual(self.parser.peak_live(), 2)
+        self.assertEqual(self.parser.schedule_statements(), (2, 1))
+        self.assertEqual(self.formatter(self.parser),
+                         "t_0 = 2 * x\na = t_0\nc = t_0\nx = 1\nt_1 = x * a\n"
+                         "b = t_1")
+        self.assertEqual(self.parser.peak_live([]), 0)
+
+
+    def test_limits(self):
+        code = "a = sin(x)**2\nb = sin(x)**2 + sin(x)\nc = exp(y)**2\nd = exp(y)**2"
+        self.parser.parse_text(code)
+        self.parser.optimize_runtime()
+        report = self.parser.report
+        self.assertTrue(report.converged)
+        self.assertIsNone(report.limit)
+        self.assertEqual(len(report.temporaries), 3)
+        optimal = self.formatter(self.parser)
+
+        for limits in [{'max_iterations': 2}, {'max_temporaries': 2},
+                       {'callback': lambda report: len(report.temporaries) == 2}]:
+            self.parser.parse_text(code)
+            self.parser.optimize_runtime(**limits)
+            report = self.parser.report
+            self.assertFalse(report.converged)
+            self.assertEqual(report.limit, list(limits)[0])
+            self.assertEqual(len(report.temporaries), 2)
+            self.assertEqual(report.cost_after, self.parser.get_cost())
+
+        self.parser.parse_text(code)
+        self.parser.optimize_runtime(max_time=0)
+        self.assertEqual(self.parser.report.limit, 'max_time')
+        self.assertEqual(self.parser.report.temporaries, [])
+        self.assertNotEqual(self.formatter(self.parser), optimal)
+
+        progress = []
+        self.parser.parse_text(code)
+        self.parser.optimize_runtime(callback=lambda r: progress.append(r.iterations))
+        self.assertEqual(progress, [1, 2, 3])
+        self.assertEqual(self.formatter(self.parser), optimal)
+
+
+    def test_parallel(self):
+        code = ("a = sin(x)**2\nb = exp(y)**2\nc = sin(x)**2 + 1\n"
+                "d = exp(y)**2 * sin(z)\ne = sin(z)*cos(z)**2\nf = cos(z)**2\n"
+                "g = x + 1")
+        self.parser.parse_text(code)
+        lines = self.parser._annotate_expression(self.parser.result)[0]
+        self.assertEqual(self.parser._components(lines),
+                         [[0, 2], [1, 3, 4, 5], [6]])
+        serial = self.parse(code)
+        cost = self.parser.report.cost_after
+
+        for workers in [1, 2]:
+            self.parser.parse_text(code)
+            self.parser.optimize_runtime_parallel(workers)
+            self.assertEqual(self.formatter(self.parser), serial)
+            report = self.parser.report
+            self.assertEqual(report.cost_after, cost)
+            self.assertEqual(sorted(t['name'] for t in report.temporaries),
+                             ['t_0', 't_1', 't_2', 't_3'])
+            self.assertTrue(report.converged)
+
+
 if __name__ == "__main__":
     unittest.main()
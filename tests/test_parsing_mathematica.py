@@ -10,10 +10,13 @@ import random
 sys.path.append('..')
 
 import numpy as np
+from pyparsing import ParseException
 
 from src.parser_line import ParserLine
+from src.parser_text import ParserText
 from src.language import LanguageMathematica, LanguagePython
-from src.formatter import Formatter
+from src.formatter import Formatter, FormatterMathematica
+from src.converter import Converter
 
 class ParserMathematicaCheck(unittest.TestCase):
 
@@ -92,5 +95,93 @@ class ParserMathematicaCheck(unittest.TestCase):
         self.assertEqual(self.calc("(1+2)^2"), 9)
 
 
+class FastPathCheck(unittest.TestCase):
+
+    lines = ['1', 'x', 'a = b', ' x1_a = 1.5 ', 'y=2e-3', 'a = 2.', 'Pi', 'a = E',
+             'pi', 'a == b', '5e3', 'a = -1']
+
+    def test_fast_path(self):
+        for language in (LanguageMathematica(), LanguagePython(),
+                         LanguagePython(int2float=True)):
+            fast = ParserLine(language)
+            full = ParserLine(language)
+            full.use_fast_path = False
+            for line in self.lines:
+                self.assertEqual(fast.parse_string(line), full.parse_string(line))
+            self.assertEqual(sum(fast.stats.values()), len(self.lines))
+            self.assertEqual(full.stats['fast'], 0)
+
+            # lines are parsed completely
+            invalid = ['a = b c', 'a = Sin[x']
+            if isinstance(language, LanguagePython):
+                invalid += ['a := 1', 'a = Sin[x]']
+            for line in invalid:
+                self.assertRaises(ParseException, fast.parse_string, line)
+                self.assertRaises(ParseException, full.parse_string, line)
+
+        parser = ParserLine(LanguageMathematica())
+        for line in self.lines + ['a := 1', 'a = Sin[x]']:
+            parser.parse_string(line)
+        self.assertEqual(parser.stats, {'fast': 7, 'full': 7})
+
+
+
+class FormatterMathematicaCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = ParserText(LanguagePython())
+        self.formatter = FormatterMathematica()
+
+
+    def test_temporaries(self):
+        converter = Converter('python', 'mathematica', optimize=True)
+        self.assertEqual(converter.convert("a = sin(x)**2 + 1\nb = sin(x)**2 * a"),
+                         "t0 = Sin[x] ^ 2\na = t0 + 1\nb = t0 * a")
+
+        # names used by the code are not chosen for the temporaries
+        self.assertEqual(converter.convert("t0 = y + 1\na = sin(x)**2 + t0\n"
+                                           "b = sin(x)**2 * t1"),
+                         "t0 = y + 1\nt2 = Sin[x] ^ 2\na = t2 + t0\nb = t2 * t1")
+
+
+    def test_with(self):
+        self.parser.parse_text("a = sin(x)**2 + 1\nb = sin(x)**2 * y\nc = a + b\n"
+                               "a * c")
+        self.parser.optimize_runtime()
+        self.assertEqual(self.formatter.format_compile(self.parser, ['x', 'y']),
+                         "Compile[{{x, _Real}, {y, _Real}},\n"
+                         "  With[{t0 = Sin[x] ^ 2},\n"
+                         "    With[{a = t0 + 1, b = t0 * y},\n"
+                         "      With[{c = a + b},\n"
+                         "        {a, b, c, a * c}]]]]")
+        self.assertEqual(self.formatter.format_compile(self.parser, ['x', 'y'],
+                                                       ['c']).split('\n')[-1],
+                         "        c]]]]")
+
+        self.parser.parse_text("a = sin(t0)**2 + 1\nb = sin(t0)**2 * y")
+        self.parser.optimize_runtime()
+        self.assertEqual(self.formatter.format_compile(self.parser, ['t0', 'y']),
+                         "Compile[{{t0, _Real}, {y, _Real}},\n"
+                         "  With[{t1 = Sin[t0] ^ 2},\n"
+                         "    With[{a = t1 + 1, b = t1 * y},\n"
+                         "      {a, b}]]]")
+
+
+    def test_module(self):
+        self.parser.parse_text("M[0] = sin(x)**2\nM[1] = cos(x)*sin(x)**2\n"
+                               "d = M[1] + N[2,0]\nx = 2*x")
+        self.parser.optimize_runtime()
+        code = self.formatter.format_compile(self.parser, ['x', '{N, _Real, 2}'],
+                                             ['M', 'd'])
+        self.assertEqual(code, "Compile[{{x, _Real}, {N, _Real, 2}},\n"
+                               "  Module[{t0, M = Table[0., {2}], d, x = x},\n"
+                               "    t0 = Sin[x] ^ 2;\n"
+                               "    M[[1]] = t0;\n"
+                               "    M[[2]] = Cos[x] * t0;\n"
+                               "    d = M[[2]] + N[[3,1]];\n"
+                               "    x = 2 * x;\n"
+                               "    {M, d}]]")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -5,6 +5,8 @@ try:
 except ImportError:
     import unittest
 
+import cmath
+import math
 import sys
 import random
 sys.path.append('..')
@@ -12,8 +14,10 @@ sys.path.append('..')
 import numpy as np
 
 from src.parser_line import ParserLine
-from src.language import LanguagePython
+from src.parser_text import ParserText
+from src.language import LanguagePython, LanguagePythonScalar, LanguageMathematica
 from src.formatter import Formatter
+from src.converter import Converter
 
 class ParserPythonCheck(unittest.TestCase):
     
@@ -100,5 +104,62 @@ class ParserPythonCheck(unittest.TestCase):
             "sin(1.)**(2.**3.) - sin(1.)**(2.**3.) + sin(1.) == sin(1.)"), True)
 
 
+
+class ScalarPythonCheck(unittest.TestCase):
+
+    def convert(self, s, language):
+        parser = ParserText(LanguageMathematica())
+        return Formatter(language)(parser.parse_text(s))
+
+
+    def test_scalar(self):
+        language = LanguagePythonScalar()
+        self.assertEqual(self.convert("a = Sin[x] + Exp[y]*Pi - ArcTan[Gamma[2]]",
+                                      language),
+                         "a = (math.sin(x) + (math.exp(y) * math.pi)) - "
+                         "math.atan(math.gamma(2))")
+        self.assertEqual(self.convert("ExpIntegralE[1, x]", language),
+                         "scipy.special.expn(1,x)")
+        code = Converter("mathematica", "pythonscalar").convert(
+            "a = Sqrt[x]*Cos[E^2]")
+        self.assertAlmostEqual(eval(code.split(" = ")[1], {"math": math, "x": 2.}),
+                               math.sqrt(2.) * math.cos(math.e**2))
+
+        # constants are read back
+        parser = ParserLine(LanguagePythonScalar())
+        self.assertEqual(parser.parse_string("math.pi + math.e"),
+                         {'op': '+', 'pos': 'infix', 'args': ['PI', 'E']})
+
+
+    def test_complex(self):
+        language = LanguagePythonScalar(complex=True)
+        code = self.convert("Sqrt[x] + Pi*Trunc[y] + Gamma[z]", language)
+        self.assertEqual(code, "cmath.sqrt(x) + (cmath.pi * math.trunc(y)) + "
+                               "scipy.special.gamma(z)")
+        self.assertEqual(eval(self.convert("Sqrt[-4]", language),
+                              {"cmath": cmath}), 2j)
+
+
+    def test_arrays(self):
+        language = LanguagePythonScalar(arrays=["v"])
+        code = self.convert("b = Sin[v] + Cos[x]\nc = Sqrt[b]\nd = Sin[v[[1]]]",
+                            language)
+        self.assertEqual(code.split("\n"), [
+            "b = np.sin(v) + math.cos(x)",
+            "c = np.sqrt(b)",
+            "d = math.sin(v[1])"])
+        elements = {'op': 'list', 'pos': 'list', 'args': ['x', 'y']}
+        token = {'op': '=', 'pos': 'infix', 'args': [
+            'e', {'op': 'exp', 'pos': 'prefix', 'args': [elements]}]}
+        formatter = Formatter(language)
+        self.assertEqual(formatter(token), "e = np.exp(np.array([x, y]))")
+        self.assertEqual(language.arrays, {"v"})
+
+        # arrays assigned by one code are scalars in the next one
+        parser = ParserText(LanguageMathematica())
+        self.assertEqual(formatter(parser.parse_text("e = Exp[x]\nf = Sqrt[b]")),
+                         "e = math.exp(x)\nf = math.sqrt(b)")
+
+
 if __name__ == "__main__":
     unittest.main()
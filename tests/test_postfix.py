@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import pickle
+import sys
+sys.path.append('..')
+
+from src.language import (LanguagePython, LanguagePythonScalar,
+                          LanguageMathematica, LanguageC)
+from src.parser_line import ParserLine
+from src.parser_text import ParserText
+from src.formatter import Formatter, FormatterC
+from src.generator import ExpressionGenerator
+from src.postfix import PostfixProgram
+
+
+TEXT = ("a = Sin[x]^2 + E^(-y)\n"
+        "b = x[[1, 2]] - ArcTan[a, 3.5]\n"
+        "c = (a + b) + (x*y)*z\n"
+        "a == -b")
+
+
+class PostfixCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = ParserText(LanguageMathematica())
+        self.trees = self.parser.parse_text(TEXT)
+
+
+    def test_from_trees(self):
+        program = PostfixProgram.from_trees(self.trees)
+        self.assertEqual(len(program), 4)
+        self.assertEqual(program.to_trees(), self.trees)
+        self.assertEqual(len(program.strings), len(set(program.strings)))
+        # the last node of every line spans the complete line
+        start = 0
+        for end in program.line_ends:
+            self.assertEqual(program.sizes[end - 1], end - start)
+            start = end
+
+
+    def test_from_stacks(self):
+        parser = ParserLine(LanguageMathematica())
+        stacks = []
+        for line in TEXT.split('\n'):
+            parser.parse_string(line)
+            stacks.append(list(parser.result_stack))
+        program = PostfixProgram.from_stacks(stacks)
+        self.assertEqual(program.to_trees(), self.trees)
+        reference = PostfixProgram.from_trees(self.trees)
+        self.assertEqual(list(program.kinds), list(reference.kinds))
+        self.assertEqual(list(program.sizes), list(reference.sizes))
+
+
+    def test_slicing(self):
+        program = PostfixProgram.from_trees(self.trees)
+        part = program[1:3]
+        self.assertEqual(len(part), 2)
+        self.assertIsInstance(part.kinds, memoryview)
+        self.assertEqual(part.to_trees(), self.trees[1:3])
+        self.assertEqual(part[1:].to_trees(), self.trees[2:3])
+        self.assertEqual(program[3:1].to_trees(), [])
+        with self.assertRaises(ValueError):
+            program[::2]
+
+        # pickling copies the views
+        copy = pickle.loads(pickle.dumps(part))
+        self.assertEqual(copy.to_trees(), self.trees[1:3])
+
+
+    def test_shared_memory(self):
+        program = PostfixProgram.from_trees(self.trees)
+        shm, descriptor = program.to_shared_memory()
+        try:
+            attached = PostfixProgram.from_shared_memory(descriptor)
+            self.assertEqual(attached.to_trees(), self.trees)
+            self.assertEqual(attached[2:].to_trees(), self.trees[2:])
+            attached.close()
+            self.assertEqual(attached.nodes, 0)
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+    def test_costs(self):
+        program = PostfixProgram.from_trees(self.trees)
+        expected = [self.parser._calculate_costs_rec(t)[1] for t in self.trees]
+        self.assertEqual(program.line_costs(), expected)
+
+        hashes = program.hashes()
+        for tree, end in zip(self.trees, program.line_ends):
+            expected = self.parser._calculate_costs_rec(tree)[0]['hash']
+            self.assertEqual(hashes[end - 1], expected)
+
+
+    def test_format(self):
+        generator = ExpressionGenerator(seed=1, repetition=0.3)
+        trees = generator.lines(20, 12) + self.trees
+        trees.append({'op': 'list', 'pos': 'list', 'args': [
+            {'op': 'list', 'pos': 'list', 'args': ['1', '(2)']},
+            {'op': 'list', 'pos': 'list', 'args': ['x', 'y']}]})
+        program = PostfixProgram.from_trees(trees)
+        for language in (LanguagePython(), LanguagePython(int2float=True),
+                         LanguageMathematica(), LanguageC()):
+            formatter = Formatter(language)
+            self.assertEqual(program.format(formatter),
+                             [formatter(t) for t in trees])
+        formatter = FormatterC()
+        self.assertEqual(program.format(formatter), [formatter(t) for t in trees])
+
+        # assigned arrays are recognized by the following lines
+        trees = self.parser.parse_text("a = Sin[v]\nb = Cos[a]")
+        formatter = Formatter(LanguagePythonScalar(arrays=['v']))
+        self.assertEqual(PostfixProgram.from_trees(trees).format(formatter),
+                         ["a = np.sin(v)", "b = np.cos(a)"])
+
+
+if __name__ == '__main__':
+    unittest.main()
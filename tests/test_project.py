@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import os
+import shutil
+import sys
+import tempfile
+sys.path.append('..')
+
+import numpy as np
+
+from src.language import LanguagePython, LanguageMathematica
+from src.formatter import Formatter, FormatterMathematica
+from src.project import Project
+
+
+FILES = [('a', "x = Sin[u]^2 * Exp[v] + Cos[w]\ny = x + Sin[u]^2"),
+         ('b', "z = Sin[u]^2 * Exp[v] - 1\nx = 2\nq = Cos[x]^2 + Cos[x]^2"),
+         ('c', "r = Cos[w] * Sin[u]^2\ns0 = 1")]
+
+
+class ProjectCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.project = Project(LanguageMathematica(), 'common')
+        for name, text in FILES:
+            self.project.add_text(name, text)
+
+
+    def evaluate(self, outputs, inputs):
+        """Evaluates every file in its own namespace, where the shared module
+        is written to a temporary folder"""
+        folder = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        try:
+            path = self.project.get_path(LanguagePython())
+            with open(os.path.join(folder, path), 'w') as fp:
+                fp.write(outputs.pop('common'))
+            os.chdir(folder)
+            results = {}
+            for name, code in outputs.items():
+                results[name] = dict(inputs, np=np)
+                exec(code, results[name])
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(folder)
+        return results
+
+
+    def test_extract(self):
+        formatter = Formatter(LanguagePython())
+        inputs = {'u': 0.3, 'v': 1.2, 'w': -0.7}
+        expected = self.evaluate(self.project.format(formatter), inputs)
+        cost = self.project.get_cost()
+
+        self.assertEqual(self.project.optimize_runtime(), ['s1', 's2', 's3'])
+        self.assertLess(self.project.get_cost(), cost)
+        outputs = self.project.format(formatter)
+        self.assertEqual(outputs['common'], "s1 = np.sin(u) ** 2\n"
+                                            "s2 = np.cos(w)\ns3 = s1 * np.exp(v)")
+        self.assertEqual(outputs['a'], 'exec(open("common.py").read())\n'
+                                       "x = s3 + s2\ny = x + s1")
+        # the local variable `x` shadows the input of the other files
+        self.assertEqual(outputs['b'], 'exec(open("common.py").read())\n'
+                                       "z = s3 - 1\n"
+                                       "x = 2\nt_0 = np.cos(x) ** 2\n"
+                                       "q = t_0 + t_0")
+
+        results = self.evaluate(outputs, inputs)
+        for name, values in expected.items():
+            for variable in ('x', 'y', 'z', 'q', 'r'):
+                if variable in values:
+                    self.assertAlmostEqual(results[name][variable],
+                                           values[variable])
+
+        # the shared module is evaluated once for all files
+        outputs = self.project.format(formatter, references=False)
+        env = dict(inputs, np=np)
+        for code in outputs.values():
+            self.assertNotIn('exec', code)
+            exec(code, env)
+        self.assertAlmostEqual(env['r'], expected['c']['r'])
+
+
+    def test_local_variables(self):
+        project = Project(LanguageMathematica())
+        project.add_text('a', "y = Sin[x]^2*Exp[x]")
+        project.add_text('b', "x = 2\nq = Sin[x]^2*Exp[x]")
+        project.add_text('c', "z = Sin[x]^2*Exp[x] + 1")
+        self.assertEqual(project.extract_shared(), ['s0'])
+        formatter = Formatter(LanguageMathematica())
+        self.assertEqual(formatter(project.files['b']),
+                         "x = 2\nq = (Sin[x] ^ 2) * Exp[x]")
+        self.assertEqual(formatter(project.files['c']), "z = s0 + 1")
+
+
+    def test_mathematica(self):
+        project = Project(LanguageMathematica())
+        project.add_text('a', "a = Sin[x]^2 + 1")
+        project.add_text('b', "b = Log[y]\nc = Sin[x]^2 * b")
+        project.add_text('c', "d = 2")
+        project.extract_shared()
+        outputs = project.format(FormatterMathematica())
+        self.assertEqual(list(outputs.items()), [
+            ('shared', "s0 = Sin[x] ^ 2"),
+            ('a', 'Get["shared.m"]\na = s0 + 1'),
+            ('b', 'Get["shared.m"]\nb = Log[y]\nc = s0 * b'),
+            ('c', "d = 2")])
+
+
+if __name__ == '__main__':
+    unittest.main()
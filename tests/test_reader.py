@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import os
+import sys
+import tempfile
+sys.path.append('..')
+
+from src.language import LanguageMathematica
+from src.parser_text import ParserText, ParseError
+from src.reader import MappedTextReader
+
+
+class ReaderCheck(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write(self, data):
+        with open(self.path, 'wb') as fp:
+            fp.write(data)
+
+
+    def test_reader(self):
+        self.write(b'a = 1\r\n\nb = \xc3\xa4\nc')
+        with MappedTextReader(self.path) as reader:
+            self.assertEqual(len(reader), 16)
+            self.assertEqual(list(reader), [(1, 0, 'a = 1'), (2, 7, ''),
+                                             (3, 8, u'b = \xe4'), (4, 15, 'c')])
+
+        self.write(b'')
+        with MappedTextReader(self.path) as reader:
+            self.assertEqual(list(reader), [])
+
+        self.write(b'a = 1\nb = \xff\n')
+        with MappedTextReader(self.path) as reader:
+            with self.assertRaises(ParseError) as cm:
+                list(reader)
+        self.assertEqual((cm.exception.lineno, cm.exception.offset), (2, 6))
+        self.assertIn('line 2', str(cm.exception))
+
+        # lenient reading continues after the line
+        self.write(b'a = 1\nb = \xff\nc')
+        with MappedTextReader(self.path) as reader:
+            items = list(reader.items(strict=False))
+            self.assertIsInstance(items[1][2], ParseError)
+            self.assertEqual(items[2], (3, 12, 'c'))
+            errors = []
+            self.assertEqual(list(reader.lines(errors)), ['a = 1', '', 'c'])
+            self.assertEqual([e.lineno for e in errors], [2])
+
+
+    def test_parse_file(self):
+        text = "a = Sin[x]\n\nb = a^2\n"
+        self.write(text.encode('utf-8'))
+        parser = ParserText(LanguageMathematica())
+        result = parser.parse_file(self.path)
+        self.assertEqual(result, ParserText(LanguageMathematica()).parse_text(text))
+
+        self.write(b"a = Sin[x]\n\n)b = 2\n")
+        with self.assertRaises(ParseError) as cm:
+            parser.parse_file(self.path)
+        self.assertEqual(cm.exception.lineno, 3)
+        self.assertEqual(cm.exception.column, 1)
+        self.assertEqual(cm.exception.offset, 12)
+        self.assertIn('line 3', str(cm.exception))
+
+        errors = []
+        self.write(b")a = 1\nb = 2\n)c = 3\n")
+        result = parser.parse_file(self.path, errors=errors, placeholder='')
+        self.assertEqual(result, ['', {'op': '=', 'pos': 'infix', 'args': ['b', '2']}, ''])
+        self.assertEqual([(e.lineno, e.offset) for e in errors], [(1, 0), (3, 13)])
+
+        # lines which cannot be decoded are reported like syntax errors
+        self.write(b"a = 1\nb = \xff\n)c = 3\nd = 2\n")
+        for statements in (False, True):
+            errors = []
+            result = parser.parse_file(self.path, statements=statements,
+                                       errors=errors)
+            self.assertEqual([e.lineno for e in errors], [2, 3])
+            self.assertEqual(len(result), 2)
+
+
+    def test_parse_lenient(self):
+        parser = ParserText(LanguageMathematica())
+        result, errors = parser.parse_text_lenient("a = 1\n)\n\nb = 2\n)c")
+        self.assertEqual(len(result), 2)
+        self.assertEqual([(e.lineno, e.column, e.message) for e in errors],
+                         [(2, 1, 'invalid syntax'), (5, 1, 'invalid syntax')])
+        self.assertEqual(parser.result, result)
+
+        result, errors = parser.parse_text_lenient(")a = 1; b = 1;\n)c",
+                                                   placeholder='0', statements=True)
+        self.assertEqual(result, ['0', {'op': '=', 'pos': 'infix', 'args': ['b', '1']},
+                                  '0'])
+        self.assertEqual([(e.lineno, e.column) for e in errors], [(1, None), (2, None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
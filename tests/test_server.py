@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+sys.path.append('..')
+
+from src.server import ConversionServer, ConversionClient
+
+
+class ServerCheck(unittest.TestCase):
+
+    def start_server(self, processes, path=None, limit=None):
+        server = ConversionServer(workers=2, processes=processes)
+        if limit is not None:
+            server.limit = limit
+        ready = threading.Event()
+        thread = threading.Thread(
+            target=asyncio.run, args=(server.serve(path=path, ready=ready.set),))
+        thread.start()
+        self.assertTrue(ready.wait(10))
+        self.addCleanup(thread.join)
+        self.addCleanup(server.stop)
+        return server
+
+
+    def test_convert(self):
+        server = self.start_server(processes=False)
+        with ConversionClient(server.address) as client:
+            res = client.convert(["a = Sin[x]", ")b", "c = x^2\nd = x^2 + 1"])
+            self.assertEqual(res['id'], 1)
+            self.assertEqual(res['results'][0], 'a = np.sin(x)')
+            self.assertIsNone(res['results'][1])
+            self.assertIn('invalid syntax', res['errors'][1])
+            self.assertIsNone(res['errors'][2])
+
+            res = client.convert(["c = Exp[x]^2\nd = Exp[x]^2 + 1"], optimize=True,
+                                 int2float=True)
+            self.assertEqual(res['results'],
+                             ["t_0 = np.exp(x) ** 2.\nc = t_0\nd = t_0 + 1."])
+
+            res = client.convert(["a"], source='fortran')
+            self.assertIn('fortran', res['error'])
+            res = client.request({'source': 5})
+            self.assertIn('source', res['error'])
+            res = client.request({'target': ['mathematica'], 'formulas': 'a'})
+            self.assertIn('target', res['error'])
+            res = client.request({'formulas': [1]})
+            self.assertIn('formulas', res['error'])
+            res = client.request({'command': 'metrics', 'id': 'm'})
+            self.assertEqual(res['id'], 'm')
+
+            metrics = client.metrics()
+            self.assertEqual(metrics['requests'], 2)
+            self.assertEqual(metrics['formulas'], 4)
+            self.assertEqual(metrics['errors'], 5)
+            self.assertEqual(metrics['stages']['request']['count'], 2)
+            self.assertGreater(metrics['throughput'], 0)
+
+
+    def test_large_requests(self):
+        server = self.start_server(processes=False, limit=2 ** 20)
+        with ConversionClient(server.address) as client:
+            formulas = ["a = Sin[x] + Cos[y]"] * 5000  # more than 64 KiB
+            res = client.convert(formulas)
+            self.assertEqual(res['results'], ["a = np.sin(x) + np.cos(y)"] * 5000)
+
+            res = client.convert(formulas * 20)
+            self.assertIn('limit', res['error'])
+            res = client.convert(["a = Sin[x]"])
+            self.assertEqual(res['results'], ["a = np.sin(x)"])
+
+
+    def test_processes(self):
+        folder = tempfile.mkdtemp()
+        path = os.path.join(folder, 'server.sock')
+        self.addCleanup(shutil.rmtree, folder)
+        self.start_server(processes=True, path=path)
+        with ConversionClient(path) as client:
+            res = client.convert(["a = Exp[x]"] * 3, target='c')
+            self.assertEqual(res['results'], ["a = exp(x);"] * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
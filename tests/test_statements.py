@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import sys
+sys.path.append('..')
+
+from src.language import LanguageMathematica
+from src.parser_text import ParserText, ParseError
+from src.formatter import Formatter
+from src.statements import iter_statements
+
+
+def statements(text, **kwargs):
+    return list(iter_statements(text.split('\n'), **kwargs))
+
+
+class StatementsCheck(unittest.TestCase):
+
+    def test_separator(self):
+        self.assertEqual(statements('a = 1; b = 2;\n\nc = 3'),
+                         [(1, 'a = 1'), (1, 'b = 2'), (3, 'c = 3')])
+
+
+    def test_brackets(self):
+        text = 'a = Sin[x,\n  y] + b[[1,\n 2]]\nc = (x;\ny)'
+        self.assertEqual(statements(text),
+                         [(1, 'a = Sin[x, y] + b[[1, 2]]'), (4, 'c = (x; y)')])
+
+
+    def test_continuation(self):
+        self.assertEqual(statements('a = x +\n  y\nb =\n 2'),
+                         [(1, 'a = x + y'), (3, 'b = 2')])
+        self.assertEqual(statements('a = x \\\n y'), [(1, 'a = x y')])
+
+
+    def test_comments(self):
+        text = '(* header *)\na = x (* a (* nested *) comment\n *) + y; b = 1'
+        self.assertEqual(statements(text, comment=('(*', '*)')),
+                         [(2, 'a = x + y'), (3, 'b = 1')])
+        self.assertEqual(statements('a = "(*"; b', comment=('(*', '*)')),
+                         [(1, 'a = "(*"'), (1, 'b')])
+
+
+    def test_unterminated(self):
+        self.assertEqual(statements('a = Sin[x\nb = 1'), [(1, 'a = Sin[x b = 1')])
+
+
+    def test_parse_statements(self):
+        parser = ParserText(LanguageMathematica())
+        parser.parse_statements('a = Sin[x +\n  y] (* sum *);\nb = a^2')
+        code = Formatter(LanguageMathematica())(parser)
+        self.assertEqual(code, 'a = Sin[x + y]\nb = a ^ 2')
+
+        with self.assertRaises(ParseError) as cm:
+            parser.parse_statements('a = 1;\n)b = 2')
+        self.assertEqual(cm.exception.lineno, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()